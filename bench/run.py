@@ -0,0 +1,383 @@
+"""
+Benchmarks for the lexer, both interpreters, the VM allocator and the compiler.
+
+    python bench/run.py                        run the small and medium sizes, compare with bench/baseline.json
+    python bench/run.py -sizes=small,medium,large -only=branches,vm
+    python bench/run.py -save-baseline         store this run as the baseline of this machine
+    python bench/run.py -threshold=0.15        how much worse than the baseline counts as a regression (default 0.10)
+
+The lexer workload times RegexLexer and, for comparison, the classic Lexer
+on the same source. On CPython 3.11.7 (x86_64 Linux, a busier machine than
+the first measurements) that came out at 6.5x for small (20k lines, 0.35 s
+vs 2.25 s) and 5.1x for medium (200k lines, 4.75 s vs 24.27 s), still short
+of the 10x asked for. About half of RegexLexer's time is creating the Token
+objects, which the classic Lexer pays for too.
+
+The tracing workload runs the token interpreter as it is, after a hook was
+attached and removed again (disabled tracing, should cost under 1%) and with a
+no-op on_token hook attached.
+
+The batch workload runs the same scripts through lib.batch with 1, 2, 4, ...
+jobs up to one per core and reports scripts/s for each, scaling is the most
+jobs against one.
+
+Ops are tokens run for the token interpreter and instructions run for the
+bytecode engine, so ops/s compares runs of one engine, not the two engines.
+
+Every workload runs in its own process (so peak RSS is its own), results are
+written to bench/results.json. Exits with 1 when something regressed. The
+numbers only mean something on the machine they came from, so the baseline
+isn't committed (save one with -save-baseline) and a baseline from another
+machine or python is left alone.
+"""
+from contextlib import redirect_stdout
+from time import perf_counter, process_time
+from typing import Any, Dict, List, Tuple
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.workloads import BATCH_WALKS, SIZES, WORKLOADS
+from lib.batch import Batch
+from lib.bytecode import Bytecode, BytecodeCompiler
+from lib.compiler import Compiler
+from lib.engine import Engine
+from lib.expander import MacroExpander
+from lib.hooks import Hook
+from lib.inliner import Inliner
+from lib.interpreter import Interpreter
+from lib.lexer import Lexer, RegexLexer
+from lib.optimizer import Optimizer
+from lib.parser import Parser
+from lib.tokentype import Token
+from lib.vm import VM
+
+BASELINE: str = os.path.join(ROOT, "bench", "baseline.json")
+RESULTS: str = os.path.join(ROOT, "bench", "results.json")
+STARTUP_SCRIPT: str = os.path.join(ROOT, "examples", "hello.porth")
+STARTUP_RUNS: int = 10
+WORKER_TIMEOUT: int = 600 # seconds
+
+THRESHOLD: float = 0.10 # relative change that counts as a regression
+RSS_THRESHOLD: float = 0.20 # peak RSS moves more between runs
+HIGHER_IS_BETTER: Tuple[str, ...] = ("tokens_per_s", "ops_per_s", "allocs_per_s")
+LOWER_IS_BETTER: Tuple[str, ...] = ("seconds", "startup_s", "peak_rss_kb")
+
+VM_LIVE: int = 256 # allocations kept alive at once, the rest are freed as they go
+TRACING_LIMIT: float = 0.01 # what disabled tracing may cost
+TRACING_PAIRS: int = 10 # plain/detached pairs per -repeat, the median ratio is reported
+
+class NoOpHook(Hook):
+
+    def on_token(self, interpreter: Interpreter, token: Token) -> None:
+        pass
+
+class CountingInterpreter(Interpreter):
+    """
+    Counts the tokens it runs, the "ops" a timed run is divided by.
+    """
+
+    def __init__(self, tokens: List[Token]) -> None:
+        super().__init__(tokens)
+        self.ops: int = 0
+
+    def interpret_token(self) -> None:
+        self.ops += 1
+        super().interpret_token()
+
+class CountingInstructions(list):
+    """
+    Engine.instructions, counting how many times the dispatch loop fetched one.
+    """
+
+    def __init__(self, instructions: List[Tuple[int, Any]]) -> None:
+        super().__init__(instructions)
+        self.fetched: int = 0
+
+    def __getitem__(self, index: Any) -> Any:
+        self.fetched += 1
+        return super().__getitem__(index)
+
+class CountingEngine(Engine):
+    """
+    Counts the instructions it runs, the "ops" a timed bytecode run is divided by.
+    """
+
+    def __init__(self, bytecode: Bytecode) -> None:
+        super().__init__(bytecode)
+        self.instructions = CountingInstructions(self.instructions)
+
+    @property
+    def ops(self) -> int:
+        return self.instructions.fetched
+
+def prepare(source: str, name: str) -> Tuple[List[Token], float]:
+    """
+    What porth.py does before running at the default -O1, returns the tokens and the lexing time.
+    """
+    start: float = perf_counter()
+    tokens: List[Token] = RegexLexer(source, name).scan_tokens()[0]
+    lexing: float = perf_counter() - start
+    tokens = MacroExpander(tokens, Parser(tokens).parse()).expand()
+    tokens = Inliner(tokens).inline()
+    tokens = Optimizer(tokens, 1).optimize()
+    return tokens, lexing
+
+def best_of(repeat: int, run: Any) -> float:
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = perf_counter()
+        run()
+        best = min(best, perf_counter() - start)
+    return best
+
+def measure(workload: str, size: str, engine: str, repeat: int) -> Dict[str, Any]:
+    kind, generate = WORKLOADS[workload]
+    scale: int = SIZES[workload][size]
+    results: Dict[str, Any] = {}
+
+    with open(os.devnull, "w") as null, redirect_stdout(null):
+        if kind == "interpreter":
+            tokens, _ = prepare(generate(scale), f"{workload}.porth")
+            counter: CountingInterpreter | CountingEngine
+            if engine == "bytecode":
+                code: Bytecode = BytecodeCompiler(tokens).compile()
+                counter = CountingEngine(code)
+                seconds: float = best_of(repeat, lambda: Engine(code).interpret(False, False, False, ""))
+            else:
+                counter = CountingInterpreter(tokens)
+                seconds = best_of(repeat, lambda: Interpreter(tokens).interpret(False, False, False, ""))
+            counter.interpret(False, False, False, "")
+            results = { "seconds" : seconds, "ops" : counter.ops, "ops_per_s" : counter.ops / seconds }
+
+        elif kind == "lexer":
+            source: str = generate(scale)
+            amount: int = len(RegexLexer(source, "lexer.porth").scan_tokens()[0])
+            seconds = best_of(repeat, lambda: RegexLexer(source, "lexer.porth").scan_tokens())
+            classic: float = best_of(repeat, lambda: Lexer(source, "lexer.porth").scan_tokens()) # what RegexLexer replaced, same tokens
+            results = { "seconds" : seconds, "tokens" : amount, "tokens_per_s" : amount / seconds, "bytes" : len(source), "classic_s" : classic, "speedup" : classic / seconds }
+
+        elif kind == "vm":
+            def churn() -> None:
+                vm: VM = VM()
+                live: List[str] = []
+                for index in range(scale):
+                    value: Any = index if index % 3 else f"value {index}" * (1 + index % 4)
+                    live.append(vm.allocate_memory_and_store(8 + (index % 5) * 8, value))
+                    if len(live) > VM_LIVE:
+                        vm.free_memory(live.pop(index % VM_LIVE))
+                for address in live:
+                    vm.free_memory(address)
+            seconds = best_of(repeat, churn)
+            results = { "seconds" : seconds, "allocs" : scale, "allocs_per_s" : 2 * scale / seconds } # every allocation is freed again
+
+        elif kind == "tracing":
+            tokens, _ = prepare(generate(scale), f"{workload}.porth")
+            def run(attach: bool, detach: bool) -> float:
+                interpreter: Interpreter = Interpreter(tokens)
+                hook: NoOpHook = NoOpHook()
+                if attach:
+                    interpreter.add_hook(hook)
+                if detach:
+                    interpreter.remove_hook(hook)
+                start: float = process_time() # CPU time, other processes getting the CPU doesn't count against either side
+                interpreter.interpret(False, False, False, "")
+                return process_time() - start
+            plain: List[float] = []
+            ratios: List[float] = []
+            for pair in range(TRACING_PAIRS * repeat): # back to back pairs in alternating order, drift cancels out of the ratio
+                if pair % 2:
+                    detached: float = run(True, True)
+                    plain.append(run(False, False))
+                else:
+                    plain.append(run(False, False))
+                    detached = run(True, True)
+                ratios.append(detached / plain[-1])
+            traced: float = min(run(True, False) for _ in range(repeat))
+            seconds = min(plain)
+            ratios.sort()
+            results = {
+                "seconds" : seconds, "traced_s" : traced,
+                "disabled_overhead" : ratios[len(ratios) // 2] - 1, "enabled_overhead" : traced / seconds - 1,
+            }
+
+        elif kind == "compiler":
+            tokens, _ = prepare(generate(scale), f"{workload}.porth")
+            path: str = os.path.join(ROOT, "bench", f".{workload}-{os.getpid()}.out")
+            try:
+                seconds = best_of(repeat, lambda: Compiler(tokens).write(path))
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)
+            results = { "seconds" : seconds, "tokens" : len(tokens), "tokens_per_s" : len(tokens) / seconds }
+
+        elif kind == "batch":
+            directory: str = os.path.join(ROOT, "bench", f".{workload}-{os.getpid()}")
+            os.makedirs(directory)
+            try:
+                scripts: List[str] = []
+                for index in range(scale):
+                    scripts.append(os.path.join(directory, f"script{index}.porth"))
+                    with open(scripts[-1], "w") as file:
+                        file.write(generate(BATCH_WALKS))
+                cores: int = os.cpu_count() or 1
+                rates: Dict[str, float] = {}
+                for jobs in sorted({ 1, cores, *(2 ** power for power in range(1, cores.bit_length())) }):
+                    seconds = best_of(repeat, Batch(scripts, jobs).run)
+                    rates[str(jobs)] = scale / seconds
+            finally:
+                shutil.rmtree(directory)
+            results = { "seconds" : seconds, "scripts" : scale, "cores" : cores, "scripts_per_s" : rates, "scaling" : rates[str(cores)] / rates["1"] }
+
+    results["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+def startup() -> Dict[str, Any]:
+    """
+    Wall time of running the smallest script through porth.py, interpreter start up included.
+    """
+    best: float = float("inf")
+    for _ in range(STARTUP_RUNS):
+        start: float = perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "porth.py"), STARTUP_SCRIPT, "-i", "-no-cache"], stdout=subprocess.DEVNULL, check=True)
+        best = min(best, perf_counter() - start)
+    return { "startup_s" : best }
+
+def cases(sizes: List[str], only: List[str]) -> List[Tuple[str, str, str]]:
+    found: List[Tuple[str, str, str]] = []
+    for workload, (kind, _) in WORKLOADS.items():
+        if only and workload not in only:
+            continue
+        for size in sizes:
+            for engine in (("token", "bytecode") if kind == "interpreter" else ("-",)):
+                found.append((workload, size, engine))
+    return found
+
+def run_worker(workload: str, size: str, engine: str, repeat: int) -> Dict[str, Any]:
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "-worker", workload, size, engine, str(repeat)],
+        capture_output=True, text=True, timeout=WORKER_TIMEOUT,
+    )
+    if process.returncode != 0:
+        return { "error" : (process.stderr or process.stdout).strip().splitlines()[-1:] }
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'benchmark':<28}{'seconds':>10}{'tokens/s':>14}{'ops/s':>14}{'allocs/s':>14}{'peak MB':>10}")
+    for name, metrics in results.items():
+        if "error" in metrics:
+            print(f"{name:<28}  failed: {' '.join(metrics['error'])}")
+            continue
+        if "startup_s" in metrics:
+            print(f"{name:<28}{metrics['startup_s']:>10.3f}")
+            continue
+        columns: List[str] = [f"{metrics[key]:>14,.0f}" if key in metrics else f"{'-':>14}" for key in HIGHER_IS_BETTER]
+        print(f"{name:<28}{metrics['seconds']:>10.3f}{''.join(columns)}{metrics['peak_rss_kb'] / 1024:>10.1f}")
+        if "speedup" in metrics:
+            print(f"{'':<4}RegexLexer {metrics['speedup']:.1f}x the classic Lexer ({metrics['classic_s']:.3f} s)")
+        if "disabled_overhead" in metrics:
+            verdict: str = "under" if metrics["disabled_overhead"] < TRACING_LIMIT else "OVER"
+            print(f"{'':<4}hooks detached {metrics['disabled_overhead']:+.2%} ({verdict} {TRACING_LIMIT:.0%}), no-op on_token hook {metrics['enabled_overhead']:+.1%}")
+        if "scaling" in metrics:
+            rates: str = ", ".join(f"{rate:,.0f} at -j {jobs}" for jobs, rate in metrics["scripts_per_s"].items())
+            print(f"{'':<4}scripts/s {rates}, {metrics['scaling']:.2f}x on {metrics['cores']} core(s)")
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> int:
+    """
+    Prints what moved past the thresholds, returns how many metrics regressed.
+    A baseline from another machine isn't compared with, none of it would be.
+    """
+    if baseline.get("machine") != machine():
+        print(f"\nNot comparing with the baseline, it's from {baseline.get('machine')} and this is {machine()} (-save-baseline to make one here)")
+        return 0
+    regressions: int = 0
+    lines: List[str] = []
+    for name, metrics in results.items():
+        before: Dict[str, Any] | None = baseline["results"].get(name)
+        if before is None or "error" in metrics or "error" in before:
+            continue
+        for key in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if key not in metrics or key not in before or not before[key]:
+                continue
+            change: float = (metrics[key] - before[key]) / before[key]
+            worse: float = -change if key in HIGHER_IS_BETTER else change
+            limit: float = RSS_THRESHOLD if key == "peak_rss_kb" else threshold
+            if worse > limit:
+                regressions += 1
+                lines.append(f"  REGRESSION  {name:<28}{key:<14}{before[key]:>14,.3f} -> {metrics[key]:>14,.3f} ({change:+.1%})")
+            elif worse < -limit:
+                lines.append(f"  improved    {name:<28}{key:<14}{before[key]:>14,.3f} -> {metrics[key]:>14,.3f} ({change:+.1%})")
+    print(f"\nCompared with the baseline (threshold {threshold:.0%}, peak RSS {RSS_THRESHOLD:.0%}):")
+    print("\n".join(lines) if lines else "  nothing moved past the thresholds")
+    return regressions
+
+def machine() -> str:
+    return f"{platform.python_implementation()} {platform.python_version()} on {platform.machine()} {platform.system()} ({platform.node()})"
+
+def main() -> None:
+    if sys.argv[1:2] == ["-worker"]:
+        workload, size, engine, repeat = sys.argv[2:6]
+        print(json.dumps(measure(workload, size, engine, int(repeat))))
+        return
+
+    sizes: List[str] = ["small", "medium"]
+    only: List[str] = []
+    repeat: int = 3
+    threshold: float = THRESHOLD
+    save_baseline: bool = False
+    baseline_path: str = BASELINE
+    output_path: str = RESULTS
+    for arg in sys.argv[1:]:
+        if arg[:7] == "-sizes=":
+            sizes = arg[7:].split(",")
+        elif arg[:6] == "-only=":
+            only = arg[6:].split(",")
+        elif arg[:8] == "-repeat=":
+            repeat = int(arg[8:])
+        elif arg[:11] == "-threshold=":
+            threshold = float(arg[11:])
+        elif arg[:10] == "-baseline=":
+            baseline_path = arg[10:]
+        elif arg[:8] == "-output=":
+            output_path = arg[8:]
+        elif arg == "-save-baseline":
+            save_baseline = True
+        else:
+            print(__doc__)
+            exit(1)
+    for size in sizes:
+        if size not in ("small", "medium", "large"):
+            print(f"unknown size \"{size}\" (expected small, medium or large)")
+            exit(1)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    if not only or "startup" in only:
+        results["startup"] = startup()
+    for workload, size, engine in cases(sizes, only):
+        name: str = f"{workload}/{size}" + (f"/{engine}" if engine != "-" else "")
+        print(f"running {name}", file=sys.stderr)
+        results[name] = run_worker(workload, size, engine, repeat)
+
+    print_results(results)
+    document: Dict[str, Any] = { "machine" : machine(), "repeat" : repeat, "results" : results }
+    with open(output_path, "w") as file:
+        json.dump(document, file, indent=2)
+    if save_baseline:
+        with open(baseline_path, "w") as file:
+            json.dump(document, file, indent=2)
+        print(f"\nSaved the baseline to {baseline_path}")
+        return
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            if compare(results, json.load(file), threshold):
+                exit(1)
+
+if __name__ == "__main__":
+    main()
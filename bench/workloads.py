@@ -0,0 +1,87 @@
+from typing import Callable, Dict, List, Tuple
+
+# name -> size -> scale passed to the generator
+SIZES: Dict[str, Dict[str, int]] = {
+    "procs"    : { "small" : 15,    "medium" : 17,     "large" : 19 },      # depth of the call tree, 2 ** depth calls
+    "branches" : { "small" : 200,   "medium" : 2000,   "large" : 20000 },   # walks of 30 classified steps
+    "macros"   : { "small" : 1000,  "medium" : 10000,  "large" : 100000 },  # uses of a 6 deep macro
+    "strings"  : { "small" : 5000,  "medium" : 50000,  "large" : 500000 },  # lines of concatenation/comparison
+    "lexer"    : { "small" : 20000, "medium" : 200000, "large" : 2000000 }, # source lines
+    "vm"       : { "small" : 100000, "medium" : 500000, "large" : 2000000 }, # allocations
+    "compiler" : { "small" : 2000,  "medium" : 20000,  "large" : 200000 },  # same as branches
+    "tracing"  : { "small" : 200,   "medium" : 2000,   "large" : 20000 },   # same as branches
+    "batch"    : { "small" : 40,    "medium" : 200,    "large" : 1000 },    # scripts of branches(BATCH_WALKS)
+}
+
+BATCH_WALKS: int = 20 # walks in a script of the batch workload, tens of ms each
+
+def procs(depth: int) -> str:
+    """
+    A call tree, every proc calls the one below it twice.
+    """
+    lines: List[str] = ["p0 :: proc 1 + end"]
+    for level in range(1, depth + 1):
+        lines.append(f"p{level} :: proc p{level - 1}() p{level - 1}() end")
+    lines.append(f"0 p{depth}() out")
+    return "\n".join(lines) + "\n"
+
+def branches(walks: int) -> str:
+    """
+    Nested if/else on every step of a recursive walk.
+    """
+    lines: List[str] = [
+        "classify :: proc",
+        "    dup 10 < if \"low\" drop else dup 20 < if \"mid\" drop else \"high\" drop end end",
+        "    1 +",
+        "end",
+        "walk :: proc dup 30 < if classify() walk() end end",
+    ]
+    lines.extend("0 walk() drop" for _ in range(walks))
+    return "\n".join(lines) + "\n"
+
+def macros(uses: int) -> str:
+    """
+    Macros nested 6 deep, expanded ahead of time, then run. "0 0 swap" keeps
+    the optimizer from folding the whole program into one number.
+    """
+    lines: List[str] = ["m0 :: macro 1 + end"]
+    for level in range(1, 7):
+        lines.append(f"m{level} :: macro m{level - 1} m{level - 1} end")
+    lines.append("0 0 swap")
+    lines.extend("m6" for _ in range(uses))
+    lines.append("out drop")
+    return "\n".join(lines) + "\n"
+
+def strings(count: int) -> str:
+    lines: List[str] = ["\"abc\" \"abc\" swap"] # not a literal, so nothing below folds
+    for index in range(count):
+        lines.append(f"dup \"def{index % 10}\" + \"def{index % 7}abc\" == drop")
+        lines.append("dup dup + drop")
+    lines.append("out drop")
+    return "\n".join(lines) + "\n"
+
+def lexer(count: int) -> str:
+    """
+    A bit of everything the lexer sees, comments included.
+    """
+    block: List[str] = [
+        "// a comment line that the lexer has to skip over",
+        "helper :: proc dup 10 < if 1 + else \"big number\" out end end",
+        "value 42 = value ! helper() drop",
+        "\"a string with spaces and symbols: () :: -> |\" out",
+        "1 2 + 3 < true == if \"yes\" out end",
+    ]
+    return "\n".join(block[index % len(block)] for index in range(count)) + "\n"
+
+# name -> (what it measures, generator)
+WORKLOADS: Dict[str, Tuple[str, Callable[[int], str] | None]] = {
+    "procs"    : ("interpreter", procs),
+    "branches" : ("interpreter", branches),
+    "macros"   : ("interpreter", macros),
+    "strings"  : ("interpreter", strings),
+    "lexer"    : ("lexer", lexer),
+    "vm"       : ("vm", None), # drives VM directly, no program allocates yet
+    "compiler" : ("compiler", branches),
+    "tracing"  : ("tracing", branches), # Interpreter with hooks detached and attached
+    "batch"    : ("batch", branches), # lib.batch throughput from 1 job to one per core
+}
@@ -0,0 +1,15 @@
+"""
+finn as a library, for running scripts from python:
+
+    import finn
+
+    program = finn.compile('"hello" out')
+    result = program.run(limits=finn.Limits(timeout=1))
+    result.output # 'hello\n'
+
+compile and load raise CompileError, run raises ExecutionError (LimitError past a limit).
+"""
+from lib.api import Limits, Program, Result, compile, load
+from lib.errors import CompileError, ExecutionError, FinnError, LimitError
+
+__all__ = ["compile", "load", "Program", "Result", "Limits", "FinnError", "CompileError", "ExecutionError", "LimitError"]
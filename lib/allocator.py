@@ -0,0 +1,85 @@
+from typing import Callable
+
+SIZE_CLASSES: int = 33 # blocks are at most 2**32 bytes (header stores the capacity as u32)
+
+class Allocator:
+    """
+    Deterministic offset allocator for the VM heap.
+
+    Fresh blocks come off a bump pointer. Freed blocks are coalesced with
+    free neighbours and kept in power-of-two size classes, so allocate and
+    free never scan the heap. Only offsets are handled here, the bytes
+    themselves belong to VM.heap.
+    """
+
+    def __init__(self, base: int, alignment: int) -> None:
+        self.top: int = base
+        self.minimum_block: int = alignment * 2
+
+        self.free_lists: list[dict[int, int]] = [ {} for _ in range(SIZE_CLASSES) ] # class -> {start : size}, in insertion order
+        self.free_starts: dict[int, int] = {} # start -> size
+        self.free_ends: dict[int, int] = {}   # end -> start
+
+        self.on_free: Callable[[int, int], None] | None = None # lets the owner tag free blocks in the heap
+
+    def load(self, top: int, free_starts: dict[int, int]) -> None:
+        self.top = top
+        for start, size in free_starts.items():
+            self.free_lists[self.size_class(size)][start] = size
+            self.free_starts[start] = size
+            self.free_ends[start + size] = start
+
+    def size_class(self, size: int) -> int:
+        return size.bit_length() - 1
+
+    def insert(self, start: int, size: int) -> None:
+        self.free_lists[self.size_class(size)][start] = size
+        self.free_starts[start] = size
+        self.free_ends[start + size] = start
+        if self.on_free is not None:
+            self.on_free(start, size)
+
+    def remove(self, start: int) -> int:
+        size: int = self.free_starts.pop(start)
+        del self.free_ends[start + size]
+        del self.free_lists[self.size_class(size)][start]
+        return size
+
+    def take(self, size: int) -> int | None:
+        # the floor class may hold a block that's big enough, anything from the ceiling class up always is
+        floor_class: int = self.size_class(size)
+        bucket: dict[int, int] = self.free_lists[floor_class]
+        if bucket:
+            start: int = next(iter(bucket))
+            if bucket[start] >= size:
+                return start
+        for size_class in range((size - 1).bit_length(), SIZE_CLASSES):
+            if self.free_lists[size_class]:
+                return next(iter(self.free_lists[size_class]))
+        return None
+
+    def allocate(self, size: int) -> tuple[int, int]:
+        start: int | None = self.take(size)
+        if start is None:
+            start = self.top
+            self.top += size
+            return start, size
+        block_size: int = self.remove(start)
+        if block_size - size >= self.minimum_block:
+            self.insert(start + size, block_size - size)
+            return start, size
+        return start, block_size
+
+    def free(self, start: int, size: int) -> None:
+        end: int = start + size
+        if end in self.free_starts:
+            size += self.remove(end)
+            end = start + size
+        if start in self.free_ends:
+            previous: int = self.free_ends[start]
+            size += self.remove(previous)
+            start = previous
+        if end == self.top:
+            self.top = start
+        else:
+            self.insert(start, size)
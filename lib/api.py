@@ -0,0 +1,209 @@
+from io import StringIO
+from time import perf_counter
+from typing import Any, Dict, List, TextIO, Tuple
+
+from .errors import CompileError, ExecutionError, FinnError, LimitError
+from .expander import MacroExpander
+from .inliner import Inliner
+from .interpreter import Interpreter
+from .jumptable import resolve_jumps
+from .lexer import RegexLexer
+from .loader import ModuleLoader
+from .optimizer import Optimizer
+from .parser import Parser
+from .tokentype import Token, TokenType
+
+def where(token: Token | None) -> str:
+    return f"{token.filename}:{token.position[0]}:{token.position[1]}: " if token is not None else ""
+
+TIMEOUT_CHECK_INTERVAL: int = 1024 # tokens run between looks at the clock
+
+def exit_status(code: Any) -> Tuple[int, str | None]:
+    """
+    The status "exit" ends a run with, the same one python gives the process,
+    and the message python would print to stderr for anything that isn't a number.
+    """
+    if code is None:
+        return 0, None
+    return (int(code), None) if isinstance(code, int) else (1, str(code))
+
+class StrictLexer(RegexLexer):
+    """
+    Makes every lexing error a CompileError, the CLI lexer reports some and carries on.
+    """
+
+    def __init__(self, source: str, filename: str) -> None:
+        super().__init__(source, filename)
+        self.strict = True
+
+class Limits:
+    """
+    What a single run may use, None is no limit. Steps are tokens run, the
+    timeout is in seconds of wall time (checked every TIMEOUT_CHECK_INTERVAL
+    tokens). VM memory is always capped at vm.MAX_MEMORY.
+    """
+
+    __slots__ = ("max_steps", "max_stack", "max_call_depth", "timeout")
+
+    def __init__(self, max_steps: int | None = None, max_stack: int | None = None, max_call_depth: int | None = None, timeout: float | None = None) -> None:
+        self.max_steps: int | None = max_steps
+        self.max_stack: int | None = max_stack
+        self.max_call_depth: int | None = max_call_depth
+        self.timeout: float | None = timeout
+
+class Result:
+    """
+    How a run ended. output holds what the program printed when run wasn't given
+    a stdout, exit_message what "exit" was given when it wasn't a number ("bye" exit
+    ends with exit_code 1 and exit_message "bye").
+    """
+
+    __slots__ = ("exit_code", "stack", "output", "exit_message")
+
+    def __init__(self, exit_code: int, stack: List[Any], output: str | None, exit_message: str | None = None) -> None:
+        self.exit_code: int = exit_code
+        self.stack: List[Any] = stack
+        self.output: str | None = output
+        self.exit_message: str | None = exit_message
+
+    def __repr__(self) -> str:
+        return f"Result(exit_code={self.exit_code}, stack={self.stack!r}, output={self.output!r}, exit_message={self.exit_message!r})"
+
+class ProgramInterpreter(Interpreter):
+    """
+    Interpreter for Program.run, errors it would print and stop on are raised.
+    """
+
+    def print_error(self, error: str) -> None:
+        raise ExecutionError(error)
+
+class TimedInterpreter(ProgramInterpreter):
+    """
+    Holds a run to a timeout and a call depth. The clock is read every
+    TIMEOUT_CHECK_INTERVAL tokens from execute's loop, so a long run without
+    calls stops too and a token only pays for a countdown. call() checks the depth.
+    """
+
+    def __init__(self, tokens: List[Token], jumps: Dict[Token, int], limits: Limits) -> None:
+        super().__init__(tokens, jumps)
+        self.limits: Limits = limits
+        self.max_call_depth: float = float("inf") if limits.max_call_depth is None else limits.max_call_depth
+        self.deadline: float = float("inf") if limits.timeout is None else perf_counter() + limits.timeout
+
+    def execute(self) -> None:
+        frames: List[Tuple[List[Token], int, bool]] = self.frames
+        countdown: int = TIMEOUT_CHECK_INTERVAL
+        while True:
+            while self.index < len(self.tokens):
+                self.interpret_token()
+                countdown -= 1
+                if not countdown:
+                    countdown = TIMEOUT_CHECK_INTERVAL
+                    if perf_counter() > self.deadline:
+                        raise LimitError(f"{where(self.token)}Ran for more than {self.limits.timeout} seconds")
+            if not frames:
+                return
+            self.leave()
+
+    def call(self, obj: List[Token], name: str) -> None:
+        super().call(obj, name)
+        if len(self.call_stack) > self.max_call_depth:
+            raise LimitError(f"{where(self.token)}Calls nested more than {self.limits.max_call_depth} deep")
+
+class LimitedInterpreter(TimedInterpreter):
+    """
+    Also counts tokens and watches the stack, which costs ~20% per token.
+    """
+
+    def __init__(self, tokens: List[Token], jumps: Dict[Token, int], limits: Limits) -> None:
+        super().__init__(tokens, jumps, limits)
+        self.steps: int = 0
+        self.max_steps: float = float("inf") if limits.max_steps is None else limits.max_steps
+        self.max_stack: float = float("inf") if limits.max_stack is None else limits.max_stack
+
+    def interpret_token(self) -> None:
+        self.steps += 1
+        if self.steps > self.max_steps:
+            raise LimitError(f"{where(self.tokens[self.index])}Ran more than {self.limits.max_steps} tokens")
+        super().interpret_token()
+        if len(self.stack) > self.max_stack:
+            raise LimitError(f"{where(self.token)}The stack grew past {self.limits.max_stack} values")
+
+class Program:
+    """
+    A program lexed, expanded and optimized once, to be run any number of times.
+    Runs never change it, each gets its own interpreter (stack, variables, VM)
+    over the shared tokens and jump table, so a Program can be run from several
+    threads at once.
+    """
+
+    __slots__ = ("name", "tokens", "jumps")
+
+    def __init__(self, name: str, tokens: List[Token]) -> None:
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "tokens", tuple(tokens))
+        object.__setattr__(self, "jumps", resolve_jumps(tokens))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Program is immutable, compile a new one")
+
+    def __repr__(self) -> str:
+        return f"<Program {self.name} ({len(self.tokens)} tokens)>"
+
+    def run(self, stdout: TextIO | None = None, limits: Limits | None = None) -> Result:
+        """
+        Runs the program once, "out" writes to stdout or, without one, into
+        Result.output. "exit" ends the run with its code, anything that goes
+        wrong raises an ExecutionError (LimitError for limits).
+        """
+        tokens: List[Token] = list(self.tokens) # the interpreter tells procs from lambdas by list
+        interpreter: ProgramInterpreter
+        if limits is None:
+            interpreter = ProgramInterpreter(tokens, self.jumps)
+        elif limits.max_steps is None and limits.max_stack is None:
+            interpreter = TimedInterpreter(tokens, self.jumps, limits)
+        else:
+            interpreter = LimitedInterpreter(tokens, self.jumps, limits)
+        output: StringIO | None = StringIO() if stdout is None else None
+        interpreter.stdout = stdout if stdout is not None else output
+        exit_code: int = 0
+        exit_message: str | None = None
+        try:
+            interpreter.execute()
+        except SystemExit as exit:
+            exit_code, exit_message = exit_status(exit.code)
+        except FinnError:
+            raise
+        except Exception as error: # a token failing in python is the program's fault (an empty stack, an unknown name, ...)
+            message: str = f"{type(error).__name__}: {error}"
+            if isinstance(error, IndexError) and "pop from empty list" in str(error):
+                message = "Stack underflow"
+            elif isinstance(error, KeyError):
+                message = f"Unknown name {error}"
+            raise ExecutionError(f"{where(getattr(interpreter, 'token', None))}{message}") from error
+        return Result(exit_code, list(interpreter.stack), output.getvalue() if output is not None else None, exit_message)
+
+def compile(source: str, name: str = "<source>", optimization_level: int = 1) -> Program:
+    """
+    Lexes, expands and optimizes source the way porth.py does at -O<optimization_level>.
+    There's no file to resolve includes against, so they're an error. Raises CompileError.
+    """
+    tokens: List[Token] = StrictLexer(source, name).scan_tokens()[0]
+    for token in tokens:
+        if token._type == TokenType.INCLUDE:
+            raise CompileError(f"{where(token)}\"include\" needs a file to be relative to, use load for files that include")
+    return build(name, tokens, optimization_level)
+
+def load(path: str, optimization_level: int = 1) -> Program:
+    """
+    compile for a file, includes are resolved against it like porth.py does.
+    Raises CompileError, or OSError when a file can't be read.
+    """
+    return build(path, ModuleLoader(StrictLexer).load(path), optimization_level)
+
+def build(name: str, tokens: List[Token], optimization_level: int) -> Program:
+    tokens = MacroExpander(tokens, Parser(tokens).parse()).expand()
+    if optimization_level >= 1:
+        tokens = Inliner(tokens).inline()
+    tokens = Optimizer(tokens, optimization_level).optimize()
+    return Program(name, tokens)
@@ -0,0 +1,161 @@
+from functools import partial
+from multiprocessing import Pool
+from time import perf_counter_ns
+from typing import Any, Dict, Iterable, List
+import glob
+import json
+import os
+import signal
+import threading
+
+from .api import Limits, Program, Result, compile, load
+from .errors import FinnError, LimitError
+
+DEFAULT_TIMEOUT: float = 10.0 # seconds a script may run for
+CHUNKS_PER_WORKER: int = 4 # work is handed out in chunks, enough of them that workers finish together
+HARD_TIMEOUT_GRACE: float = 1.0 # seconds past the timeout before a script is stopped wherever it is
+
+running: bool = False # whether the alarm may stop what the worker is doing
+
+class Outcome:
+    """
+    How one script of a batch went, status is "ok", "failed" (compile or run
+    error, exit_code 1 like porth.py) or "timeout". ns is compiling and running,
+    measured in the worker.
+    """
+
+    __slots__ = ("path", "status", "exit_code", "output", "error", "ns")
+
+    def __init__(self, path: str, status: str, exit_code: int, output: str, error: str, ns: int) -> None:
+        self.path: str = path
+        self.status: str = status
+        self.exit_code: int = exit_code
+        self.output: str = output
+        self.error: str = error
+        self.ns: int = ns
+
+    def as_dict(self) -> Dict[str, Any]:
+        return { name : getattr(self, name) for name in self.__slots__ }
+
+def find_scripts(targets: Iterable[str]) -> List[str]:
+    """
+    Every .porth file under the directories and matching the globs in targets,
+    in order and without repeats.
+    """
+    scripts: List[str] = []
+    for target in targets:
+        if os.path.isdir(target):
+            scripts.extend(sorted(glob.glob(os.path.join(target, "**", "*.porth"), recursive=True)))
+        else:
+            scripts.extend(sorted(glob.glob(target, recursive=True)))
+    return list(dict.fromkeys(os.path.normpath(script) for script in scripts))
+
+def warm() -> None:
+    """
+    Pool initializer, so the first script of every worker doesn't pay for
+    imports and the lexer's regex being compiled.
+    """
+    compile("warm :: proc 1 + end 0 warm() drop").run()
+
+def alarm(signum: int, frame: Any) -> None:
+    if running:
+        raise LimitError("Still going past the timeout, stopped")
+
+def run_script(path: str, optimization_level: int, timeout: float | None) -> Outcome:
+    """
+    Lexes and runs path in a fresh Program, nothing carries over to the next script.
+    The interpreter keeps to the timeout itself, SIGALRM stops whatever is still going
+    HARD_TIMEOUT_GRACE seconds later (a huge file being lexed, say) where there is one.
+    """
+    global running
+    start: int = perf_counter_ns()
+    hard: bool = timeout is not None and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    if hard:
+        signal.signal(signal.SIGALRM, alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout + HARD_TIMEOUT_GRACE)
+        running = True
+    try:
+        program: Program = load(path, optimization_level)
+        result: Result = program.run(limits=Limits(timeout=timeout))
+        return Outcome(path, "ok", result.exit_code, result.output, result.exit_message or "", perf_counter_ns() - start)
+    except LimitError as error:
+        return Outcome(path, "timeout", 1, "", str(error), perf_counter_ns() - start)
+    except (FinnError, OSError) as error:
+        return Outcome(path, "failed", 1, "", str(error), perf_counter_ns() - start)
+    finally:
+        running = False
+        if hard:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+class Batch:
+    """
+    Runs scripts on a pool of jobs worker processes, each warmed up once and
+    reused for every script it gets. Scripts share no state, how throughput
+    follows jobs is measured by bench/run.py -only=batch.
+    """
+
+    def __init__(self, scripts: List[str], jobs: int, optimization_level: int = 1, timeout: float | None = DEFAULT_TIMEOUT) -> None:
+        self.scripts: List[str] = scripts
+        self.jobs: int = jobs
+        self.optimization_level: int = optimization_level
+        self.timeout: float | None = timeout
+
+        self.outcomes: List[Outcome] = []
+        self.wall_ns: int = 0
+
+    def run(self) -> List[Outcome]:
+        start: int = perf_counter_ns()
+        chunk: int = max(1, len(self.scripts) // (self.jobs * CHUNKS_PER_WORKER))
+        with Pool(self.jobs, initializer=warm) as pool:
+            self.outcomes = pool.map(partial(run_script, optimization_level=self.optimization_level, timeout=self.timeout), self.scripts, chunk)
+        self.wall_ns = perf_counter_ns() - start
+        return self.outcomes
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Latency in ms that fraction of the scripts stayed under.
+        """
+        latencies: List[int] = sorted(outcome.ns for outcome in self.outcomes)
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] / 1e6
+
+    def report(self, show_output: bool = False) -> None:
+        for outcome in self.outcomes:
+            print(f"  {outcome.status:<8}{outcome.exit_code:>4}{outcome.ns / 1e6:>12.3f} ms  {outcome.path}")
+            if outcome.error:
+                print(f"          {outcome.error}")
+            if show_output and outcome.output:
+                print("".join(f"          | {line}\n" for line in outcome.output.splitlines()), end="")
+        if not self.outcomes:
+            print("  no scripts to run")
+            return
+        statuses: Dict[str, int] = { status : 0 for status in ("ok", "failed", "timeout") }
+        for outcome in self.outcomes:
+            statuses[outcome.status] += 1
+        wall: float = self.wall_ns / 1e9
+        busy: float = sum(outcome.ns for outcome in self.outcomes) / 1e9
+        print()
+        print(f"  {'scripts':<12}{len(self.outcomes):>12}  ({', '.join(f'{count} {status}' for status, count in statuses.items())})")
+        print(f"  {'jobs':<12}{self.jobs:>12}")
+        print(f"  {'wall s':<12}{wall:>12.3f}")
+        print(f"  {'scripts/s':<12}{len(self.outcomes) / wall:>12.1f}")
+        print(f"  {'parallelism':<12}{busy / wall:>12.2f}  (script time / wall time, {self.jobs} at best)")
+        print(f"  {'latency ms':<12}{'p50':>12}{'p90':>12}{'p99':>12}{'max':>12}")
+        print(f"  {'':<12}{self.percentile(0.5):>12.3f}{self.percentile(0.9):>12.3f}{self.percentile(0.99):>12.3f}{self.percentile(1):>12.3f}")
+
+    def write(self, path: str) -> None:
+        """
+        Every script's outcome with its captured output, and the summary, as JSON.
+        """
+        document: Dict[str, Any] = {
+            "jobs" : self.jobs,
+            "optimization_level" : self.optimization_level,
+            "timeout" : self.timeout,
+            "wall_ns" : self.wall_ns,
+            "scripts" : [outcome.as_dict() for outcome in self.outcomes],
+        }
+        with open(path, "w") as file:
+            json.dump(document, file, indent=2)
+            file.write("\n")
+
+    def failed(self) -> bool:
+        return any(outcome.status != "ok" or outcome.exit_code != 0 for outcome in self.outcomes)
@@ -0,0 +1,285 @@
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, List, Tuple
+
+from .errors import CompileError
+from .tokentype import Token, TokenType
+
+class Opcode(IntEnum):
+
+    PUSH_CONST = 0
+    PUSH_NAME = 1 # identifier, expands a macro of the same name if there is one
+    PLUS = 2
+    LT = 3
+    EQUAL_EQUAL = 4
+    DUP = 5
+    SWAP = 6
+    DROP = 7
+    PRINT = 8
+    STORE_VAR = 9
+    LOAD_VAR = 10
+    CALL = 11
+    RETURN = 12
+    JUMP = 13
+    JUMP_IF_FALSE = 14
+    DEFINE_PROC = 15
+    PUSH_PROC = 16
+    DEFINE_MACRO = 17
+    DEFINE_STRUCT = 18
+    LOAD_PROC = 19
+    ALIAS_PROC = 20
+    GRAB_OBJECT = 21
+    ASSIGN_POPPED = 22
+    STRUCT_VAR = 23
+    CALL_STRUCT = 24
+    ARROW = 25
+    EXIT = 26
+    HALT = 27
+
+# opcodes whose operand is an index into the constant pool rather than a jump target
+CONST_OPERANDS: Tuple[Opcode, ...] = (
+    Opcode.PUSH_CONST, Opcode.PUSH_NAME, Opcode.PRINT, Opcode.DEFINE_PROC, Opcode.PUSH_PROC, Opcode.DEFINE_MACRO,
+    Opcode.DEFINE_STRUCT, Opcode.LOAD_PROC, Opcode.ALIAS_PROC, Opcode.GRAB_OBJECT, Opcode.STRUCT_VAR, Opcode.ARROW
+)
+
+NO_ASSIGN: object = object() # marks an "-> param" read in ARROW operands
+
+class Block:
+    """
+    A compiled proc or macro body, this is what sits on the stack where the
+    token interpreter would have a list of tokens.
+    """
+
+    __slots__ = ("name", "entry", "end", "tokens")
+
+    def __init__(self, name: str, entry: int, tokens: List[Token]) -> None:
+        self.name: str = name
+        self.entry: int = entry
+        self.end: int = entry
+        self.tokens: List[Token] = tokens
+
+    def __repr__(self) -> str:
+        return f"<proc {self.name or 'lambda'} @{self.entry}>"
+
+class Bytecode:
+
+    def __init__(self) -> None:
+        self.code: array = array("B")
+        self.args: array = array("l")
+        self.consts: List[Any] = []
+        self.const_ids: Dict[Tuple[type, Any], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    def constant(self, value: Any, shared: bool = True) -> int:
+        if shared:
+            key = (type(value), value)
+            if key in self.const_ids:
+                return self.const_ids[key]
+        self.consts.append(value)
+        if shared:
+            self.const_ids[key] = len(self.consts) - 1
+        return len(self.consts) - 1
+
+    def emit(self, opcode: Opcode, arg: int = 0) -> int:
+        self.code.append(opcode)
+        self.args.append(arg)
+        return len(self.code) - 1
+
+    def patch(self, position: int, arg: int) -> None:
+        self.args[position] = arg
+
+    def disassemble(self) -> None:
+        for position, (opcode, arg) in enumerate(zip(self.code, self.args)):
+            opcode = Opcode(opcode)
+            operand = repr(self.consts[arg]) if opcode in CONST_OPERANDS else arg
+            print(f"{position:>6} │ {opcode.name:<14} {operand}")
+
+class BytecodeCompiler:
+
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens: List[Token] = tokens
+        self.index: int = 0
+        self.bytecode: Bytecode = Bytecode()
+
+        self.blocks: List[List[Any]] = [] # open if/proc/macro blocks: [kind, position to patch, block, first body token]
+
+    def error(self, token: Token, message: str) -> None:
+        raise CompileError(f"{token.filename}:{token.position[0]}:{token.position[1]}: {message}")
+
+    def at_end(self) -> bool:
+        return self.index >= len(self.tokens) or self.tokens[self.index]._type == TokenType.EOF
+
+    def advance(self) -> Token:
+        token: Token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def lookahead(self, offset: int) -> Token | None:
+        if self.index + offset < len(self.tokens):
+            return self.tokens[self.index + offset]
+        return None
+
+    def begin_block(self, kind: str, opcode: Opcode, name: str) -> None:
+        block: Block = Block(name, len(self.bytecode) + 1, [])
+        position: int = self.bytecode.emit(opcode, self.bytecode.constant(block, shared=False))
+        self.blocks.append([kind, position, block, self.index])
+
+    def end_block(self, closing: int) -> None:
+        kind, position, block, start = self.blocks.pop()
+        if kind == "if":
+            self.bytecode.patch(position, len(self.bytecode))
+            return
+        self.bytecode.emit(Opcode.RETURN)
+        block.end = len(self.bytecode)
+        block.tokens = self.tokens[start : closing]
+
+    def compile_struct(self, name: str) -> None:
+        fields: Dict[str, Tuple[Any, TokenType]] = {}
+        while not self.at_end():
+            token: Token = self.advance()
+            if token._type == TokenType.END:
+                break
+            field_type: Token | None = self.lookahead(0)
+            fields[token.value] = (None, field_type._type if field_type is not None else None)
+            self.index += 1
+        self.bytecode.emit(Opcode.DEFINE_STRUCT, self.bytecode.constant((name, fields), shared=False))
+
+    def compile_object_assign(self, token: Token) -> None:
+        name: Any = self.tokens[self.index - 2].value
+        following: Token | None = self.lookahead(0)
+        if following is None:
+            return
+
+        match following._type:
+
+            case TokenType.PROC:
+                self.index += 1
+                self.begin_block("proc", Opcode.DEFINE_PROC, name)
+
+            case TokenType.STRUCT:
+                self.index += 1
+                self.compile_struct(name)
+
+            case TokenType.MACRO:
+                self.index += 1
+                self.begin_block("macro", Opcode.DEFINE_MACRO, name)
+
+            case TokenType.LT:
+                struct_name: Token | None = self.lookahead(1)
+                closing: Token | None = self.lookahead(2)
+                if struct_name is not None and closing is not None and struct_name.value_type == TokenType.IDENTIFIER and closing._type == TokenType.GT:
+                    self.bytecode.emit(Opcode.STRUCT_VAR, self.bytecode.constant((name, struct_name.value)))
+                    self.index += 3
+
+            case TokenType.GRAB_OBJECT:
+                self.bytecode.emit(Opcode.GRAB_OBJECT, self.bytecode.constant(name))
+
+            case TokenType.PIPE:
+                proc_name: Token | None = self.lookahead(1)
+                closing: Token | None = self.lookahead(2)
+                if proc_name is not None and closing is not None and proc_name.value_type == TokenType.IDENTIFIER and closing._type == TokenType.PIPE:
+                    self.bytecode.emit(Opcode.ALIAS_PROC, self.bytecode.constant((name, proc_name.value)))
+                    self.index += 3
+
+            case TokenType.PUSH:
+                self.bytecode.emit(Opcode.ASSIGN_POPPED)
+
+    def compile_token(self) -> None:
+        token: Token = self.advance()
+        emit = self.bytecode.emit
+        constant = self.bytecode.constant
+
+        match token._type:
+
+            case TokenType.PUSH:
+                if token.value_type == TokenType.IDENTIFIER:
+                    emit(Opcode.PUSH_NAME, constant(token.value))
+                else:
+                    emit(Opcode.PUSH_CONST, constant(token.value))
+
+            case TokenType.TRUE | TokenType.FALSE:
+                emit(Opcode.PUSH_CONST, constant(token._type == TokenType.TRUE))
+
+            case TokenType.PLUS:
+                emit(Opcode.PLUS)
+
+            case TokenType.LT:
+                emit(Opcode.LT)
+
+            case TokenType.EQUAL_EQUAL:
+                emit(Opcode.EQUAL_EQUAL)
+
+            case TokenType.DUP:
+                emit(Opcode.DUP)
+
+            case TokenType.SWAP:
+                emit(Opcode.SWAP)
+
+            case TokenType.DROP:
+                emit(Opcode.DROP)
+
+            case TokenType.PRINT:
+                emit(Opcode.PRINT, constant(token, shared=False))
+
+            case TokenType.EQUAL:
+                emit(Opcode.STORE_VAR)
+
+            case TokenType.CALL_VAR:
+                emit(Opcode.LOAD_VAR)
+
+            case TokenType.CALL:
+                emit(Opcode.CALL)
+
+            case TokenType.EXIT:
+                emit(Opcode.EXIT)
+
+            case TokenType.CALL_STRUCT:
+                emit(Opcode.CALL_STRUCT)
+
+            case TokenType.IF:
+                self.blocks.append(["if", emit(Opcode.JUMP_IF_FALSE), None, self.index])
+
+            case TokenType.ELSE:
+                if not self.blocks or self.blocks[-1][0] != "if":
+                    self.error(token, "Found an \"else\" statement before an \"if\" statement")
+                jump: int = emit(Opcode.JUMP)
+                self.bytecode.patch(self.blocks[-1][1], len(self.bytecode))
+                self.blocks[-1][1] = jump
+
+            case TokenType.END:
+                if self.blocks:
+                    self.end_block(self.index - 1)
+
+            case TokenType.PROC:
+                self.begin_block("proc", Opcode.PUSH_PROC, "")
+
+            case TokenType.MACRO:
+                self.error(token, "Cannot declare a macro and leave it unwrapped.\n\nTry using:\n----------------------\n[macro-name] :: macro\n    [macro-contents]\nend\n----------------------")
+
+            case TokenType.OBJECT_ASSIGN:
+                self.compile_object_assign(token)
+
+            case TokenType.PIPE:
+                proc_name: Token | None = self.lookahead(0)
+                closing: Token | None = self.lookahead(1)
+                if proc_name is not None and closing is not None and proc_name.value_type == TokenType.IDENTIFIER and closing._type == TokenType.PIPE:
+                    emit(Opcode.LOAD_PROC, constant(proc_name.value))
+                    self.index += 1
+
+            case TokenType.ARROW:
+                param: Token | None = self.lookahead(0)
+                if param is None:
+                    return
+                assign: Token | None = self.lookahead(2)
+                content: Any = self.lookahead(1).value if assign is not None and assign._type == TokenType.EQUAL else NO_ASSIGN
+                emit(Opcode.ARROW, constant((param.value, content), shared=False))
+
+    def compile(self) -> Bytecode:
+        while not self.at_end():
+            self.compile_token()
+        while self.blocks:
+            self.end_block(self.index)
+        self.bytecode.emit(Opcode.HALT)
+        return self.bytecode
@@ -0,0 +1,120 @@
+from array import array
+from hashlib import sha256
+from itertools import repeat
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from struct import Struct, error as StructError
+from typing import List, Tuple
+import os
+import sys
+
+from .tokentype import Token, TokenType
+
+CACHE_DIRECTORY: str = "__porthcache__" # next to the source, like __pycache__
+CACHE_MAGIC: bytes = b"PORTHC\x00\x01"
+CACHE_HEADER: Struct = Struct("<8s32s32sQ32s") # magic | toolchain | key | payload length | payload digest
+
+TOKEN_TYPES: list[TokenType] = list(TokenType)
+TOKEN_TYPE_CODES: dict[TokenType, int] = { _type : code for code, _type in enumerate(TOKEN_TYPES) }
+
+def toolchain_digest() -> bytes:
+    """
+    Stands in for a version number, any change to the lexer, the token classes
+    or the python running them makes every cached program stale.
+    """
+    digest = sha256(sys.version.encode("utf-8"))
+    directory: str = os.path.dirname(__file__)
+    for module in ("lexer.py", "tokentype.py", "cache.py"):
+        with open(os.path.join(directory, module), "rb") as file:
+            digest.update(file.read())
+    return digest.digest()
+
+def encode_tokens(tokens: List[Token], tokens_created: int) -> bytes:
+    """
+    Column per token field rather than a pickled Token per token, unpickling
+    a million slotted objects is slower than lexing them again.
+    """
+    filename: str = tokens[0].filename if tokens else ""
+    return dumps((
+        filename,
+        tokens_created,
+        array("B", [TOKEN_TYPE_CODES[token._type] for token in tokens]).tobytes(),
+        array("B", [TOKEN_TYPE_CODES[token.value_type] for token in tokens]).tobytes(),
+        [token.value for token in tokens],
+        array("q", [token.line for token in tokens]).tobytes(),
+        array("q", [token.column for token in tokens]).tobytes(),
+    ), protocol=HIGHEST_PROTOCOL)
+
+def decode_tokens(payload: bytes) -> Tuple[List[Token], int]:
+    filename, tokens_created, types, value_types, values, line_bytes, column_bytes = loads(payload)
+    lines: array = array("q", line_bytes)
+    columns: array = array("q", column_bytes)
+    lookup = TOKEN_TYPES.__getitem__
+    return list(map(Token, map(lookup, types), values, map(lookup, value_types), zip(lines, columns), repeat(filename))), tokens_created
+
+class ProgramCache:
+    """
+    Lexed programs pickled to <cache directory>/<key>.porthc, where the key hashes
+    the source, its filename (tokens carry it) and the lexer that produced them.
+    """
+
+    def __init__(self, directory: str = "") -> None:
+        self.directory: str = directory # empty puts the cache next to each source file
+        self.toolchain: bytes = toolchain_digest()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def key(self, source: str, filename: str, lexer: type) -> bytes:
+        return sha256(f"{lexer.__name__}\0{filename}\0{source}".encode("utf-8")).digest()
+
+    def path(self, filename: str, key: bytes) -> str:
+        directory: str = self.directory or os.path.join(os.path.dirname(filename), CACHE_DIRECTORY)
+        return os.path.join(directory, f"{key.hex()[:32]}.porthc")
+
+    def load(self, path: str, key: bytes) -> Tuple[List[Token], int] | None:
+        try:
+            with open(path, "rb") as file:
+                magic, toolchain, stored_key, length, digest = CACHE_HEADER.unpack(file.read(CACHE_HEADER.size))
+                payload: bytes = file.read()
+        except (OSError, StructError): # missing or truncated
+            return None
+        if magic != CACHE_MAGIC or toolchain != self.toolchain or stored_key != key:
+            return None
+        if length != len(payload) or sha256(payload).digest() != digest:
+            return None
+        try:
+            return decode_tokens(payload)
+        except Exception:
+            return None
+
+    def store(self, path: str, key: bytes, program: Tuple[List[Token], int]) -> None:
+        payload: bytes = encode_tokens(*program)
+        temporary_path: str = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary_path, "wb") as file:
+                file.write(CACHE_HEADER.pack(CACHE_MAGIC, self.toolchain, key, len(payload), sha256(payload).digest()))
+                file.write(payload)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, path)
+        except OSError: # read-only directory and the like, running still works without a cache
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def lex(self, source: str, filename: str, lexer: type) -> Tuple[List[Token], int]:
+        """
+        Same result as lexer(source, filename).scan_tokens(), from the cache when it can be.
+        """
+        key: bytes = self.key(source, filename, lexer)
+        path: str = self.path(filename, key)
+        program: Tuple[List[Token], int] | None = self.load(path, key)
+        if program is not None:
+            self.hits += 1
+            return program
+        self.misses += 1
+        program = lexer(source, filename).scan_tokens()
+        self.store(path, key, program)
+        return program
+
+    def print_stats(self) -> None:
+        print(f"Cache: {self.hits} hit(s), {self.misses} miss(es)")
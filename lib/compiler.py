@@ -1,55 +1,646 @@
-from .tokentype import Token, TokenType
+from typing import Callable, Dict, List, Tuple
 
-from random import choices
+from .elf import write_executable
+from .ir import Instruction, Lowering, Op
+from .tokentype import Token
+from .x86 import (
+    Assembler, mem, rip,
+    RAX, RBX, RCX, RDX, RSI, RDI, RSP, R8, R9, R10, R12, R13, R14, R15,
+    ADD, AND, CMP, OR, SUB, XOR,
+    ABOVE, BELOW, BELOW_EQUAL, EQUAL, GREATER_EQUAL, LESS, NOT_EQUAL, NOT_SIGN, OVERFLOW,
+)
 
-CHARACTERS: str = "qwertyuiopasdfghjklzxcvbnmQWERTYUIOPASDFGHJKLZXCVBNM"
+DATA_STACK_SIZE: int = 8 * 1024 * 1024 # bytes, a million values
+OUTPUT_BUFFER_SIZE: int = 65536 # stdout is flushed when this fills up and on exit
+
+# top of stack values are kept in these (the first one is where the top lives between blocks), the runtime leaves them alone
+CACHE_REGISTERS: Tuple[int, ...] = (R12, R13, R9, R10)
+
+# values are 64 bit words with a tag in the low two bits
+INT_TAG: int = 0 # number << 2
+BOOL_TAG: int = 1 # (0 or 1) << 2 | 1
+STRING_TAG: int = 2 # address of [length : 8][bytes] | 2
+FALSE: int = BOOL_TAG
+TRUE: int = 1 << 2 | BOOL_TAG
+
+SYS_WRITE: int = 1
+SYS_EXIT: int = 60
 
 class Compiler:
+    """
+    Compiles the token stream to x86-64 Linux code, through the IR in lib/ir.py.
+    compile() returns it as NASM source, write() encodes it straight into a
+    static ELF executable (no assembler or linker needed), both from the same
+    instructions so they always agree.
+
+    Values live on a data stack of their own so procs are plain call/ret on
+    the machine stack. r14 is its base and r15 its top in memory, the top few
+    values are kept in CACHE_REGISTERS and only spilled when they run out or
+    at a label, jump, call or return, where the top value is always in r12
+    (even when the stack is empty, r15 is then one slot below r14).
+
+    Anything that pops checks first that the stack holds enough values, unless
+    that's already known from earlier in the same block, and ends the program
+    with a "Stack underflow" where the interpreter would have failed. Spills
+    check there's room left in data_stack and end it with a "Stack overflow".
+    """
+
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens: List[Token] = tokens
+        self.lowering: Lowering = Lowering(tokens)
+        self.assembler: Assembler = Assembler()
+
+        self.cache: List[int] = [] # registers holding the top of the stack, bottom first
+        self.stubs: List[Callable[[], None]] = [] # out of line slow paths of the current function
+        self.print_errors: Dict[str, Token] = {} # label -> out that found the stack empty
+        self.underflow_errors: Dict[str, Token] = {} # label -> instruction that found too few values
+        self.known: int = 0 # values the stack is known to hold since the last label or call
+        self.label_count: int = 0
+        self.generated: bool = False
+
+    def new_label(self, hint: str) -> str:
+        self.label_count += 1
+        return f"{hint}_{self.label_count}"
+
+    def free_register(self) -> int:
+        if len(self.cache) == len(CACHE_REGISTERS):
+            self.spill(1)
+        return next(register for register in CACHE_REGISTERS if register not in self.cache)
+
+    def spill(self, count: int) -> None:
+        """
+        Writes the bottom count cached values out to memory.
+        """
+        if not count:
+            return
+        self.assembler.lea(RCX, mem(R15, 8 * count))
+        self.assembler.alu_load(CMP, RCX, rip("data_stack_end"))
+        self.assembler.jcc(ABOVE, "stack_overflow")
+        for offset, register in enumerate(self.cache[:count]):
+            self.assembler.mov(mem(R15, 8 * offset), register)
+        self.assembler.alu_imm(ADD, R15, 8 * count)
+        del self.cache[:count]
+
+    def fill(self, count: int) -> None:
+        """
+        Makes sure at least count values are cached.
+        """
+        missing: int = count - len(self.cache)
+        if missing <= 0:
+            return
+        loaded: List[int] = []
+        for slot in range(missing):
+            register: int = next(register for register in CACHE_REGISTERS if register not in self.cache and register not in loaded)
+            self.assembler.mov(register, mem(R15, -8 * (missing - slot)))
+            loaded.append(register)
+        self.assembler.alu_imm(SUB, R15, 8 * missing)
+        self.cache[:0] = loaded
+
+    def canonical(self) -> None:
+        """
+        The state every label, jump, call and return agrees on, the top in r12 and the rest in memory.
+        """
+        if not self.cache:
+            self.fill(1)
+        self.spill(len(self.cache) - 1)
+        if self.cache[0] != R12:
+            self.assembler.mov(R12, self.cache[0])
+            self.cache[0] = R12
+
+    def push_register(self) -> int:
+        register: int = self.free_register()
+        self.cache.append(register)
+        self.known += 1
+        return register
+
+    def require(self, count: int, token: Token) -> None:
+        """
+        Jumps to a stack underflow error unless the stack holds at least count values.
+        """
+        if self.known >= count:
+            return
+        asm: Assembler = self.assembler
+        underflow: str = self.new_label("underflow")
+        self.underflow_errors[underflow] = token
+        if len(self.cache) == count:
+            asm.alu(CMP, R15, R14)
+        else:
+            asm.lea(RCX, mem(R15, 8 * (len(self.cache) - count)))
+            asm.alu(CMP, RCX, R14)
+        asm.jcc(BELOW, underflow)
+        self.known = count
+
+    def check_numbers(self, first: int, second: int | None, slow: str) -> None:
+        """
+        Jumps to slow unless both values are tagged numbers, leaves first | second in rcx.
+        """
+        self.assembler.mov(RCX, first)
+        if second is not None:
+            self.assembler.alu(OR, RCX, second)
+        self.assembler.test_low_byte(RCX, 3)
+        self.assembler.jcc(NOT_EQUAL, slow)
+
+    def slow_path(self, slow: str, *operands: int) -> None:
+        """
+        Shared start of the slow paths, strings are a type error and bools are turned into numbers.
+        """
+        asm: Assembler = self.assembler
+        asm.label(slow)
+        asm.test_low_byte(RCX, STRING_TAG)
+        asm.jcc(NOT_EQUAL, "type_error")
+        for register in operands:
+            asm.alu_imm(AND, register, -4)
+
+    def generate_add(self, constant: int | None) -> None:
+        asm: Assembler = self.assembler
+        slow: str = self.new_label("add_slow")
+        back: str = self.new_label("add_done")
+        top: int | None = None
+        if constant is None:
+            self.fill(2)
+            top = self.cache.pop()
+            below: int = self.cache[-1]
+            self.check_numbers(below, top, slow)
+            asm.alu(ADD, below, top)
+        else:
+            self.fill(1)
+            below = self.cache[-1]
+            self.check_numbers(below, None, slow)
+            asm.alu_imm(ADD, below, constant << 2)
+        asm.jcc(OVERFLOW, "overflow_error") # the tag is in the low bits, so this is a 62 bit overflow
+        asm.label(back)
+
+        def stub(below: int = below, top: int | None = top) -> None:
+            self.slow_path(slow, below, *([top] if top is not None else []))
+            if top is None:
+                asm.alu_imm(ADD, below, constant << 2)
+            else:
+                asm.alu(ADD, below, top)
+            asm.jcc(OVERFLOW, "overflow_error")
+            asm.jmp(back)
+        self.stubs.append(stub)
+
+    def generate_less(self, constant: int | None) -> None:
+        asm: Assembler = self.assembler
+        slow: str = self.new_label("less_slow")
+        compare: str = self.new_label("less")
+        top: int | None = None
+        if constant is None:
+            self.fill(2)
+            top = self.cache.pop()
+        else:
+            self.fill(1)
+        below: int = self.cache[-1]
+        self.check_numbers(below, top, slow)
+        asm.label(compare)
+        if top is None:
+            asm.alu_imm(CMP, below, constant << 2)
+        else:
+            asm.alu(CMP, below, top)
+        asm.setcc(LESS, RAX)
+        asm.movzx_byte(below, RAX)
+        asm.shl(below, 2)
+        asm.alu_imm(OR, below, BOOL_TAG)
+
+        def stub(below: int = below, top: int | None = top) -> None:
+            self.slow_path(slow, below, *([top] if top is not None else []))
+            asm.jmp(compare)
+        self.stubs.append(stub)
+
+    def generate_less_branch(self, constant: int | None, target: str) -> None:
+        """
+        "<" straight into "if", the compare jumps to the else without making a bool.
+        """
+        asm: Assembler = self.assembler
+        slow: str = self.new_label("less_slow")
+        back: str = self.new_label("less_done")
+        if constant is None:
+            self.fill(2)
+            asm.mov(RDX, self.cache.pop())
+        else:
+            self.fill(1)
+        asm.mov(RAX, self.cache.pop())
+        self.canonical()
+        self.check_numbers(RAX, RDX if constant is None else None, slow)
+        if constant is None:
+            asm.alu(CMP, RAX, RDX)
+        else:
+            asm.alu_imm(CMP, RAX, constant << 2)
+        asm.jcc(GREATER_EQUAL, target)
+        asm.label(back)
+
+        def stub() -> None:
+            self.slow_path(slow, RAX, *([RDX] if constant is None else []))
+            if constant is None:
+                asm.alu(CMP, RAX, RDX)
+            else:
+                asm.alu_imm(CMP, RAX, constant << 2)
+            asm.jcc(GREATER_EQUAL, target)
+            asm.jmp(back)
+        self.stubs.append(stub)
+
+    def generate_equal(self) -> None:
+        asm: Assembler = self.assembler
+        slow: str = self.new_label("equal_slow")
+        back: str = self.new_label("equal_done")
+        self.fill(2)
+        top: int = self.cache.pop()
+        below: int = self.cache[-1]
+        self.check_numbers(below, top, slow)
+        asm.alu(CMP, below, top)
+        asm.setcc(EQUAL, RAX)
+        asm.movzx_byte(below, RAX)
+        asm.shl(below, 2)
+        asm.alu_imm(OR, below, BOOL_TAG)
+        asm.label(back)
+
+        def stub(below: int = below, top: int = top) -> None:
+            asm.label(slow)
+            asm.mov(RAX, below)
+            asm.mov(RBX, top)
+            asm.call("equal")
+            asm.mov(below, RAX)
+            asm.jmp(back)
+        self.stubs.append(stub)
+
+    def generate_branch(self, target: str) -> None:
+        asm: Assembler = self.assembler
+        string: str = self.new_label("if_string")
+        back: str = self.new_label("then")
+        self.fill(1)
+        asm.mov(RAX, self.cache.pop())
+        self.canonical()
+        asm.alu_imm(CMP, RAX, FALSE) # 0 and False are falsy
+        asm.jcc(BELOW_EQUAL, target)
+        asm.test_low_byte(RAX, STRING_TAG)
+        asm.jcc(NOT_EQUAL, string)
+        asm.label(back)
+
+        def stub() -> None:
+            asm.label(string)
+            asm.alu_imm(AND, RAX, -4)
+            asm.alu_imm(CMP, mem(RAX), 0) # so is ""
+            asm.jcc(EQUAL, target)
+            asm.jmp(back)
+        self.stubs.append(stub)
+
+    def generate_function(self, label: str, code: List[Instruction]) -> None:
+        asm: Assembler = self.assembler
+        asm.label(label)
+        if self.lowering.names[label]:
+            asm.comment(self.lowering.names[label])
+        if label == "_start":
+            asm.lea(R14, rip("data_stack"))
+            asm.alu_imm(ADD, R14, 8) # the slot below is where an empty stack's top goes
+            asm.lea(R15, mem(R14, -8))
+            asm.lea(RAX, mem(R14, DATA_STACK_SIZE))
+            asm.mov(rip("data_stack_end"), RAX)
+        self.cache = [R12]
+        self.known = 0
+
+        index: int = 0
+        while index < len(code):
+            instruction: Instruction = code[index]
+            index += 1
+            following: Op | None = code[index].op if index < len(code) else None
+
+            match instruction.op:
+                case Op.PUSH_INT if following in (Op.ADD, Op.LESS) and -2**31 <= instruction.arg << 2 < 2**31:
+                    self.require(1, code[index].token)
+                    if following == Op.ADD:
+                        self.generate_add(instruction.arg)
+                    elif index + 1 < len(code) and code[index + 1].op == Op.JUMP_IF_FALSE:
+                        self.generate_less_branch(instruction.arg, code[index + 1].arg)
+                        self.known -= 1
+                        index += 1
+                    else:
+                        self.generate_less(instruction.arg)
+                    index += 1
+
+                case Op.PUSH_INT:
+                    asm.mov_imm(self.push_register(), instruction.arg << 2)
+
+                case Op.PUSH_STRING:
+                    register: int = self.push_register()
+                    asm.lea(register, rip(asm.string(instruction.arg.encode())))
+                    asm.alu_imm(OR, register, STRING_TAG)
+
+                case Op.PUSH_BOOL:
+                    asm.mov_imm(self.push_register(), TRUE if instruction.arg else FALSE)
+
+                case Op.ADD:
+                    self.require(2, instruction.token)
+                    self.generate_add(None)
+                    self.known -= 1
+
+                case Op.LESS if following == Op.JUMP_IF_FALSE:
+                    self.require(2, instruction.token)
+                    self.generate_less_branch(None, code[index].arg)
+                    self.known -= 2
+                    index += 1
+
+                case Op.LESS:
+                    self.require(2, instruction.token)
+                    self.generate_less(None)
+                    self.known -= 1
+
+                case Op.EQUAL:
+                    self.require(2, instruction.token)
+                    self.generate_equal()
+                    self.known -= 1
+
+                case Op.DUP:
+                    self.require(1, instruction.token)
+                    self.fill(1)
+                    source: int = self.cache[-1]
+                    asm.mov(self.push_register(), source)
+
+                case Op.SWAP:
+                    self.require(2, instruction.token)
+                    self.fill(2)
+                    self.cache[-1], self.cache[-2] = self.cache[-2], self.cache[-1]
+
+                case Op.DROP:
+                    self.require(1, instruction.token)
+                    self.known -= 1
+                    if self.cache:
+                        self.cache.pop()
+                    else:
+                        asm.alu_imm(SUB, R15, 8)
+
+                case Op.PRINT:
+                    empty: str = self.new_label("empty")
+                    self.print_errors[empty] = instruction.token
+                    if self.cache:
+                        asm.lea(RAX, mem(R15, 8 * len(self.cache)))
+                        asm.alu(CMP, RAX, R14)
+                    else:
+                        asm.alu(CMP, R15, R14)
+                    asm.jcc(EQUAL, empty)
+                    self.fill(1)
+                    asm.mov(RAX, self.cache.pop())
+                    asm.call("print")
+                    self.known = max(self.known, 1) - 1
+
+                case Op.EXIT:
+                    self.spill(len(self.cache))
+                    asm.jmp("exit_with_top")
+
+                case Op.LABEL:
+                    self.canonical()
+                    asm.label(instruction.arg)
+                    self.known = 0
+
+                case Op.JUMP:
+                    self.canonical()
+                    asm.jmp(instruction.arg)
+
+                case Op.JUMP_IF_FALSE:
+                    self.require(1, instruction.token)
+                    self.generate_branch(instruction.arg)
+                    self.known -= 1
+
+                case Op.CALL:
+                    self.canonical()
+                    asm.comment(self.lowering.names[instruction.arg])
+                    asm.call(instruction.arg)
+                    self.known = 0 # procs take and leave any number of values
+
+                case Op.RETURN:
+                    self.canonical()
+                    asm.ret()
+
+        if label == "_start":
+            asm.alu(XOR, RDI, RDI)
+            asm.jmp("exit")
+        for stub in self.stubs:
+            stub()
+        self.stubs = []
+
+    def generate_runtime(self) -> None:
+        asm: Assembler = self.assembler
+        asm.reserve("data_stack", DATA_STACK_SIZE + 8)
+        asm.reserve("data_stack_end", 8) # r15 never goes past it
+        asm.reserve("output", OUTPUT_BUFFER_SIZE)
+        asm.reserve("output_length", 8)
+
+        # exit with the code in rdi, flushing stdout first
+        asm.label("exit")
+        asm.push(RDI)
+        asm.call("flush")
+        asm.pop(RDI)
+        asm.mov_imm(RAX, SYS_EXIT)
+        asm.syscall()
+
+        # "exit", like python's exit(value): numbers and bools are the code, a string is printed to stderr and the code is 1
+        asm.label("exit_with_top")
+        asm.alu(XOR, RDI, RDI)
+        asm.alu(CMP, R15, R14)
+        asm.jcc(EQUAL, "exit")
+        asm.alu_imm(SUB, R15, 8)
+        asm.mov(RAX, mem(R15))
+        asm.mov(RDI, RAX)
+        asm.sar(RDI, 2)
+        asm.test_low_byte(RAX, STRING_TAG)
+        asm.jcc(EQUAL, "exit")
+        asm.push(RAX)
+        asm.call("flush")
+        asm.pop(RAX)
+        asm.alu_imm(AND, RAX, -4)
+        asm.mov(RDX, mem(RAX))
+        asm.lea(RSI, mem(RAX, 8))
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.mov_imm(RDI, 2)
+        asm.syscall()
+        asm.lea(RSI, rip(asm.string(b"\n")))
+        asm.alu_imm(ADD, RSI, 8)
+        asm.mov_imm(RDX, 1)
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.syscall()
+        asm.mov_imm(RDI, 1)
+        asm.jmp("exit")
+
+        asm.label("stack_overflow")
+        message: bytes = f"Stack overflow, the data stack holds {DATA_STACK_SIZE // 8} values\n".encode()
+        asm.lea(RSI, rip(asm.string(message)))
+
+        # writes the string at rsi to stderr and exits with 1, each check jumps here with its own message
+        asm.label("runtime_error")
+        asm.push(RSI)
+        asm.call("flush")
+        asm.pop(RSI)
+        asm.mov(RDX, mem(RSI))
+        asm.alu_imm(ADD, RSI, 8)
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.mov_imm(RDI, 2)
+        asm.syscall()
+        asm.mov_imm(RDI, 1)
+        asm.jmp("exit")
+
+        asm.label("type_error")
+        asm.lea(RSI, rip(asm.string(b"TypeError: compiled code only adds and compares numbers\n")))
+        asm.jmp("runtime_error")
+
+        # the interpreter's numbers don't overflow, a wrong answer is worse than stopping
+        asm.label("overflow_error")
+        asm.lea(RSI, rip(asm.string(b"OverflowError: compiled code only has numbers from -2**61 to 2**61 - 1\n")))
+        asm.jmp("runtime_error")
+
+        # writes the whole output buffer to stdout
+        asm.label("flush")
+        asm.mov(RDX, rip("output_length"))
+        asm.lea(RSI, rip("output"))
+        asm.label("flush_more")
+        asm.test(RDX, RDX)
+        asm.jcc(EQUAL, "flushed")
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.mov_imm(RDI, 1)
+        asm.syscall()
+        asm.test(RAX, RAX)
+        asm.jcc(LESS, "flushed") # nothing more we can do about a failed write
+        asm.alu(ADD, RSI, RAX)
+        asm.alu(SUB, RDX, RAX)
+        asm.jmp("flush_more")
+        asm.label("flushed")
+        asm.mov_imm(rip("output_length"), 0)
+        asm.ret()
+
+        # buffers rdx bytes from rsi
+        asm.label("write")
+        asm.mov(RAX, rip("output_length"))
+        asm.alu(ADD, RAX, RDX)
+        asm.alu_imm(CMP, RAX, OUTPUT_BUFFER_SIZE)
+        asm.jcc(BELOW_EQUAL, "buffer")
+        asm.push(RSI)
+        asm.push(RDX)
+        asm.call("flush")
+        asm.pop(RDX)
+        asm.pop(RSI)
+        asm.alu_imm(CMP, RDX, OUTPUT_BUFFER_SIZE)
+        asm.jcc(BELOW_EQUAL, "buffer")
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.mov_imm(RDI, 1)
+        asm.syscall()
+        asm.ret()
+        asm.label("buffer")
+        asm.lea(RDI, rip("output"))
+        asm.alu_load(ADD, RDI, rip("output_length"))
+        asm.mov(RCX, RDX)
+        asm.rep_movsb()
+        asm.alu(ADD, rip("output_length"), RDX)
+        asm.ret()
+
+        # prints the value in rax and a newline
+        asm.label("print")
+        asm.test_low_byte(RAX, 3)
+        asm.jcc(NOT_EQUAL, "print_other")
+        asm.sar(RAX, 2)
+        asm.alu_imm(SUB, RSP, 32)
+        asm.lea(RDI, mem(RSP, 32))
+        asm.dec(RDI)
+        asm.mov_imm(RCX, 10)
+        asm.mov_byte(mem(RDI), RCX)
+        asm.mov(R8, RAX)
+        asm.test(RAX, RAX)
+        asm.jcc(NOT_SIGN, "digits")
+        asm.neg(RAX)
+        asm.label("digits")
+        asm.alu(XOR, RDX, RDX)
+        asm.div(RCX)
+        asm.alu_imm(ADD, RDX, ord("0"))
+        asm.dec(RDI)
+        asm.mov_byte(mem(RDI), RDX)
+        asm.test(RAX, RAX)
+        asm.jcc(NOT_EQUAL, "digits")
+        asm.test(R8, R8)
+        asm.jcc(NOT_SIGN, "print_digits")
+        asm.dec(RDI)
+        asm.mov_imm(RCX, ord("-"))
+        asm.mov_byte(mem(RDI), RCX)
+        asm.label("print_digits")
+        asm.mov(RSI, RDI)
+        asm.lea(RDX, mem(RSP, 32))
+        asm.alu(SUB, RDX, RDI)
+        asm.call("write")
+        asm.alu_imm(ADD, RSP, 32)
+        asm.ret()
+        asm.label("print_other")
+        asm.test_low_byte(RAX, STRING_TAG)
+        asm.jcc(NOT_EQUAL, "print_string")
+        for value, text, skip in ((TRUE, b"True\n", "print_false"), (FALSE, b"False\n", "print_string")):
+            asm.alu_imm(CMP, RAX, value)
+            asm.jcc(NOT_EQUAL, skip)
+            asm.lea(RSI, rip(asm.string(text)))
+            asm.alu_imm(ADD, RSI, 8)
+            asm.mov_imm(RDX, len(text))
+            asm.jmp("write")
+            asm.label(skip)
+        asm.alu_imm(AND, RAX, -4)
+        asm.mov(RDX, mem(RAX))
+        asm.lea(RSI, mem(RAX, 8))
+        asm.call("write")
+        asm.lea(RSI, rip(asm.string(b"\n")))
+        asm.alu_imm(ADD, RSI, 8)
+        asm.mov_imm(RDX, 1)
+        asm.jmp("write")
+
+        # rax == rbx into rax, strings by contents, numbers and bools by value (so 1 == True like in python)
+        asm.label("equal")
+        asm.mov(RCX, RAX)
+        asm.alu(XOR, RCX, RBX)
+        asm.test_low_byte(RCX, STRING_TAG)
+        asm.jcc(NOT_EQUAL, "unequal") # one string, one not
+        asm.test_low_byte(RAX, STRING_TAG)
+        asm.jcc(NOT_EQUAL, "equal_strings")
+        asm.sar(RAX, 2)
+        asm.sar(RBX, 2)
+        asm.alu(CMP, RAX, RBX)
+        asm.jmp("equal_result")
+        asm.label("equal_strings")
+        asm.alu_imm(AND, RAX, -4)
+        asm.alu_imm(AND, RBX, -4)
+        asm.mov(RCX, mem(RAX))
+        asm.alu_load(CMP, RCX, mem(RBX))
+        asm.jcc(NOT_EQUAL, "equal_result")
+        asm.lea(RSI, mem(RAX, 8))
+        asm.lea(RDI, mem(RBX, 8))
+        asm.repe_cmpsb() # leaves the flags of the length compare alone when the length is 0
+        asm.label("equal_result")
+        asm.setcc(EQUAL, RAX)
+        asm.movzx_byte(RAX, RAX)
+        asm.shl(RAX, 2)
+        asm.alu_imm(OR, RAX, BOOL_TAG)
+        asm.ret()
+        asm.label("unequal")
+        asm.mov_imm(RAX, FALSE)
+        asm.ret()
+
+        for label, token in self.print_errors.items():
+            message = f"{token.filename}:{token.position[0]}:{token.position[1]}: Attempting to print from an empty stack..\n".encode()
+            asm.label(label)
+            asm.lea(RSI, rip(asm.string(message)))
+            asm.alu_imm(ADD, RSI, 8)
+            asm.mov_imm(RDX, len(message))
+            asm.call("write")
+            asm.alu(XOR, RDI, RDI) # the interpreter just stops there
+            asm.jmp("exit")
+
+        for label, token in self.underflow_errors.items():
+            message = f"{token.filename}:{token.position[0]}:{token.position[1]}: Stack underflow\n".encode()
+            asm.label(label)
+            asm.lea(RSI, rip(asm.string(message)))
+            asm.jmp("runtime_error")
+
+    def generate(self) -> Assembler:
+        if not self.generated:
+            for label, code in self.lowering.lower().items():
+                self.generate_function(label, code)
+            self.generate_runtime()
+            self.generated = True
+        return self.assembler
+
+    def compile(self) -> str:
+        return self.generate().text("_start")
 
-    def __init__(self, tokens: list[Token]) -> None:
-        self.tokens: list[Token] = tokens
-
-        self.index: int = 0
-        self.stack: list[any] = []
-
-        self.data: str = "section .data\n"
-        self.main_block: str = "\nsection .text\nglobal _start\n_start:\n"
-
-        self.procs: dict[str, str] = {}
-        self.strings: dict[str, str] = {}
-
-    def at_end(self) -> bool:
-        return self.tokens[self.index] == TokenType.EOF
-    
-    def peek(self) -> Token:
-        return self.tokens[self.index]
-    
-    def advance(self) -> Token:
-        token: Token = self.tokens[self.index]
-        self.index += 1
-        return token
-
-    def compile_token(self) -> None:
-        token: Token = self.advance()
-
-        match token._type:
-
-            case TokenType.PUSH:
-                if token.value_type == TokenType.STRING:
-                    self.stack.append(token.value)
-                    if not (token.value in self.strings.keys()):
-                        self.strings[token.value] = "".join(choices(CHARACTERS, k=30))
-                        self.data += f"  {self.strings[token.value]}: db \"{token.value}\", 10\n  {self.strings[token.value]}_len: equ $-{self.strings[token.value]}\n"
-                else:
-                    self.main_block += f"  push {token.value}\n"
-
-            case TokenType.PRINT:
-                string_id: str = self.strings[self.stack.pop()]
-                self.main_block += f"  mov eax, 4\n  mov ebx, 1\n  mov ecx, {string_id}\n  mov edx, {string_id}_len\n  int 80h\n"
-
-
-    def compile(self) -> None:
-        while self.peek()._type != TokenType.EOF:
-            self.compile_token()
-        self.main_block += "  mov eax, 1\n  mov ebx, 0\n  int 80h"
-        return self.data + self.main_block
\ No newline at end of file
+    def write(self, path: str) -> None:
+        write_executable(path, self.generate(), "_start")
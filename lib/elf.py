@@ -0,0 +1,57 @@
+from struct import Struct
+import os
+
+from .x86 import Assembler
+
+BASE_ADDRESS: int = 0x400000
+PAGE_SIZE: int = 0x1000
+
+ELF_HEADER: Struct = Struct("<16sHHIQQQIHHHHHH")
+PROGRAM_HEADER: Struct = Struct("<IIQQQQQQ")
+CODE_OFFSET: int = ELF_HEADER.size + 2 * PROGRAM_HEADER.size # code follows the headers in the first segment
+
+PT_LOAD: int = 1
+PF_X: int = 1
+PF_W: int = 2
+PF_R: int = 4
+
+def data_offset(code_size: int) -> int:
+    return (CODE_OFFSET + code_size + PAGE_SIZE - 1) & ~(PAGE_SIZE - 1)
+
+def write_executable(path: str, assembler: Assembler, entry: str) -> None:
+    """
+    Writes a static x86-64 Linux executable with two segments, the headers and
+    code (read/execute) and the data followed by the bss (read/write).
+    """
+    code_address: int = BASE_ADDRESS + CODE_OFFSET
+    offset: int = data_offset(len(assembler.code))
+    data_address: int = BASE_ADDRESS + offset
+    code: bytes = assembler.link(code_address, data_address)
+    data_size: int = len(assembler.data) + (-len(assembler.data) % 16)
+
+    header: bytes = ELF_HEADER.pack(
+        b"\x7fELF\x02\x01\x01" + bytes(9), # 64 bit, little endian, current version, System V
+        2,    # ET_EXEC
+        0x3E, # x86-64
+        1,
+        code_address + assembler.labels[entry],
+        ELF_HEADER.size, # program headers right after this one
+        0,               # no section headers
+        0,
+        ELF_HEADER.size,
+        PROGRAM_HEADER.size,
+        2,
+        0,
+        0,
+        0,
+    )
+    text: bytes = PROGRAM_HEADER.pack(PT_LOAD, PF_R | PF_X, 0, BASE_ADDRESS, BASE_ADDRESS, CODE_OFFSET + len(code), CODE_OFFSET + len(code), PAGE_SIZE)
+    data: bytes = PROGRAM_HEADER.pack(PT_LOAD, PF_R | PF_W, offset, data_address, data_address, len(assembler.data), data_size + assembler.bss_size, PAGE_SIZE)
+
+    temporary_path: str = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(header + text + data + code)
+        file.write(bytes(offset - CODE_OFFSET - len(code)))
+        file.write(assembler.data)
+    os.chmod(temporary_path, 0o755)
+    os.replace(temporary_path, path)
@@ -0,0 +1,207 @@
+from typing import Any, Dict, List, Tuple
+
+from .bytecode import Block, Bytecode, CONST_OPERANDS, NO_ASSIGN, Opcode
+from .tokentype import Token, TokenType
+from .vm import VM
+
+# plain ints so the dispatch loop compares locals instead of enum members
+PUSH_CONST: int = int(Opcode.PUSH_CONST)
+PUSH_NAME: int = int(Opcode.PUSH_NAME)
+PLUS: int = int(Opcode.PLUS)
+LT: int = int(Opcode.LT)
+EQUAL_EQUAL: int = int(Opcode.EQUAL_EQUAL)
+DUP: int = int(Opcode.DUP)
+SWAP: int = int(Opcode.SWAP)
+DROP: int = int(Opcode.DROP)
+PRINT: int = int(Opcode.PRINT)
+STORE_VAR: int = int(Opcode.STORE_VAR)
+LOAD_VAR: int = int(Opcode.LOAD_VAR)
+CALL: int = int(Opcode.CALL)
+RETURN: int = int(Opcode.RETURN)
+JUMP: int = int(Opcode.JUMP)
+JUMP_IF_FALSE: int = int(Opcode.JUMP_IF_FALSE)
+DEFINE_PROC: int = int(Opcode.DEFINE_PROC)
+PUSH_PROC: int = int(Opcode.PUSH_PROC)
+DEFINE_MACRO: int = int(Opcode.DEFINE_MACRO)
+HALT: int = int(Opcode.HALT)
+
+class Engine:
+    """
+    Runs Bytecode with a single dispatch loop, procs and macros are entered by
+    pushing a return address instead of recursing into Python.
+    """
+
+    def __init__(self, bytecode: Bytecode) -> None:
+        self.vm: VM = VM()
+        self.bytecode: Bytecode = bytecode
+        self.stack: list = []
+        self.call_stack: List[int] = []
+
+        self.variables: Dict[str, Any] = {}
+        self.procs: Dict[str, Block] = {}
+        self.macros: Dict[str, Block] = {}
+        self.structs: Dict[str, Dict[str, Tuple[Any, TokenType]]] = {}
+
+        # constant pool operands are resolved once up front, the loop only unpacks (opcode, operand)
+        consts: List[Any] = bytecode.consts
+        self.instructions: List[Tuple[int, Any]] = [
+            (opcode, consts[arg] if opcode in CONST_OPERANDS else arg) for opcode, arg in zip(bytecode.code, bytecode.args)
+        ]
+
+    def print_error(self, token: Token, error: str) -> None:
+        print(f"{token.filename}:{token.position[0]}:{token.position[1]}: {error}")
+
+    def run(self) -> None:
+        instructions: List[Tuple[int, Any]] = self.instructions
+        stack: list = self.stack
+        push = stack.append
+        pop = stack.pop
+        frames: List[int] = self.call_stack
+        macros: Dict[str, Block] = self.macros
+        procs: Dict[str, Block] = self.procs
+        variables: Dict[str, Any] = self.variables
+        pc: int = 0
+
+        while True:
+            opcode, arg = instructions[pc]
+            pc += 1
+
+            if opcode == PUSH_CONST:
+                push(arg)
+
+            elif opcode == PUSH_NAME:
+                if arg in macros:
+                    frames.append(pc)
+                    pc = macros[arg].entry
+                else:
+                    push(arg)
+
+            elif opcode == CALL:
+                target = pop()
+                if target.__class__ is not Block:
+                    target = procs[target]
+                frames.append(pc)
+                pc = target.entry
+
+            elif opcode == RETURN:
+                pc = frames.pop()
+
+            elif opcode == PLUS:
+                num_1 = pop()
+                push(num_1 + pop())
+
+            elif opcode == LT:
+                item_1 = pop()
+                push(pop() < item_1)
+
+            elif opcode == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+
+            elif opcode == JUMP:
+                pc = arg
+
+            elif opcode == DUP:
+                push(stack[-1])
+
+            elif opcode == SWAP:
+                stack[-1], stack[-2] = stack[-2], stack[-1]
+
+            elif opcode == EQUAL_EQUAL:
+                push(pop() == pop())
+
+            elif opcode == STORE_VAR:
+                contents = pop()
+                variables[pop()] = contents
+
+            elif opcode == LOAD_VAR:
+                push(variables[pop()])
+
+            elif opcode == DROP:
+                name = pop()
+                if name in variables:
+                    del variables[name]
+
+            elif opcode == PRINT:
+                if not stack:
+                    self.print_error(arg, "Attempting to print from an empty stack..")
+                    return
+                print(pop())
+
+            elif opcode == DEFINE_PROC:
+                procs[arg.name] = arg
+                pc = arg.end
+
+            elif opcode == PUSH_PROC:
+                push(arg)
+                pc = arg.end
+
+            elif opcode == DEFINE_MACRO:
+                macros[arg.name] = arg
+                pc = arg.end
+
+            elif opcode == HALT:
+                return
+
+            else:
+                self.execute_rare(opcode, arg)
+
+    def execute_rare(self, opcode: int, arg: Any) -> None:
+        match opcode:
+
+            case Opcode.DEFINE_STRUCT:
+                name, fields = arg
+                self.structs[name] = dict(fields)
+
+            case Opcode.LOAD_PROC:
+                self.stack.append(self.procs[arg])
+
+            case Opcode.ALIAS_PROC:
+                name, proc_name = arg
+                self.procs[name] = self.procs[proc_name]
+
+            case Opcode.GRAB_OBJECT:
+                for item in self.stack:
+                    if isinstance(item, Block):
+                        self.procs[arg] = item
+                        self.stack.remove(item)
+                        break
+
+            case Opcode.ASSIGN_POPPED:
+                name = self.stack.pop()
+                _object = self.stack.pop()
+                if isinstance(_object, Block):
+                    self.procs[name] = _object
+
+            case Opcode.STRUCT_VAR:
+                name, struct_name = arg
+                self.variables[name] = self.structs[struct_name]
+
+            case Opcode.CALL_STRUCT:
+                self.stack.append(self.structs[self.stack.pop()])
+
+            case Opcode.ARROW:
+                struct: dict = self.stack.pop()
+                param, content = arg
+                if content is not NO_ASSIGN:
+                    struct[param] = (content, struct[param][1])
+                else:
+                    self.stack.append(struct[param][0])
+
+            case Opcode.EXIT:
+                if len(self.stack) >= 1:
+                    exit(self.stack.pop())
+                else:
+                    exit()
+
+    def interpret(self, show_registers: bool, show_vars: bool, deconstruct: bool, proc_to_deconstruct: str) -> None:
+        self.run()
+        if show_vars:
+            print(self.variables)
+        if deconstruct:
+            if proc_to_deconstruct in self.procs.keys():
+                print(f"Result of \"{proc_to_deconstruct}\":")
+                [print(f"    {token._type}") for token in self.procs[proc_to_deconstruct].tokens]
+            elif proc_to_deconstruct in self.macros.keys():
+                print(f"Expansion of \"{proc_to_deconstruct}\":")
+                [print(f"    {token._type}") for token in self.macros[proc_to_deconstruct].tokens]
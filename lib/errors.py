@@ -0,0 +1,21 @@
+class FinnError(Exception):
+    """
+    What a program fails with instead of exiting the process. The message is
+    what the CLI prints before exiting with 1, "file:line:col: what went wrong"
+    when there's a place to point at.
+    """
+
+class CompileError(FinnError):
+    """
+    Lexing, including, expanding or lowering a program failed.
+    """
+
+class ExecutionError(FinnError):
+    """
+    The program failed while it ran.
+    """
+
+class LimitError(ExecutionError):
+    """
+    A run went past one of its Limits (see lib.api).
+    """
@@ -0,0 +1,142 @@
+from typing import Dict, List, Set, Tuple
+
+from .errors import CompileError
+from .expr import Expr, Push, Word, Proc, Macro, Struct, Bind
+from .jumptable import resolve_jumps
+from .parser import Parser
+from .tokentype import Token, TokenType
+
+MAX_EXPANSION_DEPTH: int = 64
+
+def reads_raw(tokens: List[Token], index: int) -> bool:
+    """
+    Whether the interpreter reads the identifier at index as a name instead of
+    running it, "name ::", "|name|", "-> field value =" and ":: <Struct>".
+    """
+    following: Token | None = tokens[index + 1] if index + 1 < len(tokens) else None
+    if following is not None and following._type == TokenType.OBJECT_ASSIGN:
+        return True
+    if index == 0:
+        return False
+    previous: Token = tokens[index - 1]
+    if previous._type in (TokenType.PIPE, TokenType.ARROW):
+        return True
+    if index >= 2 and previous._type == TokenType.LT and tokens[index - 2]._type == TokenType.OBJECT_ASSIGN:
+        return True
+    return index >= 2 and tokens[index - 2]._type == TokenType.ARROW and following is not None and following._type == TokenType.EQUAL
+
+class MacroExpander:
+    """
+    Splices macro bodies in place of their uses before anything runs, so a macro
+    costs nothing at runtime. Only macros defined once, at the top level, are
+    expanded, and only where their definition comes first. Anything else is left
+    to the interpreter, the definitions stay in the stream for that.
+
+    A body is expanded once where it's defined (so -deconstruct and the interpreter
+    see the expanded form too), every use then gets fresh copies of its tokens since
+    jumps and inline caches are keyed by token. Which macros qualify is read off
+    the program's AST, parsed here unless the caller already has it.
+    """
+
+    def __init__(self, tokens: List[Token], program: List[Expr] | None = None) -> None:
+        self.tokens: List[Token] = tokens
+        self.program: List[Expr] | None = program # Parser(tokens).parse()
+        self.jumps: Dict[Token, int] = {} # resolved by expand, only when there's a macro at all
+
+        self.macros: Dict[str, List[Token]] = {} # name -> expanded body
+        self.depths: Dict[str, int] = {} # name -> how many macros deep its expansion goes
+        self.dynamic: Set[str] = set() # names the interpreter has to resolve
+        self.bindings: Dict[str, int] = {} # name -> how many times it's bound
+        self.expanding: List[Tuple[str, Token, int]] = [] # (name, name token, deepest macro used so far) per body being expanded
+
+        self.expansions: int = 0
+
+    def error(self, token: Token, message: str) -> None:
+        raise CompileError(f"{token.filename}:{token.position[0]}:{token.position[1]}: {message}")
+
+    def body(self, tokens: List[Token], opener: int) -> List[Token]:
+        return tokens[opener + 1 : opener + self.jumps[tokens[opener]]]
+
+    def collect(self, body: List[Expr], nested: bool) -> None:
+        previous: Expr | None = None
+        for expr in body:
+            name: str | None = None
+            if isinstance(expr, (Proc, Macro, Struct, Bind)):
+                name = expr.name
+            elif isinstance(expr, Word) and expr._type == TokenType.OBJECT_ASSIGN and isinstance(previous, Push) and previous.value_type == TokenType.IDENTIFIER:
+                name = previous.value
+            if name is not None:
+                self.bindings[name] = self.bindings.get(name, 0) + 1
+                if nested or not isinstance(expr, Macro) or not self.expandable(expr.body):
+                    self.dynamic.add(name)
+            for child in expr.children():
+                self.collect(child, True)
+            previous = expr
+
+    def expandable(self, body: List[Expr]) -> bool:
+        """
+        Bodies with definitions in them are left to the interpreter, it complains about them.
+        """
+        for expr in body:
+            if isinstance(expr, (Proc, Macro, Struct)) or not self.expandable([child for children in expr.children() for child in children]):
+                return False
+        return True
+
+    def define(self, tokens: List[Token], index: int, output: List[Token]) -> int:
+        """
+        Copies the macro or struct definition whose "::" is at index, returns where it ends.
+        """
+        name_token: Token = tokens[index - 1]
+        end: int = index + 1 + self.jumps[tokens[index + 1]]
+        output.extend(tokens[index : index + 2])
+        if tokens[index + 1]._type == TokenType.MACRO and name_token.value not in self.dynamic:
+            self.expanding.append((name_token.value, name_token, 0))
+            body: List[Token] = []
+            self.expand_into(self.body(tokens, index + 1), body)
+            depth: int = self.expanding.pop()[2] + 1
+            if depth > MAX_EXPANSION_DEPTH:
+                self.error(name_token, f"Macro \"{name_token.value}\" nests {depth} macros deep, the limit is {MAX_EXPANSION_DEPTH}")
+            self.macros[name_token.value] = body
+            self.depths[name_token.value] = depth
+            output.extend(body)
+        else:
+            output.extend(tokens[index + 2 : end])
+        output.extend(tokens[end : end + 1])
+        return end + 1
+
+    def expand_into(self, tokens: List[Token], output: List[Token]) -> None:
+        index: int = 0
+        while index < len(tokens):
+            token: Token = tokens[index]
+
+            if token._type == TokenType.OBJECT_ASSIGN and index and index + 1 < len(tokens) and tokens[index + 1]._type in (TokenType.MACRO, TokenType.STRUCT):
+                index = self.define(tokens, index, output)
+                continue
+
+            if token._type == TokenType.PUSH and token.value_type == TokenType.IDENTIFIER and (token.value in self.macros or self.expanding) and not reads_raw(tokens, index):
+                for name, name_token, _ in self.expanding:
+                    if name == token.value:
+                        self.error(token, f"Macro \"{name}\" uses itself, it would never stop expanding (defined at {name_token.filename}:{name_token.position[0]}:{name_token.position[1]})")
+                if token.value in self.macros:
+                    if self.expanding:
+                        name, name_token, depth = self.expanding[-1]
+                        self.expanding[-1] = (name, name_token, max(depth, self.depths[token.value]))
+                    output.extend([Token(part._type, part.value, part.value_type, (part.line, part.column), part.filename) for part in self.macros[token.value]])
+                    self.expansions += 1
+                    index += 1
+                    continue
+
+            output.append(token)
+            index += 1
+
+    def expand(self) -> List[Token]:
+        if not any(token._type == TokenType.MACRO for token in self.tokens):
+            return self.tokens
+        if self.program is None:
+            self.program = Parser(self.tokens).parse()
+        self.jumps = resolve_jumps(self.tokens)
+        self.collect(self.program, False)
+        self.dynamic.update(name for name, count in self.bindings.items() if count > 1)
+        output: List[Token] = []
+        self.expand_into(self.tokens, output)
+        return output
@@ -1,2 +1,234 @@
+from typing import Any, List, Tuple
 
-class Expr:...
\ No newline at end of file
+from .tokentype import Token, TokenType
+
+class Span:
+    """
+    The first and last token of an expr, positions are read off them when asked
+    for so parsing doesn't build two tuples per node.
+    """
+
+    __slots__ = ("first", "last")
+
+    def __init__(self, first: Token, last: Token) -> None:
+        self.first: Token = first
+        self.last: Token = last
+
+    @property
+    def filename(self) -> str:
+        return self.first.filename
+
+    @property
+    def start(self) -> Tuple[int, int]:
+        return (self.first.line, self.first.column)
+
+    @property
+    def end(self) -> Tuple[int, int]:
+        return (self.last.line, self.last.column)
+
+    def __repr__(self) -> str:
+        return f"{self.first.filename}:{self.first.line}:{self.first.column}-{self.last.line}:{self.last.column}"
+
+class Expr:
+    """
+    Keeps its first and last token rather than a Span, one object less per node.
+    """
+
+    __slots__ = ("first", "last")
+
+    def __init__(self, first: Token, last: Token) -> None:
+        self.first: Token = first
+        self.last: Token = last
+
+    @property
+    def span(self) -> Span:
+        return Span(self.first, self.last)
+
+    def children(self) -> List[List["Expr"]]:
+        return []
+
+    def describe(self) -> str:
+        return type(self).__name__
+
+    def pprint(self, depth: int = 0) -> None:
+        print(f"{'    ' * depth}{self.describe()} @ {self.span}")
+        for body in self.children():
+            for expr in body:
+                expr.pprint(depth + 1)
+
+class Push(Expr):
+
+    __slots__ = ("value", "value_type")
+
+    def __init__(self, first: Token, last: Token, value: Any, value_type: TokenType) -> None:
+        super().__init__(first, last)
+        self.value: Any = value
+        self.value_type: TokenType = value_type
+
+    def describe(self) -> str:
+        return f"Push {self.value!r} ({self.value_type.name.lower()})"
+
+class Word(Expr):
+    """
+    Any intrinsic or operator that just acts on the stack (+, dup, out, = ...)
+    """
+
+    __slots__ = ("_type",)
+
+    def __init__(self, first: Token, last: Token, _type: TokenType) -> None:
+        super().__init__(first, last)
+        self._type: TokenType = _type
+
+    def describe(self) -> str:
+        return f"Word {self._type.name}"
+
+class Call(Expr):
+    """
+    name() - the name is known statically, a bare "()" after anything else stays a Word
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, first: Token, last: Token, name: str) -> None:
+        super().__init__(first, last)
+        self.name: str = name
+
+    def describe(self) -> str:
+        return f"Call {self.name}"
+
+class If(Expr):
+
+    __slots__ = ("then_body", "else_body")
+
+    def __init__(self, first: Token, last: Token, then_body: List[Expr], else_body: List[Expr] | None) -> None:
+        super().__init__(first, last)
+        self.then_body: List[Expr] = then_body
+        self.else_body: List[Expr] | None = else_body
+
+    def children(self) -> List[List[Expr]]:
+        return [self.then_body] if self.else_body is None else [self.then_body, self.else_body]
+
+    def pprint(self, depth: int = 0) -> None:
+        print(f"{'    ' * depth}If @ {self.span}")
+        for expr in self.then_body:
+            expr.pprint(depth + 1)
+        if self.else_body is not None:
+            print(f"{'    ' * depth}Else")
+            for expr in self.else_body:
+                expr.pprint(depth + 1)
+
+class Proc(Expr):
+    """
+    name :: proc ... end, or an anonymous "proc ... end" when name is None
+    """
+
+    __slots__ = ("name", "body")
+
+    def __init__(self, first: Token, last: Token, name: str | None, body: List[Expr]) -> None:
+        super().__init__(first, last)
+        self.name: str | None = name
+        self.body: List[Expr] = body
+
+    def children(self) -> List[List[Expr]]:
+        return [self.body]
+
+    def describe(self) -> str:
+        return f"Proc {self.name if self.name is not None else '<lambda>'}"
+
+class Macro(Expr):
+
+    __slots__ = ("name", "body")
+
+    def __init__(self, first: Token, last: Token, name: str, body: List[Expr]) -> None:
+        super().__init__(first, last)
+        self.name: str = name
+        self.body: List[Expr] = body
+
+    def children(self) -> List[List[Expr]]:
+        return [self.body]
+
+    def describe(self) -> str:
+        return f"Macro {self.name}"
+
+class Struct(Expr):
+
+    __slots__ = ("name", "fields")
+
+    def __init__(self, first: Token, last: Token, name: str, fields: List[Tuple[str, TokenType | None]]) -> None:
+        super().__init__(first, last)
+        self.name: str = name
+        self.fields: List[Tuple[str, TokenType | None]] = fields
+
+    def describe(self) -> str:
+        return f"Struct {self.name} {{{', '.join(f'{field}: {_type.name.lower() if _type else None}' for field, _type in self.fields)}}}"
+
+class Unwrap(Expr):
+    """
+    |name| - pushes the body of a proc
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, first: Token, last: Token, name: str) -> None:
+        super().__init__(first, last)
+        self.name: str = name
+
+    def describe(self) -> str:
+        return f"Unwrap {self.name}"
+
+class Grab(Expr):
+    """
+    ... - takes the first proc off the stack (only valid as the source of a Bind)
+    """
+
+    __slots__ = ()
+
+    def describe(self) -> str:
+        return "Grab"
+
+class Instance(Expr):
+    """
+    <Name> - the struct a variable gets bound to
+    """
+
+    __slots__ = ("struct_name",)
+
+    def __init__(self, first: Token, last: Token, struct_name: str) -> None:
+        super().__init__(first, last)
+        self.struct_name: str = struct_name
+
+    def describe(self) -> str:
+        return f"Instance {self.struct_name}"
+
+class Bind(Expr):
+    """
+    name :: |other|, name :: ... and name :: <Struct>
+    """
+
+    __slots__ = ("name", "source")
+
+    def __init__(self, first: Token, last: Token, name: str, source: Expr) -> None:
+        super().__init__(first, last)
+        self.name: str = name
+        self.source: Expr = source
+
+    def children(self) -> List[List[Expr]]:
+        return [[self.source]]
+
+    def describe(self) -> str:
+        return f"Bind {self.name}"
+
+class Arrow(Expr):
+    """
+    -> field reads a struct field, -> field value = writes one
+    """
+
+    __slots__ = ("field", "content")
+
+    def __init__(self, first: Token, last: Token, field: str, content: Push | None) -> None:
+        super().__init__(first, last)
+        self.field: str = field
+        self.content: Push | None = content
+
+    def describe(self) -> str:
+        return f"Arrow {self.field}" if self.content is None else f"Arrow {self.field} = {self.content.value!r}"
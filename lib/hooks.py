@@ -0,0 +1,44 @@
+from typing import Any, Tuple
+
+from .tokentype import Token
+
+EVENTS: Tuple[str, ...] = ("on_token", "on_call", "on_return", "on_branch", "on_alloc", "on_free")
+
+class Hook:
+    """
+    Base class for tools that trace an Interpreter (debuggers, coverage, custom
+    profilers), attach one with Interpreter.add_hook. Only the events a subclass
+    overrides are called, an object that isn't a Hook works too as long as it
+    has the methods it wants called.
+    """
+
+    def on_token(self, interpreter: Any, token: Token) -> None:
+        """
+        Before token runs, interpreter.index is already past it.
+        """
+
+    def on_call(self, interpreter: Any, name: str) -> None:
+        """
+        Before a proc runs, name is "lambda" for a proc value.
+        """
+
+    def on_return(self, interpreter: Any, name: str) -> None:
+        """
+        After a proc is done, a tail call returns from the proc it's made in
+        right before its own on_call.
+        """
+
+    def on_branch(self, interpreter: Any, token: Token, taken: bool) -> None:
+        """
+        After an "if" decided, taken is whether its body runs.
+        """
+
+    def on_alloc(self, interpreter: Any, address: hex, size: int, value: Any) -> None:
+        ...
+
+    def on_free(self, interpreter: Any, address: hex) -> None:
+        ...
+
+def overrides(hook: Any, event: str) -> bool:
+    method: Any = getattr(type(hook), event, None)
+    return method is not None and method is not getattr(Hook, event)
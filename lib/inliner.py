@@ -0,0 +1,98 @@
+from typing import Dict, List, Set
+
+from .expander import reads_raw
+from .interpreter import OPENERS
+from .jumptable import resolve_jumps
+from .tokentype import Token, TokenType
+
+INLINE_BUDGET: int = 24 # most tokens a proc body can have and still be inlined
+
+# bodies with these read tokens around them or define things, inlining would change what they see
+NOT_INLINABLE: tuple[TokenType, ...] = (
+    TokenType.OBJECT_ASSIGN, TokenType.ARROW, TokenType.PIPE, TokenType.PROC, TokenType.MACRO, TokenType.STRUCT, TokenType.INCLUDE,
+)
+
+class Inliner:
+    """
+    Replaces "name()" with the body of name, for procs that are small, don't call
+    themselves and are only ever bound once (by a top-level "name :: proc").
+    Like macros, only calls after the definition are inlined and each one gets
+    fresh copies of the body tokens. The definitions stay for everything else.
+    """
+
+    def __init__(self, tokens: List[Token], budget: int = INLINE_BUDGET) -> None:
+        self.tokens: List[Token] = tokens
+        self.budget: int = budget
+        self.jumps: Dict[Token, int] = {}
+
+        self.candidates: Set[str] = set()
+        self.bodies: Dict[str, List[Token]] = {} # name -> body to inline
+
+        self.inlined: int = 0
+
+    def collect(self) -> None:
+        bindings: Dict[str, int] = {}
+        depth: int = 0
+        for index, token in enumerate(self.tokens):
+            if token._type in OPENERS:
+                depth += 1
+            elif token._type == TokenType.END and depth:
+                depth -= 1
+            elif token._type == TokenType.OBJECT_ASSIGN and index:
+                name = self.tokens[index - 1].value
+                bindings[name] = bindings.get(name, 0) + 1
+                if not depth and index + 1 < len(self.tokens) and self.tokens[index + 1]._type == TokenType.PROC:
+                    self.candidates.add(name)
+        self.candidates = { name for name in self.candidates if bindings[name] == 1 }
+
+    def inlinable(self, name: str, body: List[Token]) -> bool:
+        if len(body) > self.budget:
+            return False
+        jumps: Dict[Token, int] = resolve_jumps(body)
+        for index, token in enumerate(body):
+            if token._type in NOT_INLINABLE:
+                return False
+            if token._type in (TokenType.IF, TokenType.ELSE) and index + jumps.get(token, len(body)) >= len(body):
+                return False # a stray else, or an if the body doesn't close
+            if token._type == TokenType.PUSH and token.value == name and index + 1 < len(body) and body[index + 1]._type == TokenType.CALL:
+                return False # calls itself
+        return True
+
+    def inline_into(self, tokens: List[Token], output: List[Token]) -> None:
+        index: int = 0
+        while index < len(tokens):
+            token: Token = tokens[index]
+
+            if token._type == TokenType.OBJECT_ASSIGN and index and tokens[index - 1].value in self.candidates and index + 1 < len(tokens) and tokens[index + 1]._type == TokenType.PROC:
+                name: str = tokens[index - 1].value
+                end: int = index + 1 + self.jumps[tokens[index + 1]]
+                body: List[Token] = []
+                self.inline_into(tokens[index + 2 : end], body)
+                output.extend(tokens[index : index + 2])
+                output.extend(body)
+                output.extend(tokens[end : end + 1])
+                if end < len(tokens) and self.inlinable(name, body):
+                    self.bodies[name] = body
+                index = end + 1
+                continue
+
+            if (token._type == TokenType.PUSH and token.value_type == TokenType.IDENTIFIER and token.value in self.bodies
+                    and index + 1 < len(tokens) and tokens[index + 1]._type == TokenType.CALL and not reads_raw(tokens, index)):
+                output.extend([Token(part._type, part.value, part.value_type, (part.line, part.column), part.filename) for part in self.bodies[token.value]])
+                self.inlined += 1
+                index += 2
+                continue
+
+            output.append(token)
+            index += 1
+
+    def inline(self) -> List[Token]:
+        if not any(token._type == TokenType.PROC for token in self.tokens):
+            return self.tokens
+        self.jumps = resolve_jumps(self.tokens)
+        self.collect()
+        if not self.candidates:
+            return self.tokens
+        output: List[Token] = []
+        self.inline_into(self.tokens, output)
+        return output
@@ -1,43 +1,58 @@
-from typing import Any, Dict, List, Literal, Tuple, Type, Union
+from types import MethodType
+from typing import Any, Dict, Iterator, List, Literal, TextIO, Tuple, Type, Union
 
+from .errors import ExecutionError
+from .hooks import EVENTS, overrides
+from .jumptable import resolve_jumps
 from .tokentype import Token, TokenType
 from .vm import VM
 
+# what an identifier at a PUSH site resolved to, see Interpreter.resolve_push
+CACHE_LITERAL: int = 0
+CACHE_MACRO: int = 1
+CACHE_CALL: int = 2 # "name()", runs the proc and skips the CALL token
+CACHE_VAR: int = 3  # "name !", pushes the variable and skips the CALL_VAR token
+
+# Interpreter.interpret_stream
+STREAM_BATCH: int = 256    # tokens read in between runs
+STREAM_LOOKAHEAD: int = 3  # furthest interpret_token reads past the token it's on ("-> field value =")
+STREAM_LOOKBEHIND: int = 2 # "name :: proc" reads the name back
+OPENERS: Tuple[TokenType, ...] = (TokenType.IF, TokenType.PROC, TokenType.MACRO, TokenType.STRUCT)
+DEFINITIONS: Tuple[TokenType, ...] = (TokenType.PROC, TokenType.MACRO, TokenType.STRUCT)
+
 class Interpreter:
+    """
+    Runs tokens one at a time. Procs and macros don't recurse into python, they
+    push a frame (the tokens and index to come back to) and the loop in execute
+    carries on in their body, so recursion is only bounded by memory.
+    """
 
-    def __init__(self, tokens: List[Token]) -> None:
+    def __init__(self, tokens: List[Token], jumps: Dict[Token, int] | None = None) -> None:
         self.vm: VM = VM()
         self.tokens: List[Token] = tokens
         self.stack: list = []
-        self.call_stack: List[str] = []
+        self.stdout: TextIO | None = None # where "out" writes, None is whatever sys.stdout is at the time
+        self.call_stack: List[str] = [] # names of the procs being run, innermost last
+        self.frames: List[Tuple[List[Token], int, bool]] = [] # (tokens, index) to return to and whether it's a call, not a macro
 
         self.variables: Dict[str, Any] = {}
 
         self.index: int = 0
-        self.end_tolerance: int = 0
+        self.jumps: Dict[Token, int] = resolve_jumps(tokens) if jumps is None else jumps # passed in by lib.api.Program, shared between runs
 
         self.conditional: bool = False
-        self.fall_through: bool = False
 
-        self.found_if: bool = False
-
-        self.in_proc: bool = False
-        self.proc_name: str = ""
-        self.proc_contents: List[Token] = []
-        self.proc_buffer: List[List[Union[str,List[Token]]]] = []
-        self.buffer_index: int = 0
         self.procs: Dict[str, List[Token]] = {}
-
-        self.in_struct: bool = False
-        self.struct_name: str = ""
-        self.struct_contents: Dict[str, Tuple[Any,TokenType]] = {}
         self.structs: Dict[str, Dict[str, Tuple[Any, TokenType]]] = {}
-
-        self.in_macro: bool = False
-        self.macro_name: str = ""
-        self.macro_contents: list[Token] = []
         self.macros: dict[str, list[Token]] = {}
 
+        self.bindings_version: int = 0 # bumped whenever "::" (re)binds a proc or macro name
+        self.inline_cache: Dict[Token, Tuple[int, int, Any]] = {} # PUSH token -> (bindings_version, kind, target)
+        self.tail_calls: Dict[Token, bool] = {} # token that made a call from a proc -> whether it's a tail call, see call
+
+        self.hooks: List[Any] = [] # see add_hook
+        self.traced: Dict[str, List[Any]] = {} # event -> methods of the hooks that handle it
+
         self.type_table: Dict[Type, TokenType] = {
             int  : TokenType.INT,
             str  : TokenType.STRING,
@@ -45,8 +60,10 @@ class Interpreter:
         }
 
     def print_error(self, error: str) -> None:
-        print(error)
+        print(error, file=self.stdout)
         self.tokens = [Token(TokenType.EOF, None, TokenType.OPERAND, (0, 0), "")]
+        self.frames.clear()
+        self.call_stack.clear()
 
     def at_end(self) -> bool:
         return self.index >= len(self.tokens)
@@ -59,125 +76,144 @@ class Interpreter:
     def peek(self) -> Token:
         return self.tokens[self.index]
     
-    def interpret_object(self, obj: List[Token]) -> None:
-        current_branch = self.tokens
-        current_index = self.index
+    def call(self, obj: List[Token], name: str) -> None:
+        """
+        Makes proc obj the tokens being run, the caller carries on after it
+        returns. A call that's the last thing its proc does (a tail call) takes
+        over the proc's frame instead of pushing one, so tail recursion runs
+        in constant space.
+        """
+        frames: List[Tuple[List[Token], int, bool]] = self.frames
+        if frames and frames[-1][2]:
+            tail: bool | None = self.tail_calls.get(self.token)
+            if tail is None:
+                tail = self.tail_calls[self.token] = self.at_tail()
+            if tail:
+                self.call_stack[-1] = name
+                self.tokens = obj
+                self.index = 0
+                return
+        frames.append((self.tokens, self.index, True))
+        self.call_stack.append(name)
         self.tokens = obj
         self.index = 0
-        for _ in obj:
-            self.interpret_token()
-        self.index = current_index
-        self.tokens = current_branch
-
-    def interpret_token(self) -> None:
-        self.token: Token = self.advance()
 
-        if self.fall_through:
-
-            if self.in_macro:
-                if self.token._type in [TokenType.PROC, TokenType.MACRO, TokenType.STRUCT]:
-                    self.print_error(f"{self.token.filename}:{self.token.position[0]}:{self.token.position[1]}: Unable to have object definition inside macro\n\nIllegal Example:\n--------------------\n[macro_name] :: macro\n    [{self.token._type.name.lower()}_name] :: {self.token._type.name.lower()}\n        [{self.token._type.name.lower()}_contents]\n    end\n    [macro_contents]\nend\n--------------------\n\nLegal Example:\n--------------------\n[{self.token._type.name.lower()}_name] :: {self.token._type.name.lower()}\n    [{self.token._type.name.lower()}_contents]\nend\n\n[macro_name] :: macro\n    [macro_contents]\nend\n--------------------")
-
-                if self.end_tolerance == 0 and self.token._type == TokenType.END:
-                    self.fall_through = False
-                    return
-                
-                if self.token._type != TokenType.END:
-                    if self.token._type == TokenType.IF:
-                        self.end_tolerance += 1
-                else:
-                    self.end_tolerance -= 1
+    def expand(self, obj: List[Token]) -> None:
+        self.frames.append((self.tokens, self.index, False))
+        self.tokens = obj
+        self.index = 0
 
-                self.macro_contents.append(self.token)
+    def leave(self) -> None:
+        self.tokens, self.index, call = self.frames.pop()
+        if call:
+            self.call_stack.pop()
+
+    def at_tail(self) -> bool:
+        """
+        Whether all that's left of the current tokens is "end"s (and "else"s skipping to them).
+        """
+        index: int = self.index
+        while index < len(self.tokens):
+            token: Token = self.tokens[index]
+            if token._type == TokenType.END:
+                index += 1
+            elif token._type == TokenType.ELSE:
+                index += 1 + self.jumps[token]
+            else:
+                return False
+        return True
+
+    def execute(self) -> None:
+        """
+        Runs the current tokens to their end, along with everything they call.
+        """
+        frames: List[Tuple[List[Token], int, bool]] = self.frames
+        while True:
+            while self.index < len(self.tokens):
+                self.interpret_token()
+            if not frames:
                 return
-            if self.in_proc:
+            self.leave()
+
+    def finish_calls(self) -> None:
+        """
+        Runs until every frame returned, for loops that run top-level tokens themselves.
+        """
+        frames: List[Tuple[List[Token], int, bool]] = self.frames
+        while frames:
+            while self.index < len(self.tokens):
+                self.interpret_token()
+            if frames: # print_error drops every frame
+                self.leave()
+
+    def block(self) -> List[Token]:
+        opener: Token = self.tokens[self.index - 1]
+        end: int = self.index - 1 + self.jumps[opener]
+        contents: List[Token] = self.tokens[self.index : end]
+        self.index = end + 1
+        return contents
+
+    def macro_block(self) -> List[Token]:
+        contents: List[Token] = self.block()
+        for token in contents:
+            if token._type in [TokenType.PROC, TokenType.MACRO, TokenType.STRUCT]:
+                self.print_error(f"{token.filename}:{token.position[0]}:{token.position[1]}: Unable to have object definition inside macro\n\nIllegal Example:\n--------------------\n[macro_name] :: macro\n    [{token._type.name.lower()}_name] :: {token._type.name.lower()}\n        [{token._type.name.lower()}_contents]\n    end\n    [macro_contents]\nend\n--------------------\n\nLegal Example:\n--------------------\n[{token._type.name.lower()}_name] :: {token._type.name.lower()}\n    [{token._type.name.lower()}_contents]\nend\n\n[macro_name] :: macro\n    [macro_contents]\nend\n--------------------")
+                break
+        return contents
+
+    def struct_block(self) -> Dict[str, Tuple[Any, TokenType]]:
+        contents: List[Token] = self.block()
+        fields: Dict[str, Tuple[Any, TokenType]] = {}
+        for index in range(0, len(contents), 2):
+            field_type: TokenType | None = contents[index + 1]._type if index + 1 < len(contents) else None
+            fields[contents[index].value] = (None, field_type)
+        return fields
+
+    def resolve_push(self, token: Token) -> Tuple[int, int, Any]:
+        following: Token | None = self.tokens[self.index] if self.index < len(self.tokens) else None
+        if token.value in self.macros:
+            cached = (self.bindings_version, CACHE_MACRO, self.macros[token.value])
+        elif following is not None and following._type == TokenType.CALL and token.value in self.procs:
+            cached = (self.bindings_version, CACHE_CALL, self.procs[token.value])
+        elif following is not None and following._type == TokenType.CALL_VAR:
+            cached = (self.bindings_version, CACHE_VAR, None)
+        else:
+            cached = (self.bindings_version, CACHE_LITERAL, None)
+        self.inline_cache[token] = cached
+        return cached
 
-                if self.token._type == TokenType.PROC:
-                    self.proc_buffer.append([self.proc_name, self.proc_contents])
-                    self.proc_contents = []
-                    self.proc_name = ""
-                    self.buffer_index += 1
-                    return
-                
-                if self.end_tolerance == 0 and self.token._type == TokenType.END:
-                    self.fall_through = False
-                    return
-                
-                if self.token._type != TokenType.END:
-                    if self.token._type == TokenType.IF:
-                        self.end_tolerance += 1
-                else:
-                    self.end_tolerance -= 1
+    def interpret_token(self) -> None:
+        self.token: Token = self.advance()
 
-                self.proc_contents.append(self.token)
-                return
-            
-            if self.in_struct:
-                if self.token._type == TokenType.END:
-                    self.fall_through = False
-                    return
-                if self.token._type != TokenType.END:
-                    self.struct_contents[self.token.value] = (None, self.tokens[self.index]._type)
-                    self.index =+ 1
-                else:
-                    self.fall_through = False
-                return
+        match self.token._type:
 
-            else:
-                if self.token._type == TokenType.ELSE and self.end_tolerance == 0:
-                    self.fall_through = False
-                    return
-                
-                elif self.token._type != TokenType.END:
-                    if self.token._type == TokenType.IF:
-                        self.end_tolerance += 1
-                    return
-                
-                if self.end_tolerance == 0:
-                    self.fall_through = False
+            case TokenType.PUSH:
+                if self.token.value_type != TokenType.IDENTIFIER:
+                    self.stack.append(self.token.value)
                     return
+                cached = self.inline_cache.get(self.token)
+                if cached is None or cached[0] != self.bindings_version:
+                    cached = self.resolve_push(self.token)
+                kind = cached[1]
+                if kind == CACHE_LITERAL:
+                    self.stack.append(self.token.value)
+                elif kind == CACHE_MACRO:
+                    self.expand(cached[2])
+                elif self.index < len(self.tokens) and self.tokens[self.index]._type == (TokenType.CALL if kind == CACHE_CALL else TokenType.CALL_VAR):
+                    self.index += 1
+                    if kind == CACHE_CALL:
+                        self.call(cached[2], self.token.value)
+                    else:
+                        self.stack.append(self.variables[self.token.value])
                 else:
-                    self.end_tolerance -= 1
-                return
-        
-        if self.in_proc:
-            if self.proc_name != "":
-                self.procs[self.proc_name] = self.proc_contents
-            else:
-                self.stack.append(self.proc_contents)
-                self.proc_contents = []
-            self.in_proc = False
-            self.proc_name = ""
-            if len(self.proc_buffer) > 0:
-                self.proc_name = self.proc_buffer[self.buffer_index - 1][0] # type: ignore
-                self.proc_contents = self.proc_buffer[self.buffer_index - 1][1] # type: ignore
-                self.proc_buffer.pop()
-                self.buffer_index -= 1
-                self.in_proc = True
-            else:
-                self.proc_contents = []
-
-        if self.in_macro:
-            self.macros[self.macro_name] = self.macro_contents
-            self.macro_name = ""
-            self.macro_contents = []
-            self.in_macro = False
-
-        if self.in_struct:
-            try:
-                del self.struct_contents[None] # type: ignore | stupid hack
-            except KeyError:
-                pass #fuck you
-            self.structs[self.struct_name] = self.struct_contents
-            self.in_struct = False
-            self.struct_name = ""
-            self.struct_contents = {}
-
-        match self.token._type:
+                    self.stack.append(self.token.value)
 
             case TokenType.MACRO:
-                print(f"{self.token.filename}:{self.token.position[0]}:{self.token.position[1]}: Cannot declare a macro and leave it unwrapped.\n\nTry using:\n----------------------\n[macro-name] :: macro\n    [macro-contents]\nend\n----------------------")
-                exit(1)
+                raise ExecutionError(f"{self.token.filename}:{self.token.position[0]}:{self.token.position[1]}: Cannot declare a macro and leave it unwrapped.\n\nTry using:\n----------------------\n[macro-name] :: macro\n    [macro-contents]\nend\n----------------------")
+
+            case TokenType.INCLUDE: # ModuleLoader splices includes in before anything runs, streamed and REPL input skip it
+                self.print_error(f"{self.token.filename}:{self.token.position[0]}:{self.token.position[1]}: \"include\" only works in a file that's loaded up front (not with -stream, stdin or the REPL)")
+                return
 
             case TokenType.EXIT:
                 if len(self.stack) >= 1:
@@ -209,22 +245,21 @@ class Interpreter:
                 match self.tokens[self.index]._type:
 
                     case TokenType.PROC:
-                        self.proc_name = self.tokens[self.index - 2].value
+                        proc_name = self.tokens[self.index - 2].value
                         self.index += 1
-                        self.fall_through = True
-                        self.in_proc = True
+                        self.procs[proc_name] = self.block()
+                        self.bindings_version += 1
 
                     case TokenType.STRUCT:
-                        self.struct_name = self.tokens[self.index - 2].value
+                        struct_name = self.tokens[self.index - 2].value
                         self.index += 1
-                        self.fall_through = True
-                        self.in_struct = True
+                        self.structs[struct_name] = self.struct_block()
 
                     case TokenType.MACRO:
-                        self.macro_name = self.tokens[self.index - 2].value
+                        macro_name = self.tokens[self.index - 2].value
                         self.index += 1
-                        self.fall_through = True
-                        self.in_macro = True
+                        self.macros[macro_name] = self.macro_block()
+                        self.bindings_version += 1
 
                     case TokenType.LT:
                         name = self.tokens[self.index - 2].value
@@ -240,6 +275,7 @@ class Interpreter:
                         for item in self.stack:
                             if isinstance(item, list):
                                 self.procs[name] = item
+                                self.bindings_version += 1
                                 self.stack.remove(item)
                                 break
 
@@ -248,6 +284,7 @@ class Interpreter:
                         if self.tokens[self.index + 1].value_type == TokenType.IDENTIFIER and self.tokens[self.index + 2]._type == TokenType.PIPE:
                             proc_name = self.tokens[self.index + 1].value
                             self.procs[name] = self.procs[proc_name]
+                            self.bindings_version += 1
                             self.index += 3
                         else:
                             ...
@@ -257,19 +294,17 @@ class Interpreter:
                         _object = self.stack.pop()
                         if isinstance(_object, list):
                             self.procs[name] = _object
+                            self.bindings_version += 1
 
             case TokenType.PROC:
-                self.fall_through = True
-                self.in_proc = True
-                if self.tokens[self.index - 2]._type == TokenType.OBJECT_ASSIGN:
-                    self.proc_name = self.tokens[self.index - 3].value
+                self.stack.append(self.block())
 
             case TokenType.CALL:
                 proc_to_call = self.stack.pop()
                 if isinstance(proc_to_call, list):
-                    self.interpret_object(proc_to_call)
+                    self.call(proc_to_call, "lambda")
                 else:
-                    self.interpret_object(self.procs[proc_to_call])
+                    self.call(self.procs[proc_to_call], proc_to_call)
 
             case TokenType.CALL_VAR:
                 self.var_name: str = self.stack.pop()
@@ -296,12 +331,6 @@ class Interpreter:
                 self.stack.append(item)
                 self.stack.append(item)
 
-            case TokenType.PUSH:
-                if self.token.value in self.macros.keys():
-                    self.interpret_object(self.macros[self.token.value])
-                else:
-                    self.stack.append(self.token.value)
-                
             case TokenType.PLUS:
                 num_1 = self.stack.pop()
                 num_2 = self.stack.pop()
@@ -313,9 +342,9 @@ class Interpreter:
                     self.print_error(f"{self.token.filename}:{self.token.position[0]}:{self.token.position[1]}: Attempting to print from an empty stack..")
                     return
                 if self.token.value_type == TokenType.STRING:
-                    print(self.stack.pop())
+                    print(self.stack.pop(), file=self.stdout)
                 else:
-                    print(self.stack.pop())
+                    print(self.stack.pop(), file=self.stdout)
 
             case TokenType.SWAP:
                 item_1 = self.stack.pop()
@@ -329,34 +358,168 @@ class Interpreter:
                     del self.variables[name]
 
             case TokenType.IF:
-                self.found_if = True
                 self.conditional: bool = self.stack.pop()
                 if not self.conditional:
-                    self.fall_through = True
-                    self.end_tolerance = 0
+                    self.index += self.jumps[self.token]
 
             case TokenType.ELSE:
-                self.fall_through = True
-                if not self.found_if:
+                if self.token not in self.jumps:
                     token = self.tokens[self.index - 1]
                     self.print_error(f"{token.filename}:{token.position[0]}:{token.position[1]}: Found an \"else\" statement before an \"if\" statement")
                     return
-                self.found_if = False
+                self.index += self.jumps[self.token]
 
             case TokenType.END:
-                self.fall_through = False
+                pass
 
             case TokenType.EQUAL_EQUAL:
                 self.item_1 = self.stack.pop()
                 self.item_2 = self.stack.pop()
                 self.stack.append(self.item_1 == self.item_2)
 
+            case TokenType.TRUE: # a python bool, so "out" prints True and true == 1, true and false used to push nothing
+                self.stack.append(True)
+
+            case TokenType.FALSE:
+                self.stack.append(False)
+
+    def add_hook(self, hook: Any) -> None:
+        """
+        Attaches a tracing hook (see lib.hooks.Hook). While any are attached this
+        instance runs trace_token/trace_call/trace_leave instead of interpret_token/call/leave,
+        once the last one is removed it's back to the class methods, so a run
+        without hooks never checks for them.
+        """
+        self.hooks.append(hook)
+        self.install_hooks()
+
+    def remove_hook(self, hook: Any) -> None:
+        self.hooks.remove(hook)
+        self.install_hooks()
+
+    def install_hooks(self) -> None:
+        self.traced = { event : [getattr(hook, event) for hook in self.hooks if overrides(hook, event)] for event in EVENTS }
+        if self.hooks:
+            self.interpret_token = self.trace_token
+            self.call = self.trace_call
+            self.leave = self.trace_leave
+        else: # deleting them (or touching __dict__) would turn the instance's attributes into a slower dict
+            self.interpret_token = MethodType(type(self).interpret_token, self)
+            self.call = MethodType(type(self).call, self)
+            self.leave = MethodType(type(self).leave, self)
+        self.vm.on_alloc = self.trace_alloc if self.traced["on_alloc"] else None
+        self.vm.on_free = self.trace_free if self.traced["on_free"] else None
+
+    def trace_token(self) -> None:
+        token: Token = self.tokens[self.index]
+        for on_token in self.traced["on_token"]:
+            on_token(self, token)
+        if token._type != TokenType.IF or not self.traced["on_branch"] or not self.stack:
+            type(self).interpret_token(self) # the class method, a subclass still gets its override
+            return
+        taken: bool = bool(self.stack[-1])
+        type(self).interpret_token(self)
+        for on_branch in self.traced["on_branch"]:
+            on_branch(self, token, taken)
+
+    def trace_call(self, obj: List[Token], name: str) -> None:
+        depth: int = len(self.call_stack)
+        caller: str = self.call_stack[-1] if depth else ""
+        type(self).call(self, obj, name)
+        if len(self.call_stack) == depth: # a tail call, the proc it's made from is done
+            for on_return in self.traced["on_return"]:
+                on_return(self, caller)
+        for on_call in self.traced["on_call"]:
+            on_call(self, name)
+
+    def trace_leave(self) -> None:
+        name: str = self.call_stack[-1] if self.frames[-1][2] else ""
+        type(self).leave(self)
+        if name:
+            for on_return in self.traced["on_return"]:
+                on_return(self, name)
+
+    def trace_alloc(self, address: hex, size: int, value: Any) -> None:
+        for on_alloc in self.traced["on_alloc"]:
+            on_alloc(self, address, size, value)
+
+    def trace_free(self, address: hex) -> None:
+        for on_free in self.traced["on_free"]:
+            on_free(self, address)
+
+    def forget(self, tokens: List[Token], definitions: List[bool]) -> None:
+        """
+        Drops the jump and inline cache entries of tokens that already ran,
+        anything inside a proc, macro or struct body is kept since the body still runs.
+        definitions holds the blocks still open at the end of tokens (True for a definition).
+        """
+        for token in tokens:
+            if True not in definitions:
+                self.jumps.pop(token, None)
+                self.inline_cache.pop(token, None)
+            if token._type in OPENERS:
+                definitions.append(token._type in DEFINITIONS)
+            elif token._type == TokenType.END and definitions:
+                definitions.pop()
+
+    def interpret_stream(self, tokens: Iterator[Token], show_registers: bool, show_vars: bool, deconstruct: bool, proc_to_deconstruct: str) -> None:
+        """
+        Runs tokens while they're still being lexed. Top-level code runs as soon as
+        every block before it is closed, tokens that ran are dropped so memory stays
+        bounded by the biggest block instead of the file. Code can't call a proc
+        that's defined further down (it doesn't exist yet when the call runs).
+        """
+        window: List[Token] = []
+        self.tokens = window
+        self.index = 0
+        depth: int = 0
+        resolved: int = 0 # window[:resolved] has its jumps resolved
+        definitions: List[bool] = []
+
+        for token in tokens:
+            window.append(token)
+            if token._type in OPENERS:
+                depth += 1
+            elif token._type == TokenType.END and depth:
+                depth -= 1
+            if depth or len(window) - resolved < STREAM_BATCH:
+                continue
+
+            self.jumps.update(resolve_jumps(window[resolved:])) # jumps are relative, a closed slice resolves the same on its own
+            resolved = len(window)
+            while self.index < resolved - STREAM_LOOKAHEAD and self.tokens is window:
+                self.interpret_token()
+                if self.frames:
+                    self.finish_calls()
+            if self.tokens is not window: # print_error stopped the program
+                break
+
+            drop: int = self.index - STREAM_LOOKBEHIND
+            if drop > 0:
+                self.forget(window[:drop], definitions)
+                del window[:drop]
+                self.index -= drop
+                resolved -= drop
+        else:
+            self.jumps.update(resolve_jumps(window[resolved:]))
+            while self.index < len(window) and self.tokens is window:
+                self.interpret_token()
+                if self.frames:
+                    self.finish_calls()
+
+        self.report(show_vars, deconstruct, proc_to_deconstruct)
+
     def interpret(self, show_registers: bool, show_vars: bool, deconstruct: bool, proc_to_deconstruct: str) -> None:
-        while not self.at_end():
-            self.interpret_token()
+        self.execute()
+        self.report(show_vars, deconstruct, proc_to_deconstruct)
+
+    def report(self, show_vars: bool, deconstruct: bool, proc_to_deconstruct: str) -> None:
         if show_vars:
             print(self.variables)
         if deconstruct:
             if proc_to_deconstruct in self.procs.keys():
                 print(f"Result of \"{proc_to_deconstruct}\":")
                 [print(f"    {token._type}") for token in self.procs[proc_to_deconstruct]]
+            elif proc_to_deconstruct in self.macros.keys():
+                print(f"Expansion of \"{proc_to_deconstruct}\":")
+                [print(f"    {token._type}") for token in self.macros[proc_to_deconstruct]]
@@ -0,0 +1,180 @@
+from enum import IntEnum
+from typing import Any, Dict, List, Set
+
+from .errors import CompileError
+from .jumptable import resolve_jumps
+from .tokentype import Token, TokenType
+
+class Op(IntEnum):
+
+    PUSH_INT = 0
+    PUSH_STRING = 1
+    PUSH_BOOL = 2
+    ADD = 3
+    LESS = 4
+    EQUAL = 5
+    DUP = 6
+    SWAP = 7
+    DROP = 8
+    PRINT = 9
+    EXIT = 10
+    LABEL = 11
+    JUMP = 12
+    JUMP_IF_FALSE = 13
+    CALL = 14
+    RETURN = 15
+
+class Instruction:
+
+    __slots__ = ("op", "arg", "token")
+
+    def __init__(self, op: Op, arg: Any, token: Token) -> None:
+        self.op: Op = op
+        self.arg: Any = arg
+        self.token: Token = token
+
+    def __repr__(self) -> str:
+        return f"{self.op.name} {self.arg}" if self.arg is not None else self.op.name
+
+class Lowering:
+    """
+    Turns the token stream into the linear IR the compiler generates code from,
+    one instruction list per function ("_start" for the top level, "proc_<n>"
+    for procs in the order they're defined). Labels are numbered in order so the
+    same program always lowers to the same IR.
+
+    Only what can be resolved ahead of time is lowered, procs have to be bound
+    once and called by name, anything else (variables, structs, floats, ...) is
+    reported here.
+    """
+
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens: List[Token] = tokens
+        self.jumps: Dict[Token, int] = resolve_jumps(tokens)
+
+        self.functions: Dict[str, List[Instruction]] = {}
+        self.labels: Dict[str, str] = {} # proc name -> label
+        self.names: Dict[str, str] = { "_start": "" } # label -> proc name
+        self.macros: Set[str] = set()
+        self.label_count: int = 0
+
+    def error(self, token: Token, message: str) -> None:
+        raise CompileError(f"{token.filename}:{token.position[0]}:{token.position[1]}: {message}")
+
+    def new_label(self) -> str:
+        self.label_count += 1
+        return f"L{self.label_count}"
+
+    def collect(self) -> Dict[str, List[Token]]:
+        bodies: Dict[str, List[Token]] = {}
+        for index, token in enumerate(self.tokens):
+            if token._type != TokenType.OBJECT_ASSIGN or not index or index + 1 >= len(self.tokens):
+                continue
+            name: str = self.tokens[index - 1].value
+            match self.tokens[index + 1]._type:
+                case TokenType.PROC:
+                    if name in self.labels:
+                        self.error(token, f"\"{name}\" is bound more than once, compiled code needs every proc bound once")
+                    self.labels[name] = f"proc_{len(self.labels)}"
+                    self.names[self.labels[name]] = name
+                    bodies[self.labels[name]] = self.tokens[index + 2 : index + 1 + self.jumps[self.tokens[index + 1]]]
+                case TokenType.MACRO:
+                    self.macros.add(name)
+        return bodies
+
+    def lower_body(self, tokens: List[Token]) -> List[Instruction]:
+        code: List[Instruction] = []
+        blocks: List[List[str]] = [] # [else label, end label] per open if
+        index: int = 0
+        while index < len(tokens):
+            token: Token = tokens[index]
+            index += 1
+            following: Token | None = tokens[index] if index < len(tokens) else None
+
+            match token._type:
+                case TokenType.PUSH:
+                    if token.value_type == TokenType.NUMBER:
+                        if not isinstance(token.value, int):
+                            self.error(token, f"Compiled code has no floats ({token.value})")
+                        if not -2**61 <= token.value < 2**61:
+                            self.error(token, f"{token.value} doesn't fit in a compiled (62 bit) number")
+                        code.append(Instruction(Op.PUSH_INT, token.value, token))
+                    elif token.value_type == TokenType.IDENTIFIER and following is not None and following._type == TokenType.CALL:
+                        if token.value not in self.labels:
+                            self.error(token, f"\"{token.value}\" isn't a proc, compiled code only calls procs by name")
+                        code.append(Instruction(Op.CALL, self.labels[token.value], token))
+                        index += 1
+                    else:
+                        if token.value in self.macros and (following is None or following._type != TokenType.OBJECT_ASSIGN):
+                            self.error(token, f"Macro \"{token.value}\" couldn't be expanded ahead of time, compiled code can't expand it")
+                        code.append(Instruction(Op.PUSH_STRING, token.value, token))
+
+                case TokenType.OBJECT_ASSIGN:
+                    if following is None or following._type not in (TokenType.PROC, TokenType.MACRO, TokenType.STRUCT):
+                        self.error(token, "Compiled code can't bind values with \"::\"")
+                    index += self.jumps[following] + 1 # procs are lowered on their own, macros are already expanded
+
+                case TokenType.TRUE | TokenType.FALSE:
+                    code.append(Instruction(Op.PUSH_BOOL, token._type == TokenType.TRUE, token))
+
+                case TokenType.PLUS:
+                    code.append(Instruction(Op.ADD, None, token))
+
+                case TokenType.LT:
+                    code.append(Instruction(Op.LESS, None, token))
+
+                case TokenType.EQUAL_EQUAL:
+                    code.append(Instruction(Op.EQUAL, None, token))
+
+                case TokenType.DUP:
+                    code.append(Instruction(Op.DUP, None, token))
+
+                case TokenType.SWAP:
+                    code.append(Instruction(Op.SWAP, None, token))
+
+                case TokenType.DROP:
+                    code.append(Instruction(Op.DROP, None, token)) # there are no variables for it to delete
+
+                case TokenType.PRINT:
+                    code.append(Instruction(Op.PRINT, None, token))
+
+                case TokenType.EXIT:
+                    code.append(Instruction(Op.EXIT, None, token))
+
+                case TokenType.IF:
+                    blocks.append([self.new_label(), self.new_label()])
+                    code.append(Instruction(Op.JUMP_IF_FALSE, blocks[-1][0], token))
+
+                case TokenType.ELSE:
+                    if not blocks:
+                        self.error(token, "\"else\" without an \"if\"")
+                    code.append(Instruction(Op.JUMP, blocks[-1][1], token))
+                    code.append(Instruction(Op.LABEL, blocks[-1][0], token))
+                    blocks[-1][0] = blocks[-1][1]
+
+                case TokenType.END:
+                    if blocks:
+                        code.append(Instruction(Op.LABEL, blocks.pop()[0], token))
+
+                case TokenType.EOF:
+                    pass
+
+                case _:
+                    self.error(token, f"\"{token._type.name.lower()}\" isn't supported in compiled code")
+
+        for _ in blocks:
+            self.error(tokens[-1], "\"if\" without an \"end\"")
+        return code
+
+    def lower(self) -> Dict[str, List[Instruction]]:
+        bodies: Dict[str, List[Token]] = self.collect()
+        self.functions["_start"] = self.lower_body(self.tokens)
+        for label, body in bodies.items():
+            self.functions[label] = self.lower_body(body) + [Instruction(Op.RETURN, None, body[-1] if body else self.tokens[-1])]
+        return self.functions
+
+    def pprint(self) -> None:
+        for label, code in self.functions.items():
+            print(f"{label}:" + (f" ; {self.names[label]}" if self.names[label] else ""))
+            for instruction in code:
+                print(f"{instruction.token.position[0]:>5}  {instruction}")
@@ -0,0 +1,51 @@
+from typing import Dict, List
+
+from .tokentype import Token, TokenType
+
+def resolve_jumps(tokens: List[Token]) -> Dict[Token, int]:
+    """
+    Matches every if/else and proc/macro/struct opener with the token that
+    closes it, returning the distance from the opener to where execution
+    carries on (the else or end it jumps past).
+
+    Distances are relative so the table stays valid for proc and macro
+    bodies, which are contiguous slices of the token stream they came from.
+    Unclosed blocks run to the end of the stream.
+    """
+    jumps: Dict[Token, int] = {}
+    openers: List[tuple[int, Token]] = []
+    pending_else: Dict[Token, tuple[int, Token]] = {} # if -> its else, the else still needs the matching end
+
+    for position, token in enumerate(tokens):
+        match token._type:
+
+            case TokenType.IF:
+                openers.append((position, token))
+
+            case TokenType.PROC | TokenType.MACRO | TokenType.STRUCT:
+                openers.append((position, token))
+
+            case TokenType.ELSE:
+                if openers and openers[-1][1]._type == TokenType.IF and openers[-1][1] not in pending_else:
+                    if_position, if_token = openers[-1]
+                    jumps[if_token] = position - if_position
+                    pending_else[if_token] = (position, token)
+
+            case TokenType.END:
+                if not openers:
+                    continue
+                opener_position, opener = openers.pop()
+                if opener in pending_else:
+                    else_position, else_token = pending_else.pop(opener)
+                    jumps[else_token] = position - else_position
+                else:
+                    jumps[opener] = position - opener_position
+
+    for opener_position, opener in openers:
+        if opener in pending_else:
+            else_position, else_token = pending_else.pop(opener)
+            jumps[else_token] = len(tokens) - else_position
+        else:
+            jumps[opener] = len(tokens) - opener_position
+
+    return jumps
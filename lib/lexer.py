@@ -1,12 +1,17 @@
+from .errors import CompileError
 from .tokentype import Token, TokenType
 
+from typing import Iterator, TextIO
+import re
+import sys
+
 class Lexer:
 
     def __init__(self, source: str, filename: str) -> None:
 
         self.path = __file__.split("lexer.py")
         self.source = source
-        self.filename = filename
+        self.filename = sys.intern(filename)
 
         self.line = 1
         self.line_index = 0
@@ -14,6 +19,7 @@ class Lexer:
         self.current_index = 0
 
         self.tokens_created: int = 0
+        self.strict: bool = False # every error is fatal, not just the ones lexing can't carry on from
 
         self.output = []
 
@@ -31,9 +37,9 @@ class Lexer:
         self.output.append(Token(_type, value, value_type, (self.line, self.line_index), self.filename))
 
     def error(self, message: str, fatal: bool = False) -> None:
+        if fatal or self.strict:
+            raise CompileError(f"{self.filename}:{self.line}:{self.line_index}: {message}")
         print(f"{self.filename}:{self.line}:{self.line_index}: {message}")
-        if fatal:
-            exit(1)
     
     def scan_token(self) -> None:
         self.character = self.advance()
@@ -288,7 +294,7 @@ class Lexer:
                 self.create_token(TokenType.FALSE, None, TokenType.BOOL)
 
             case _:
-                self.create_token(TokenType.PUSH, self.text, TokenType.IDENTIFIER)
+                self.create_token(TokenType.PUSH, sys.intern(self.text), TokenType.IDENTIFIER)
 
     def is_alphanumeric(self, character: str) -> bool:
         return self.is_alpha(character) or self.is_digit(character)
@@ -347,4 +353,235 @@ class Lexer:
             self.start = self.current_index
             self.scan_token()
         self.create_token(TokenType.EOF, None, TokenType.OPERAND)
-        return self.output, self.tokens_created
\ No newline at end of file
+        return self.output, self.tokens_created
+
+# keyword -> (type, value type), same table as Lexer.identifier
+KEYWORDS: dict[str, tuple[TokenType, TokenType]] = {
+    "str"       : (TokenType.STRING, TokenType.INTRINSIC),
+    "exit"      : (TokenType.EXIT, TokenType.INTRINSIC),
+    "include"   : (TokenType.INCLUDE, TokenType.INTRINSIC),
+    "if"        : (TokenType.IF, TokenType.INTRINSIC),
+    "else"      : (TokenType.ELSE, TokenType.INTRINSIC),
+    "end"       : (TokenType.END, TokenType.INTRINSIC),
+    "proc"      : (TokenType.PROC, TokenType.INTRINSIC),
+    "in"        : (TokenType.IN, TokenType.INTRINSIC),
+    "pass"      : (TokenType.PASS, TokenType.INTRINSIC),
+    "struct"    : (TokenType.STRUCT, TokenType.INTRINSIC),
+    "macro"     : (TokenType.MACRO, TokenType.INTRINSIC),
+    "out"       : (TokenType.PRINT, TokenType.INTRINSIC),
+    "dup"       : (TokenType.DUP, TokenType.INTRINSIC),
+    "sizeof"    : (TokenType.SIZEOF, TokenType.INTRINSIC),
+    "reg"       : (TokenType.REG, TokenType.INTRINSIC),
+    "deref"     : (TokenType.DEREF, TokenType.INTRINSIC),
+    "cast"      : (TokenType.CAST, TokenType.INTRINSIC),
+    "ptr"       : (TokenType.PTR, TokenType.INTRINSIC),
+    "cast[ptr]" : (TokenType.CAST_PTR, TokenType.INTRINSIC),
+    "int"       : (TokenType.INT, TokenType.INTRINSIC),
+    "call"      : (TokenType.CALL, TokenType.INTRINSIC),
+    "call-like" : (TokenType.CALL_LIKE, TokenType.INTRINSIC), # unreachable, "-" never continues an identifier
+    "syscall"   : (TokenType.SYSCALL, TokenType.INTRINSIC),
+    "drop"      : (TokenType.DROP, TokenType.INTRINSIC),
+    "swap"      : (TokenType.SWAP, TokenType.INTRINSIC),
+    "true"      : (TokenType.TRUE, TokenType.BOOL),
+    "false"     : (TokenType.FALSE, TokenType.BOOL),
+}
+
+# operator -> (type, value type), None for the ones that don't produce a token
+OPERATORS: dict[str, tuple[TokenType, TokenType] | None] = {
+    "()"  : (TokenType.CALL, TokenType.INTRINSIC),
+    "("   : (TokenType.L_PAREN, TokenType.OPERAND),
+    ")"   : (TokenType.R_PAREN, TokenType.OPERAND),
+    "{"   : (TokenType.L_BRACE, TokenType.OPERAND),
+    "}"   : (TokenType.R_BRACE, TokenType.OPERAND),
+    ","   : (TokenType.COMMA, TokenType.OPERAND),
+    "..." : (TokenType.GRAB_OBJECT, TokenType.OPERAND),
+    ".."  : None,
+    "."   : (TokenType.DOT, TokenType.OPERAND),
+    "::"  : (TokenType.OBJECT_ASSIGN, TokenType.OPERAND),
+    "#"   : (TokenType.HASH, TokenType.OPERAND),
+    "|>"  : (TokenType.R_BIND, TokenType.OPERAND),
+    "|"   : (TokenType.PIPE, TokenType.OPERAND),
+    "-="  : (TokenType.MINUS_EQUALS, TokenType.OPERAND),
+    "--"  : (TokenType.MINUS_MINUS, TokenType.OPERAND),
+    "->"  : (TokenType.ARROW, TokenType.OPERAND),
+    "-"   : (TokenType.MINUS, TokenType.OPERAND),
+    "+="  : (TokenType.PLUS_EQUALS, TokenType.OPERAND),
+    "++"  : (TokenType.PLUS_PLUS, TokenType.OPERAND),
+    "+"   : (TokenType.PLUS, TokenType.OPERAND),
+    "*="  : (TokenType.STAR_EQUALS, TokenType.OPERAND),
+    "**"  : (TokenType.STAR_STAR, TokenType.OPERAND),
+    "*"   : (TokenType.STAR, TokenType.OPERAND),
+    "!="  : (TokenType.BANG_EQUALS, TokenType.OPERAND),
+    "!"   : (TokenType.CALL_VAR, TokenType.OPERAND),
+    "=="  : (TokenType.EQUAL_EQUAL, TokenType.OPERAND),
+    "="   : (TokenType.EQUAL, TokenType.OPERAND),
+    "<="  : (TokenType.LT_EQUALS, TokenType.OPERAND),
+    "<|"  : (TokenType.L_BIND, TokenType.OPERAND),
+    "<>"  : (TokenType.CALL_STRUCT, TokenType.INTRINSIC),
+    "<"   : (TokenType.LT, TokenType.OPERAND),
+    ">="  : (TokenType.GT_EQUALS, TokenType.OPERAND),
+    ">"   : (TokenType.GT, TokenType.OPERAND),
+    "/="  : (TokenType.SLASH_EQUALS, TokenType.OPERAND),
+    "/"   : (TokenType.SLASH, TokenType.OPERAND),
+    "&"   : (TokenType.ADDRESS, TokenType.OPERAND),
+}
+
+# lexeme kind -> pattern, in the order they're tried
+# \d is any unicode decimal digit, which is exactly what Lexer.is_digit (int(character)) accepts
+LEXEMES: tuple[tuple[str, str], ...] = (
+    ("NEWLINE", r'\n'),
+    ("COMMENT", r'//[^\n]*'),
+    ("STRING", r'"[^"\n]*"'),
+    ("LONG_STRING", r'"[^"]*"?'), # spanning lines or unterminated
+    ("NEGATIVE", r'-\d+(?:\.\d+)?[=\->]?'),
+    ("FLOAT", r'\d+\.\d+'),
+    ("INT", r'\d+'),
+    ("NAME", r'[A-Za-z_][A-Za-z_\[\]\d]*'),
+    ("OPERATOR", r'\(\)|\.\.\.|\.\.|::|\|>|->|-=|--|\+=|\+\+|\*=|\*\*|!=|==|<=|<\||<>|>=|/=|[^ \t\r]'), # anything not in OPERATORS is unexpected
+)
+SPACES: str = " \t\r"
+# a lexeme takes the spaces in front of it along, that halves what findall returns and the loop
+# in RegexLexer.lex goes through, only the spaces at the very end are a lexeme of their own
+MASTER_PATTERN: re.Pattern = re.compile(f"[{SPACES}]*(?:" + "|".join(f"(?:{pattern})" for _, pattern in LEXEMES) + f")|[{SPACES}]+", re.DOTALL)
+LEXEME_PATTERN: re.Pattern = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in LEXEMES), re.DOTALL) # match(lexeme).lastgroup is its kind
+
+# what RegexLexer does with a lexeme, the first field of a classification, columns include the spaces in front
+TOKEN: int = 0    # (TOKEN, columns, type, value, value type)
+SPACE: int = 1    # (SPACE, columns)
+NEWLINE: int = 2  # (NEWLINE,)
+SKIP: int = 3     # (SKIP, columns), comments and ".."
+NEGATIVE: int = 4 # (NEGATIVE, columns, number, operator type), Lexer emits the number and then the "-" operator
+SPECIAL: int = 5  # (SPECIAL, spaces), strings spanning lines, unterminated strings and unexpected characters
+
+class RegexLexer(Lexer):
+    """
+    Produces the same tokens as Lexer (positions and errors included), but splits
+    the source with one compiled pattern and classifies every distinct lexeme once,
+    by which group of LEXEME_PATTERN matched it.
+    """
+
+    def __init__(self, source: str, filename: str) -> None:
+        super().__init__(source, filename)
+        self.classifications: dict[str, tuple] = {} # lexeme -> classification, kept across chunks
+
+    def classify(self, text: str) -> tuple:
+        lexeme: str = text.lstrip(SPACES)
+        spaces: int = len(text) - len(lexeme)
+        if not lexeme:
+            return (SPACE, spaces)
+        match LEXEME_PATTERN.match(lexeme).lastgroup:
+            case "NEWLINE":
+                return (NEWLINE,)
+            case "COMMENT":
+                return (SKIP, spaces + 1)
+            case "STRING":
+                return (TOKEN, spaces + 2, TokenType.PUSH, lexeme[1:-1], TokenType.STRING) # +1 for the closing quote
+            case "NEGATIVE":
+                digits: str = lexeme[1:].rstrip("=->")
+                number = float(digits) if "." in digits else int(digits)
+                return (NEGATIVE, spaces + 1, -number, OPERATORS["-" + lexeme[1 + len(digits):]][0])
+            case "FLOAT":
+                return (TOKEN, spaces + 1, TokenType.PUSH, float(lexeme), TokenType.NUMBER)
+            case "INT":
+                return (TOKEN, spaces + 1, TokenType.PUSH, int(lexeme), TokenType.NUMBER)
+            case "NAME":
+                keyword: tuple[TokenType, TokenType] | None = KEYWORDS.get(lexeme)
+                return (TOKEN, spaces + 1, TokenType.PUSH, lexeme, TokenType.IDENTIFIER) if keyword is None else (TOKEN, spaces + 1, keyword[0], None, keyword[1])
+            case "OPERATOR" if lexeme in OPERATORS:
+                operator = OPERATORS[lexeme]
+                return (SKIP, spaces + 1) if operator is None else (TOKEN, spaces + 1, operator[0], None, operator[1])
+        return (SPECIAL, spaces)
+
+    def special(self, text: str) -> None:
+        self.line_index += 1
+        if text[0] != '"':
+            self.error(f"Unexpected character \"{text}\"")
+            return
+        newlines: int = text.count("\n")
+        if newlines:
+            self.line += newlines
+            self.line_index = 0
+        if len(text) == 1 or text[-1] != '"':
+            self.error("Unterminated string", fatal=True)
+        self.line_index += 1 # accounting for ending quotation
+        self.output.append(Token(TokenType.PUSH, text[1:-1], TokenType.STRING, (self.line, self.line_index), self.filename))
+
+    def lex(self, lexemes: list[str]) -> None:
+        output: list[Token] = self.output
+        append = output.append
+        filename: str = self.filename
+        classifications: dict[str, tuple] = self.classifications
+        line: int = self.line
+        line_index: int = self.line_index # Lexer counts one per scanned token/character, not per column
+        created: int = len(output)
+
+        for text in lexemes:
+            entry: tuple | None = classifications.get(text)
+            if entry is None:
+                entry = classifications[text] = self.classify(text)
+            action: int = entry[0]
+
+            if action == TOKEN:
+                line_index += entry[1]
+                append(Token(entry[2], entry[3], entry[4], (line, line_index), filename))
+            elif action == SPACE:
+                line_index += entry[1]
+            elif action == NEWLINE:
+                line += 1
+                line_index = 0
+            elif action == SKIP:
+                line_index += entry[1]
+            elif action == NEGATIVE:
+                line_index += entry[1]
+                append(Token(TokenType.PUSH, entry[2], TokenType.NUMBER, (line, line_index), filename))
+                append(Token(entry[3], None, TokenType.OPERAND, (line, line_index), filename))
+            else:
+                self.line, self.line_index = line, line_index + entry[1]
+                self.special(text[entry[1]:])
+                line, line_index = self.line, self.line_index
+
+        self.line, self.line_index = line, line_index
+        self.tokens_created += len(output) - created
+
+    def scan_tokens(self) -> None:
+        self.lex(MASTER_PATTERN.findall(self.source))
+        self.create_token(TokenType.EOF, None, TokenType.OPERAND)
+        return self.output, self.tokens_created
+
+CHUNK_SIZE: int = 65536
+CLASSIFICATIONS_LIMIT: int = 65536 # distinct lexemes remembered by StreamLexer before it starts over
+
+class StreamLexer(RegexLexer):
+    """
+    RegexLexer over a file object (or stdin), read CHUNK_SIZE characters at a time.
+    Only whole lines get lexed, the rest of a chunk waits for the next one, so the
+    only lexeme that can cross a chunk boundary is a string which is carried over
+    until its closing quote shows up.
+    """
+
+    def __init__(self, file: TextIO, filename: str, chunk_size: int = CHUNK_SIZE) -> None:
+        super().__init__("", filename)
+        self.file: TextIO = file
+        self.chunk_size: int = chunk_size
+
+    def stream(self) -> Iterator[Token]:
+        pending: str = ""
+        while chunk := self.file.read(self.chunk_size):
+            source: str = pending + chunk
+            cut: int = source.rfind("\n") + 1
+            lexemes: list[str] = MASTER_PATTERN.findall(source, 0, cut)
+            if lexemes and lexemes[-1].lstrip(SPACES)[:1] == '"': # still open, anything else ends with the "\n"
+                cut -= len(lexemes.pop())
+            pending = source[cut:]
+            self.lex(lexemes)
+            yield from self.output
+            self.output.clear()
+            if len(self.classifications) > CLASSIFICATIONS_LIMIT:
+                self.classifications.clear()
+        self.lex(MASTER_PATTERN.findall(pending))
+        self.create_token(TokenType.EOF, None, TokenType.OPERAND)
+        yield from self.output
+        self.output.clear()
+
+    def scan_tokens(self) -> None:
+        return list(self.stream()), self.tokens_created
@@ -0,0 +1,136 @@
+from time import perf_counter_ns
+from typing import Dict, List, Set, Tuple
+import os
+
+from .cache import ProgramCache
+from .errors import CompileError
+from .lexer import Lexer, RegexLexer
+from .tokentype import Token, TokenType
+
+class ModuleLoader:
+    """
+    Resolves `include "path.porth"` by splicing the included file in place of the
+    include. Every file is lexed once per process, and a module only goes into a
+    program the first time it's included, so diamond includes don't define things twice.
+    Paths are relative to the including file, falling back to the working directory.
+    """
+
+    def __init__(self, lexer: type[Lexer] = RegexLexer, cache: ProgramCache | None = None) -> None:
+        self.lexer: type[Lexer] = lexer
+        self.cache: ProgramCache | None = cache
+
+        self.modules: Dict[str, Tuple[int, List[Token]]] = {} # real path -> (mtime it was lexed at, tokens)
+        self.includes: Dict[str, List[Tuple[int, Token, str, str]]] = {} # real path -> (index, include token, real path, path) per include
+        self.dependents: Dict[str, Set[str]] = {} # real path -> real paths of the modules including it
+        self.programs: Dict[str, List[Token]] = {} # real path of a root -> linked program
+
+        self.tokens_lexed: int = 0
+        self.reading_ns: int = 0 # time spent reading sources, the rest of load() is lexing and linking
+
+    def error(self, token: Token, message: str) -> None:
+        raise CompileError(f"{token.filename}:{token.position[0]}:{token.position[1]}: {message}")
+
+    def resolve(self, token: Token, including: str) -> str:
+        path: str = os.path.normpath(os.path.join(os.path.dirname(including), token.value))
+        if not os.path.isfile(path) and os.path.isfile(token.value):
+            path = os.path.normpath(token.value)
+        if not os.path.isfile(path):
+            self.error(token, f"Unable to include \"{token.value}\", no such file")
+        return path
+
+    def lex(self, path: str) -> List[Token]:
+        start: int = perf_counter_ns()
+        with open(path, "r") as file:
+            source: str = file.read()
+        self.reading_ns += perf_counter_ns() - start
+        if self.cache is not None:
+            tokens, _ = self.cache.lex(source, path, self.lexer)
+        else:
+            tokens, _ = self.lexer(source, path).scan_tokens()
+        return tokens
+
+    def module(self, key: str, path: str) -> List[Token]:
+        mtime: int = os.stat(path).st_mtime_ns
+        loaded: Tuple[int, List[Token]] | None = self.modules.get(key)
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+        if loaded is not None:
+            self.invalidate(key)
+
+        tokens: List[Token] = self.lex(path)
+        self.tokens_lexed += len(tokens) - 1
+        includes: List[Tuple[int, Token, str, str]] = []
+        for index, token in enumerate(tokens):
+            if token._type != TokenType.INCLUDE:
+                continue
+            following: Token = tokens[index + 1] # at worst the EOF
+            if following._type != TokenType.PUSH or following.value_type != TokenType.STRING:
+                self.error(token, "Expected a file path after \"include\"")
+            included: str = self.resolve(following, path)
+            includes.append((index, token, os.path.realpath(included), included))
+
+        for _, _, included_key, _ in self.includes.get(key, []):
+            self.dependents[included_key].discard(key)
+        for _, _, included_key, _ in includes:
+            self.dependents.setdefault(included_key, set()).add(key)
+        self.modules[key] = (mtime, tokens)
+        self.includes[key] = includes
+        return tokens
+
+    def invalidate(self, key: str) -> None:
+        """
+        Forgets a changed module, along with every linked program that includes it
+        (directly or not). Everything else, including the lexed dependents, stays.
+        """
+        self.modules.pop(key, None)
+        stale: List[str] = [key]
+        seen: Set[str] = { key }
+        while stale:
+            module: str = stale.pop()
+            self.programs.pop(module, None)
+            for dependent in self.dependents.get(module, ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stale.append(dependent)
+
+    def refresh(self) -> None:
+        for key in list(self.modules):
+            if key in self.modules and (not os.path.exists(key) or os.stat(key).st_mtime_ns != self.modules[key][0]):
+                self.invalidate(key)
+
+    def link(self, key: str, path: str, linked: Set[str], loading: List[Tuple[str, str]], output: List[Token]) -> None:
+        loading.append((key, path))
+        tokens: List[Token] = self.module(key, path)
+        start: int = 0
+        for index, token, included_key, included in self.includes[key]:
+            output.extend(tokens[start:index])
+            start = index + 2
+            for position, (loading_key, _) in enumerate(loading):
+                if loading_key == included_key:
+                    self.error(token, f"Include cycle: {' -> '.join(loading_path for _, loading_path in loading[position:])} -> {included}")
+            if included_key not in linked:
+                linked.add(included_key)
+                self.link(included_key, included, linked, loading, output)
+        output.extend(tokens[start:-1]) # only the root's EOF ends up in the program
+        loading.pop()
+
+    def load(self, path: str) -> List[Token]:
+        """
+        The program rooted at path with every include spliced in, ending in an EOF.
+        """
+        self.refresh()
+        key: str = os.path.realpath(path)
+        program: List[Token] | None = self.programs.get(key)
+        if program is not None:
+            return program
+        program = []
+        self.link(key, path, { key }, [], program)
+        program.append(self.modules[key][1][-1])
+        self.programs[key] = program
+        return program
+
+    def print_graph(self) -> None:
+        for key, includes in self.includes.items():
+            print(f"{os.path.relpath(key)}:")
+            for _, _, included_key, _ in includes:
+                print(f"    -> {os.path.relpath(included_key)}")
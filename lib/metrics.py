@@ -0,0 +1,105 @@
+from time import perf_counter_ns
+from typing import Any, Dict, List, Tuple
+import json
+
+from .interpreter import Interpreter
+from .tokentype import Token
+
+PHASES: Tuple[str, ...] = ("read", "lex", "analysis", "link", "vm_init", "execute", "compile") # in the order a run goes through them, link is resolving jumps or compiling bytecode
+
+class Metrics:
+    """
+    Phase times and counters of one porth.py run, printed by -time and written
+    as JSON by -metrics=path. Phases are timed with perf_counter_ns and only the
+    ones the run went through show up, counters that couldn't be measured
+    (peak stack depth on the bytecode engine, the heap counters everywhere) are None. Token counts
+    leave out the EOF token.
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, int] = {} # phase -> ns
+        self.counters: Dict[str, int | None] = {}
+        self.notes: List[str] = []
+
+        self.phase: str = ""
+        self.started: int = 0
+        self.created: int = perf_counter_ns()
+
+    def begin(self, phase: str) -> None:
+        """
+        Starts timing phase, ending the one that's running.
+        """
+        self.end()
+        self.phase = phase
+        self.started = perf_counter_ns()
+
+    def end(self) -> None:
+        if self.phase:
+            self.add(self.phase, perf_counter_ns() - self.started)
+            self.phase = ""
+
+    def add(self, phase: str, elapsed: int) -> None:
+        self.phases[phase] = self.phases.get(phase, 0) + elapsed
+
+    def collect(self, runner: Any) -> None:
+        """
+        Counters of whatever ran the program, an Interpreter or an Engine.
+        """
+        measured: bool = isinstance(runner, MeasuringInterpreter)
+        self.counters["peak_stack_depth"] = runner.peak_stack if measured else None
+        self.counters["proc_calls"] = runner.calls if measured else None
+        self.counters["peak_call_depth"] = runner.peak_depth if measured else None
+        for name in ("allocations", "frees", "peak_heap_bytes", "heap_size_bytes"): # no word allocates through runner.vm yet, so there's nothing to count
+            self.counters[name] = None
+
+    def total(self) -> int:
+        return perf_counter_ns() - self.created
+
+    def report(self) -> None:
+        total: int = self.total()
+        print(f"\n  {'phase':<12}{'ms':>12}{'%':>8}")
+        for phase in PHASES:
+            if phase in self.phases:
+                print(f"  {phase:<12}{self.phases[phase] / 1e6:>12.3f}{100 * self.phases[phase] / total:>8.1f}")
+        print(f"  {'total':<12}{total / 1e6:>12.3f}")
+        print()
+        for name, value in self.counters.items():
+            print(f"  {name.replace('_', ' '):<20}{'-' if value is None else value:>12}")
+        for note in self.notes:
+            print(f"  ({note})")
+
+    def write(self, path: str, details: Dict[str, Any]) -> None:
+        document: Dict[str, Any] = {
+            **details,
+            "phases_ns" : { phase : self.phases[phase] for phase in PHASES if phase in self.phases },
+            "total_ns" : self.total(),
+            "counters" : self.counters,
+            "notes" : self.notes,
+        }
+        with open(path, "w") as file:
+            json.dump(document, file, indent=2)
+            file.write("\n")
+
+class MeasuringInterpreter(Interpreter):
+    """
+    Keeps the counters Metrics reports that only the running program knows,
+    peak stack depth, proc calls and how deep they nest. The extra call per
+    token shows up in the execute phase, up to ~10% on call heavy scripts.
+    """
+
+    def __init__(self, tokens: List[Token], jumps: Dict[Token, int] | None = None) -> None:
+        super().__init__(tokens, jumps)
+        self.peak_stack: int = 0
+        self.calls: int = 0
+        self.peak_depth: int = 0 # tail calls don't add to it
+
+    def call(self, obj: List[Token], name: str) -> None:
+        super().call(obj, name)
+        self.calls += 1
+        if len(self.call_stack) > self.peak_depth:
+            self.peak_depth = len(self.call_stack)
+
+    def interpret_token(self) -> None:
+        super().interpret_token()
+        if len(self.stack) > self.peak_stack:
+            self.peak_stack = len(self.stack)
@@ -0,0 +1,127 @@
+from typing import Any, Dict, List
+
+from .jumptable import resolve_jumps
+from .tokentype import Token, TokenType
+
+FOLDABLE: Dict[TokenType, Any] = {
+    TokenType.PLUS        : lambda below, top: top + below, # same operand order as the interpreter
+    TokenType.LT          : lambda below, top: below < top,
+    TokenType.EQUAL_EQUAL : lambda below, top: top == below,
+}
+
+class Optimizer:
+    """
+    Peephole pass over the token stream, run after macro expansion.
+
+    -O1 folds "a b +", "a b <" and "a b ==" on literals and drops "swap swap",
+    plus "dup drop" and "literal drop" when the program never stores a variable
+    (drop deletes the variable named by what it pops, so otherwise it isn't a no-op).
+    -O2 also prunes if/else blocks whose condition is a literal.
+
+    Output is built up as a stack, so "1 2 + 3 +" folds all the way and a pruned
+    branch can fold into the code around it. Nothing is touched within reach of a
+    "->", which reads the tokens after it as they're written.
+    """
+
+    def __init__(self, tokens: List[Token], level: int = 1) -> None:
+        self.tokens: List[Token] = tokens
+        self.level: int = level
+        self.jumps: Dict[Token, int] = {}
+
+        self.stores_variables: bool = any(
+            token._type == TokenType.EQUAL or (token._type == TokenType.OBJECT_ASSIGN and index + 1 < len(tokens) and tokens[index + 1]._type == TokenType.LT)
+            for index, token in enumerate(tokens)
+        )
+
+        self.folded: int = 0
+        self.shuffles: int = 0
+        self.pruned: int = 0
+        self.eliminated: int = 0
+
+    def is_literal(self, token: Token) -> bool:
+        return (token._type == TokenType.PUSH and token.value_type != TokenType.IDENTIFIER) or token._type in (TokenType.TRUE, TokenType.FALSE)
+
+    def value(self, token: Token) -> Any:
+        if token._type == TokenType.PUSH:
+            return token.value
+        return token._type == TokenType.TRUE
+
+    def literal(self, value: Any, at: Token) -> Token:
+        if isinstance(value, bool):
+            return Token(TokenType.TRUE if value else TokenType.FALSE, None, TokenType.BOOL, at.position, at.filename)
+        return Token(TokenType.PUSH, value, TokenType.STRING if isinstance(value, str) else TokenType.NUMBER, at.position, at.filename)
+
+    def guarded(self, output: List[Token], count: int) -> bool:
+        """
+        Whether the last count tokens of output are read by a "->" in front of them.
+        """
+        return any(token._type == TokenType.ARROW for token in output[max(0, len(output) - count - 3) : len(output) - count])
+
+    def fold(self, token: Token, output: List[Token]) -> bool:
+        if len(output) < 2 or not self.is_literal(output[-1]) or not self.is_literal(output[-2]) or self.guarded(output, 2):
+            return False
+        try:
+            value: Any = FOLDABLE[token._type](self.value(output[-2]), self.value(output[-1]))
+        except TypeError: # fails at runtime, leave it to fail there
+            return False
+        del output[-2:]
+        output.append(self.literal(value, token))
+        self.folded += 1
+        return True
+
+    def shuffle(self, token: Token, output: List[Token]) -> bool:
+        if not output or self.guarded(output, 1):
+            return False
+        previous: Token = output[-1]
+        if token._type == TokenType.SWAP and previous._type == TokenType.SWAP:
+            output.pop()
+        elif token._type == TokenType.DROP and not self.stores_variables and (previous._type == TokenType.DUP or self.is_literal(previous)):
+            output.pop()
+        else:
+            return False
+        self.shuffles += 1
+        return True
+
+    def optimize(self) -> List[Token]:
+        if self.level <= 0:
+            return self.tokens
+        if self.level >= 2:
+            self.jumps = resolve_jumps(self.tokens)
+
+        output: List[Token] = []
+        tokens: List[Token] = self.tokens
+        resume: Dict[int, int] = {} # index of a pruned else/end -> index to carry on from
+        index: int = 0
+        while index < len(tokens):
+            if index in resume:
+                index = resume.pop(index)
+                continue
+            token: Token = tokens[index]
+            index += 1
+
+            if token._type in FOLDABLE and self.fold(token, output):
+                continue
+            if token._type in (TokenType.SWAP, TokenType.DROP) and self.shuffle(token, output):
+                continue
+            if token._type == TokenType.IF and self.level >= 2 and output and self.is_literal(output[-1]) and not self.guarded(output, 1):
+                target: int = index - 1 + self.jumps.get(token, 0)
+                has_else: bool = target < len(tokens) and tokens[target]._type == TokenType.ELSE
+                end: int = target + self.jumps.get(tokens[target], 0) if has_else else target
+                if end < len(tokens) and tokens[end]._type == TokenType.END:
+                    if self.value(output.pop()):
+                        resume[target] = end + 1 # runs the then branch, skips else ... end
+                    elif has_else:
+                        index = target + 1
+                        resume[end] = end + 1
+                    else:
+                        index = end + 1
+                    self.pruned += 1
+                    continue
+
+            output.append(token)
+
+        self.eliminated = len(tokens) - len(output)
+        return output
+
+    def report(self) -> str:
+        return f"Optimizer (-O{self.level}) eliminated {self.eliminated} of {len(self.tokens)} tokens ({self.folded} folded, {self.shuffles} shuffles, {self.pruned} branches)"
@@ -1,65 +1,181 @@
+from typing import List
+
+from .errors import CompileError
 from .tokentype import Token, TokenType
-from .expr import Expr
+from .expr import Expr, Push, Word, Call, If, Proc, Macro, Struct, Unwrap, Grab, Instance, Bind, Arrow
+
+STRUCTURAL: frozenset[TokenType] = frozenset((TokenType.PUSH, TokenType.PROC, TokenType.MACRO, TokenType.IF, TokenType.PIPE, TokenType.ARROW)) # parse_expr's, anything else is a Word
+NAMING: frozenset[TokenType] = frozenset((TokenType.OBJECT_ASSIGN, TokenType.CALL)) # make the push before them a definition or a call
+CLOSERS: frozenset[TokenType] = frozenset((TokenType.END, TokenType.ELSE, TokenType.EOF))
 
 class Parser:
 
-    def __init__(self, tokens: list[Token]) -> None:
-        self.tokens: list[Token] = tokens
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens: List[Token] = tokens
 
         self.index: int = 0
-        self.stack: list[any] = []
 
-        self.output: list[list[Token]] = []
+        self.output: List[Expr] = []
+
+    def error(self, token: Token, message: str) -> None:
+        raise CompileError(f"{token.filename}:{token.position[0]}:{token.position[1]}: {message}")
 
-        self.end_tolerance: int = 0
-    
     def advance(self) -> Token:
         token: Token = self.tokens[self.index]
         self.index += 1
         return token
-    
+
+    def peek(self, offset: int = 0) -> Token | None:
+        if self.index + offset < len(self.tokens):
+            return self.tokens[self.index + offset]
+        return None
+
+    def check(self, offset: int, _type: TokenType) -> bool:
+        token: Token | None = self.peek(offset)
+        return token is not None and token._type == _type
+
     def at_end(self) -> bool:
-        return self.tokens[self.index]._type == TokenType.EOF
-
-    def parse(self) -> None:
-        tokens: list[Token] = []
-
-        procs: dict[str, list[Token]] = {}
-        structs: dict[str, list[Token]] = {}
-        enums: dict[str, list[Token]] = {}
-        macros: dict[str, list[Token]] = {}
-
-        while not self.at_end():
-            token: Token = self.advance()
-
-            match token._type:
-
-                case TokenType.PROC:
-                    self.construct_proc()
-
-    def construct_proc(self) -> None:
-        proc_name: str = ""
-        if self.tokens[self.index - 2]._type == TokenType.OBJECT_ASSIGN:
-            proc_name = self.tokens[self.index - 3].value
-        proc_contents: list[Token] = []
-        while True:
-            self.token: Token = self.advance()
-            if self.token._type == TokenType.PROC:
-                self.proc_buffer.append([self.proc_name, self.proc_contents])
-                self.proc_contents = []
-                self.proc_name = ""
-                self.buffer_index += 1
-                return
-
-            if self.end_tolerance == 0 and self.token._type == TokenType.END:
-                self.fall_through = False
-                return
-
-            if self.token._type != TokenType.END:
-                if self.token._type == TokenType.IF:
-                    self.end_tolerance += 1
+        return self.index >= len(self.tokens) or self.tokens[self.index]._type == TokenType.EOF
+
+    def parse(self) -> List[Expr]:
+        closer: TokenType | None = self.parse_block(self.output)
+        if closer == TokenType.END:
+            self.error(self.advance(), "Found an \"end\" without a block to close")
+        if closer == TokenType.ELSE:
+            self.error(self.advance(), "Found an \"else\" statement before an \"if\" statement")
+        return self.output
+
+    def parse_block(self, body: List[Expr]) -> TokenType | None:
+        """
+        Parses into body up to the next end, else or EOF and returns its type, None
+        when the tokens run out. Plain pushes and words are most of a program, they're
+        made right here.
+        """
+        tokens: List[Token] = self.tokens
+        while self.index < len(tokens):
+            token: Token = tokens[self.index]
+            if token._type == TokenType.PUSH and (self.index + 1 == len(tokens) or tokens[self.index + 1]._type not in NAMING):
+                body.append(Push(token, token, token.value, token.value_type))
+                self.index += 1
+            elif token._type in STRUCTURAL:
+                self.parse_expr(body)
+            elif token._type in CLOSERS:
+                return token._type
             else:
-                self.end_tolerance -= 1
+                body.append(Word(token, token, token._type))
+                self.index += 1
+        return None
+
+    def parse_body(self, opener: Token, allow_else: bool = False) -> tuple[List[Expr], Token]:
+        body: List[Expr] = []
+        closer: TokenType | None = self.parse_block(body)
+        if closer == TokenType.ELSE and not allow_else:
+            self.error(self.advance(), "Found an \"else\" statement before an \"if\" statement")
+        if closer == TokenType.END or closer == TokenType.ELSE:
+            return body, self.advance()
+        self.error(opener, f"Unterminated \"{opener._type.name.lower()}\", expected a matching \"end\"")
+
+    def parse_definition(self, name_token: Token, body: List[Expr]) -> None:
+        self.advance() # ::
+        following: Token | None = self.peek()
+        name: str = name_token.value
+
+        if following is None or following._type == TokenType.EOF:
+            self.error(name_token, f"Expected something to bind to \"{name}\"")
+
+        match following._type:
+
+            case TokenType.PROC:
+                self.advance()
+                contents, end = self.parse_body(following)
+                body.append(Proc(name_token, end, name, contents))
+
+            case TokenType.MACRO:
+                self.advance()
+                contents, end = self.parse_body(following)
+                for expr in contents:
+                    if isinstance(expr, (Proc, Macro, Struct)):
+                        self.error(following, f"Unable to have object definition inside macro \"{name}\" ({expr.describe()} @ {expr.span})")
+                body.append(Macro(name_token, end, name, contents))
+
+            case TokenType.STRUCT:
+                self.advance()
+                fields: List[tuple[str, TokenType | None]] = []
+                while not self.at_end() and not self.check(0, TokenType.END):
+                    field: Token = self.advance()
+                    field_type: Token | None = None if self.at_end() or self.check(0, TokenType.END) else self.advance()
+                    fields.append((field.value, field_type._type if field_type is not None else None))
+                if self.at_end():
+                    self.error(following, f"Unterminated \"struct\", expected a matching \"end\"")
+                end: Token = self.advance()
+                body.append(Struct(name_token, end, name, fields))
+
+            case TokenType.PIPE if self.check(2, TokenType.PIPE) and self.peek(1).value_type == TokenType.IDENTIFIER:
+                opening: Token = self.advance()
+                proc_name: Token = self.advance()
+                closing: Token = self.advance()
+                body.append(Bind(name_token, closing, name, Unwrap(opening, closing, proc_name.value)))
+
+            case TokenType.GRAB_OBJECT:
+                grab: Token = self.advance()
+                body.append(Bind(name_token, grab, name, Grab(grab, grab)))
+
+            case TokenType.LT if self.check(2, TokenType.GT) and self.peek(1).value_type == TokenType.IDENTIFIER:
+                opening: Token = self.advance()
+                struct_name: Token = self.advance()
+                closing: Token = self.advance()
+                body.append(Bind(name_token, closing, name, Instance(opening, closing, struct_name.value)))
+
+            case _: # "name :: value", rebinds whatever is on the stack at runtime
+                body.append(Push(name_token, name_token, name, name_token.value_type))
+                body.append(Word(self.tokens[self.index - 1], self.tokens[self.index - 1], TokenType.OBJECT_ASSIGN))
+
+    def parse_expr(self, body: List[Expr]) -> None:
+        token: Token = self.tokens[self.index]
+        self.index += 1
+        following: TokenType | None = self.tokens[self.index]._type if self.index < len(self.tokens) else None # called once per token, so no check()
+
+        match token._type:
+
+            case TokenType.PUSH if following == TokenType.OBJECT_ASSIGN:
+                self.parse_definition(token, body)
+
+            case TokenType.PUSH if following == TokenType.CALL and token.value_type == TokenType.IDENTIFIER:
+                body.append(Call(token, self.advance(), token.value))
+
+            case TokenType.PUSH:
+                body.append(Push(token, token, token.value, token.value_type))
+
+            case TokenType.PROC:
+                contents, end = self.parse_body(token)
+                body.append(Proc(token, end, None, contents))
+
+            case TokenType.MACRO:
+                self.error(token, "Cannot declare a macro and leave it unwrapped.\n\nTry using:\n----------------------\n[macro-name] :: macro\n    [macro-contents]\nend\n----------------------")
+
+            case TokenType.IF:
+                then_body, closing = self.parse_body(token, allow_else=True)
+                else_body: List[Expr] | None = None
+                if closing._type == TokenType.ELSE:
+                    else_body, closing = self.parse_body(closing)
+                body.append(If(token, closing, then_body, else_body))
+
+            case TokenType.PIPE if following == TokenType.PUSH and self.check(1, TokenType.PIPE) and self.peek().value_type == TokenType.IDENTIFIER:
+                proc_name: Token = self.advance()
+                closing: Token = self.advance()
+                body.append(Unwrap(token, closing, proc_name.value))
+
+            case TokenType.ARROW:
+                field: Token | None = self.peek()
+                if field is None or field.value_type != TokenType.IDENTIFIER:
+                    self.error(token, "Expected a field name after \"->\"")
+                self.advance()
+                if self.check(1, TokenType.EQUAL) and self.check(0, TokenType.PUSH):
+                    content: Token = self.advance()
+                    closing: Token = self.advance()
+                    body.append(Arrow(token, closing, field.value, Push(content, content, content.value, content.value_type)))
+                else:
+                    body.append(Arrow(token, field, field.value, None))
 
-            proc_contents.append(self.token)
-            return
\ No newline at end of file
+            case _:
+                body.append(Word(token, token, token._type))
@@ -0,0 +1,156 @@
+from time import perf_counter_ns
+from typing import Any, Dict, List, Tuple
+import signal
+
+from .interpreter import Interpreter
+from .tokentype import Token, TokenType
+
+ROOT_FRAME: str = "main" # bottom of every collapsed stack, the top-level code
+REPORT_ROWS: int = 15 # rows per table in the hot-spot report
+SAMPLE_INTERVAL: float = 0.001 # seconds of CPU time between samples by default
+
+class Profiler:
+    """
+    Collects where an Interpreter spends its time, per TokenType, per proc and
+    per call stack (the collapsed stacks flamegraph.pl and speedscope read).
+
+    With no interval every token is timed by a ProfilingInterpreter, times are
+    self times (a call's token doesn't include the proc it runs). With an
+    interval a plain Interpreter runs and a CPU timer signal samples its
+    call_stack and current token, which costs next to nothing on long scripts.
+    """
+
+    def __init__(self, interval: float = 0.0) -> None:
+        self.interval: float = interval
+        self.interpreter: Interpreter | None = None
+
+        self.counts: Dict[TokenType, int] = {} # tokens run, samples taken while on one when sampling
+        self.times: Dict[TokenType, int] = {} # self time in ns
+        self.stacks: Dict[str, int] = {} # "main;proc;proc" -> self time in ns, or samples
+        self.calls: Dict[str, int] = {}
+        self.inclusive: Dict[str, int] = {} # proc -> ns from its outermost call returning
+        self.samples: int = 0
+        self.elapsed: int = 0
+
+    def interpreter_for(self, tokens: List[Token], jumps: Dict[Token, int] | None = None) -> Interpreter:
+        return Interpreter(tokens, jumps) if self.interval else ProfilingInterpreter(tokens, self, jumps)
+
+    def sample(self, signum: int, frame: Any) -> None:
+        interpreter: Interpreter = self.interpreter
+        key: str = ";".join([ROOT_FRAME, *interpreter.call_stack])
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        token: Token | None = getattr(interpreter, "token", None)
+        if token is not None:
+            self.counts[token._type] = self.counts.get(token._type, 0) + 1
+        self.samples += 1
+
+    def run(self, interpreter: Interpreter, show_registers: bool, show_vars: bool, deconstruct: bool, proc_to_deconstruct: str) -> None:
+        """
+        Runs the program, the profile is kept even if it exits or fails half way.
+        """
+        self.interpreter = interpreter
+        if self.interval:
+            if not hasattr(signal, "setitimer"):
+                print("-profile-sample needs setitimer, which this platform doesn't have (try -profile)")
+                exit(1)
+            signal.signal(signal.SIGPROF, self.sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        start: int = perf_counter_ns()
+        try:
+            interpreter.interpret(show_registers, show_vars, deconstruct, proc_to_deconstruct)
+        finally:
+            self.elapsed = perf_counter_ns() - start
+            if self.interval:
+                signal.setitimer(signal.ITIMER_PROF, 0, 0)
+                signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def self_times(self) -> Dict[str, int]:
+        procs: Dict[str, int] = {}
+        for key, amount in self.stacks.items():
+            name: str = key.rsplit(";", 1)[-1]
+            procs[name] = procs.get(name, 0) + amount
+        return procs
+
+    def report(self) -> None:
+        if self.interval:
+            print(f"Profile: {self.samples} samples every {self.interval * 1000:g} ms of CPU time over {self.elapsed / 1e9:.3f} s")
+            total: int = max(1, self.samples)
+            print(f"\n  {'token type':<16}{'samples':>10}{'%':>8}")
+            for token_type, count in sorted(self.counts.items(), key=lambda item: -item[1])[:REPORT_ROWS]:
+                print(f"  {token_type.name:<16}{count:>10}{100 * count / total:>8.1f}")
+            print(f"\n  {'proc':<24}{'samples':>10}{'%':>8}")
+            for name, count in sorted(self.self_times().items(), key=lambda item: -item[1])[:REPORT_ROWS]:
+                print(f"  {name:<24}{count:>10}{100 * count / total:>8.1f}")
+            return
+
+        total = max(1, sum(self.times.values()))
+        print(f"Profile: {sum(self.counts.values())} tokens in {self.elapsed / 1e9:.3f} s ({total / 1e9:.3f} s inside tokens)")
+        print(f"\n  {'token type':<16}{'count':>12}{'self ms':>12}{'%':>8}{'ns/token':>10}")
+        for token_type, time in sorted(self.times.items(), key=lambda item: -item[1])[:REPORT_ROWS]:
+            count: int = self.counts[token_type]
+            print(f"  {token_type.name:<16}{count:>12}{time / 1e6:>12.3f}{100 * time / total:>8.1f}{time // count:>10}")
+        print(f"\n  {'proc':<24}{'calls':>10}{'self ms':>12}{'%':>8}{'total ms':>12}")
+        for name, time in sorted(self.self_times().items(), key=lambda item: -item[1])[:REPORT_ROWS]:
+            total_time: str = f"{self.inclusive[name] / 1e6:.3f}" if name in self.inclusive else "-"
+            print(f"  {name:<24}{self.calls.get(name, 0):>10}{time / 1e6:>12.3f}{100 * time / total:>8.1f}{total_time:>12}")
+
+    def write_collapsed(self, path: str) -> None:
+        """
+        One "frame;frame;frame value" line per stack, values are microseconds (or samples).
+        """
+        with open(path, "w") as file:
+            for key, amount in sorted(self.stacks.items()):
+                value: int = amount if self.interval else amount // 1000
+                if value:
+                    file.write(f"{key} {value}\n")
+        print(f"\nWrote collapsed stacks to {path}")
+
+class ProfilingInterpreter(Interpreter):
+    """
+    Times every token it runs for a Profiler, see Profiler. Calls don't nest
+    tokens (the body runs from the loop in execute), so a token's time is its
+    own and a call's total is from call to the leave that returns from it.
+    """
+
+    def __init__(self, tokens: List[Token], profiler: Profiler, jumps: Dict[Token, int] | None = None) -> None:
+        super().__init__(tokens, jumps)
+        self.profiler: Profiler = profiler
+        self.stack_key: str = ROOT_FRAME
+        self.timed: List[Tuple[str, str, int]] = [] # (proc, stack key of its caller, start) per running call
+        self.active: Dict[str, int] = {} # proc -> how many of its calls are running
+
+    def call(self, obj: List[Token], name: str) -> None:
+        depth: int = len(self.call_stack)
+        super().call(obj, name)
+        if len(self.call_stack) == depth: # a tail call, the proc it's made from is done
+            self.returned()
+        profiler: Profiler = self.profiler
+        profiler.calls[name] = profiler.calls.get(name, 0) + 1
+        self.active[name] = self.active.get(name, 0) + 1
+        self.timed.append((name, self.stack_key, perf_counter_ns()))
+        self.stack_key = f"{self.stack_key};{name}"
+
+    def leave(self) -> None:
+        call: bool = self.frames[-1][2]
+        super().leave()
+        if call:
+            self.returned()
+
+    def returned(self) -> None:
+        name, self.stack_key, start = self.timed.pop()
+        self.active[name] -= 1
+        if not self.active[name]: # recursive calls are already inside the outermost one
+            self.profiler.inclusive[name] = self.profiler.inclusive.get(name, 0) + perf_counter_ns() - start
+
+    def interpret_token(self) -> None:
+        profiler: Profiler = self.profiler
+        token_type: TokenType = self.tokens[self.index]._type
+        key: str = self.stack_key
+        start: int = perf_counter_ns()
+        try:
+            super().interpret_token()
+        finally:
+            elapsed: int = perf_counter_ns() - start
+            profiler.counts[token_type] = profiler.counts.get(token_type, 0) + 1
+            profiler.times[token_type] = profiler.times.get(token_type, 0) + elapsed
+            profiler.stacks[key] = profiler.stacks.get(key, 0) + elapsed
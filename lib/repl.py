@@ -0,0 +1,56 @@
+from typing import List
+
+from .interpreter import Interpreter, OPENERS
+from .jumptable import resolve_jumps
+from .lexer import Lexer, RegexLexer
+from .tokentype import Token, TokenType
+
+class Session:
+    """
+    One interpreter (and VM) kept alive across REPL lines, so procs, macros,
+    variables and the stack carry over. Lines are held back while a block is
+    still open, the whole definition runs once its "end" comes in.
+    """
+
+    def __init__(self, lexer: type[Lexer] = RegexLexer, filename: str = "porth-repl") -> None:
+        self.lexer: type[Lexer] = lexer
+        self.filename: str = filename
+        self.interpreter: Interpreter = Interpreter([])
+
+        self.line: int = 1
+        self.depth: int = 0
+        self.pending: List[Token] = []
+        self.definitions: List[bool] = [] # see Interpreter.forget, stays empty since only closed input runs
+
+    def lex(self, source: str) -> List[Token]:
+        lexer: Lexer = self.lexer(source, self.filename)
+        lexer.line = self.line
+        tokens, _ = lexer.scan_tokens()
+        self.line += 1
+        return tokens[:-1]
+
+    def feed(self, source: str) -> bool:
+        """
+        Takes one line of input, returns whether anything ran (False while a block is open).
+        """
+        tokens: List[Token] = self.lex(source)
+        for token in tokens:
+            if token._type in OPENERS:
+                self.depth += 1
+            elif token._type == TokenType.END and self.depth:
+                self.depth -= 1
+        self.pending.extend(tokens)
+        if self.depth:
+            return False
+
+        tokens, self.pending = self.pending, []
+        interpreter: Interpreter = self.interpreter
+        interpreter.tokens = tokens
+        interpreter.index = 0
+        interpreter.jumps.update(resolve_jumps(tokens))
+        while interpreter.index < len(tokens) and interpreter.tokens is tokens:
+            interpreter.interpret_token()
+            if interpreter.frames:
+                interpreter.finish_calls()
+        interpreter.forget(tokens, self.definitions)
+        return True
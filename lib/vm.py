@@ -1,72 +1,350 @@
-from random import randint
+from mmap import mmap, ACCESS_COPY, ACCESS_READ, ALLOCATIONGRANULARITY
+from struct import Struct, error as StructError
+from typing import Iterator
+import os
+
+from .allocator import Allocator
+from .errors import ExecutionError, FinnError
 
 MAX_MEMORY: int = 1048576 # megabyte of memory
 
+HEAP_BASE: int = 16 # address 0x0 is never handed out
+ALIGNMENT: int = 16
+INITIAL_MAPPING: int = 65536 # first size of a file backed heap, grows like the bytearray one
+
+HEADER: Struct = Struct("<IIIB3x") # capacity | amount | length | tag
+INTEGER: Struct = Struct("<q")
+FLOAT: Struct = Struct("<d")
+
+SNAPSHOT_MAGIC: bytes = b"FINNHEAP"
+SNAPSHOT_VERSION: int = 3
+SNAPSHOT_HEADER: Struct = Struct("<8sIQQQQ") # magic | version | top | memory | heap length | metadata length
+SNAPSHOT_HEAP_OFFSET: int = max(ALLOCATIONGRANULARITY, 4096) # heap starts on its own page so it can be mapped in place, so does the metadata after it
+SNAPSHOT_COUNTS: Struct = Struct("<II") # variables | boxed values, the first thing in the metadata
+SNAPSHOT_VARIABLE: Struct = Struct("<QI") # address | name length, then the name
+SNAPSHOT_BOXED: Struct = Struct("<QBI") # address | tag | length, then the encoded value
+
+TAG_NONE: int = 0
+TAG_INT: int = 1
+TAG_STR: int = 2
+TAG_BYTES: int = 3
+TAG_FLOAT: int = 4
+TAG_BOOL: int = 5
+TAG_OBJECT: int = 6 # doesn't fit in the block, kept in VM.boxed
+TAG_FREE: int = 255
+
+DECODERS: dict[int, any] = {
+    TAG_NONE  : lambda payload: None,
+    TAG_INT   : lambda payload: INTEGER.unpack(payload)[0],
+    TAG_STR   : lambda payload: payload.decode("utf-8"),
+    TAG_BYTES : lambda payload: payload,
+    TAG_FLOAT : lambda payload: FLOAT.unpack(payload)[0],
+    TAG_BOOL  : lambda payload: bool(payload[0]),
+}
+
+def align(size: int) -> int:
+    return (size + ALIGNMENT - 1) & ~(ALIGNMENT - 1)
+
+def page_align(size: int) -> int:
+    return -(-size // SNAPSHOT_HEAP_OFFSET) * SNAPSHOT_HEAP_OFFSET
+
+class MemoryArray:
+    """
+    Live allocations keyed by hex address, read straight out of the heap
+    instead of being mirrored in a dict (so a restored heap doesn't need rebuilding).
+    """
+
+    def __init__(self, vm: "VM") -> None:
+        self.vm: VM = vm
+
+    def get(self, memory_address: hex, default: any = None) -> list | None:
+        address: int = int(memory_address, 16)
+        if not self.vm.is_block(address):
+            return default
+        return [HEADER.unpack_from(self.vm.heap, address - HEADER.size)[1], self.vm.decode(address)]
+
+    def __getitem__(self, memory_address: hex) -> list:
+        allocation: list | None = self.get(memory_address)
+        if allocation is None:
+            raise KeyError(memory_address)
+        return allocation
+
+    def __contains__(self, memory_address: hex) -> bool:
+        return self.vm.is_block(int(memory_address, 16))
+
+    def __iter__(self) -> Iterator[hex]:
+        return (memory_address for memory_address, _ in self.items())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def items(self) -> Iterator[tuple[hex, list]]:
+        offset: int = HEAP_BASE
+        while offset < self.vm.allocator.top:
+            capacity, amount, _, tag = HEADER.unpack_from(self.vm.heap, offset)
+            if tag != TAG_FREE:
+                yield hex(offset + HEADER.size), [amount, self.vm.decode(offset + HEADER.size)]
+            offset += HEADER.size + capacity
+
 class VM:
 
-    def __init__(self) -> None:
+    def __init__(self, heap_path: str = "") -> None:
         self.memory: int = MAX_MEMORY
-        self.addresses: list[hex] = [ hex(i) for i in range(1, 2**20 + 1) ]
-        self.memory_array: dict[hex, int|None] = { hex(i) : None for i in range (1, 2**20 + 1) } # 2**20 + 1
+        self.heap_path: str = heap_path # empty keeps the heap in a bytearray, otherwise it's an mmap of this file
+        self.heap_file = None
+        self.heap: bytearray | mmap = self.map_heap(0) # grown on demand by allocate_memory_and_store
+        self.allocator: Allocator = Allocator(HEAP_BASE, ALIGNMENT)
+        self.allocator.on_free = self.mark_free
+        self.boxed: dict[int, any] = {}
+        self.blocks: set[int] = set() # addresses of live allocations, the only ones free_memory and memory_array accept
+        self.memory_array: MemoryArray = MemoryArray(self) # only live allocations
         self.variable_pointers: dict[str, int] = {}
+        self.address_variables: dict[hex, list[str]] = {} # reverse of variable_pointers
+
+        self.allocations: int = 0
+        self.frees: int = 0
+        self.peak_memory_used: int = 0 # most bytes allocated at once
+        self.on_alloc: any = None # called with (address, size, value) after an allocation, see Interpreter.add_hook
+        self.on_free: any = None # called with the address after a free
+        self.pending: mmap | None = None # metadata of a restored snapshot, read by settle the first time it's needed
+        self.pending_boxed: int = 0 # offset of the boxed values in pending
+
+    def map_heap(self, size: int) -> bytearray | mmap:
+        if self.heap_path == "":
+            return bytearray(size)
+        if self.heap_file is None:
+            self.heap_file = open(self.heap_path, "w+b")
+        size = max(size, INITIAL_MAPPING)
+        os.ftruncate(self.heap_file.fileno(), size)
+        return mmap(self.heap_file.fileno(), size)
+
+    def close(self) -> None:
+        if isinstance(self.heap, mmap):
+            self.heap.close()
+        if self.heap_file is not None:
+            self.heap_file.close()
+            self.heap_file = None
+        if self.pending is not None:
+            self.pending.close()
+            self.pending = None
 
     def assign_variable_to_address(self, variable_name: str, address: hex) -> None:
+        self.settle()
+        previous: hex | None = self.variable_pointers.get(variable_name)
+        if previous is not None:
+            self.address_variables[previous].remove(variable_name)
+            if not self.address_variables[previous]:
+                del self.address_variables[previous]
         self.variable_pointers[variable_name] = address
+        self.address_variables.setdefault(address, []).append(variable_name)
+
+    def grow(self, size: int) -> None:
+        if size <= len(self.heap):
+            return
+        size = max(size, len(self.heap) * 2)
+        if isinstance(self.heap, bytearray):
+            self.heap.extend(bytes(size - len(self.heap)))
+            return
+        try:
+            self.heap.resize(size)
+        except TypeError: # copy-on-write mapping of a snapshot, move it into our own heap first
+            heap: bytearray | mmap = self.map_heap(size)
+            heap[:len(self.heap)] = self.heap
+            self.heap.close()
+            self.heap = heap
+
+    def is_block(self, address: int) -> bool:
+        self.settle()
+        return address in self.blocks # an aligned address inside a payload looks like a block to the heap
+
+    def mark_free(self, start: int, size: int) -> None:
+        HEADER.pack_into(self.heap, start, size - HEADER.size, 0, 0, TAG_FREE)
 
-    def allocate_memory_and_store(self, amount_of_memory: int, value: any) -> None:
+    def encode(self, value: any) -> tuple[int, bytes]:
+        if value is None:
+            return TAG_NONE, b""
+        if isinstance(value, bool):
+            return TAG_BOOL, bytes([value])
+        if isinstance(value, int) and -2**63 <= value < 2**63:
+            return TAG_INT, INTEGER.pack(value)
+        if isinstance(value, float):
+            return TAG_FLOAT, FLOAT.pack(value)
+        if isinstance(value, str):
+            return TAG_STR, value.encode("utf-8")
+        if isinstance(value, (bytes, bytearray)):
+            return TAG_BYTES, bytes(value)
+        return TAG_OBJECT, b""
+
+    def decode(self, address: int) -> any:
+        _, _, length, tag = HEADER.unpack_from(self.heap, address - HEADER.size)
+        if tag == TAG_OBJECT:
+            self.settle()
+            return self.boxed[address]
+        return DECODERS[tag](bytes(self.heap[address : address + length]))
+
+    def allocate_memory_and_store(self, amount_of_memory: int, value: any) -> hex:
+        self.settle()
         self.memory -= amount_of_memory
         if self.memory < 0:
-            print(f"you fucked up buddy")
-            exit(1)
+            self.memory += amount_of_memory
+            raise ExecutionError(f"MemoryError: Tried to allocate {amount_of_memory} bytes with {self.memory} bytes of the {MAX_MEMORY} byte heap left")
         else:
-            memory_address: hex = hex(randint(0, 2**20))
-            if memory_address not in self.addresses:
-                while memory_address not in self.addresses:
-                    memory_address = hex(randint(0, 2**20))
-            self.addresses.remove(memory_address)
-            self.memory_array[memory_address] = [amount_of_memory, value]
+            self.allocations += 1
+            if MAX_MEMORY - self.memory > self.peak_memory_used:
+                self.peak_memory_used = MAX_MEMORY - self.memory
+            tag, payload = self.encode(value)
+            capacity: int = align(max(amount_of_memory, INTEGER.size))
+            if len(payload) > capacity:
+                tag, payload = TAG_OBJECT, b""
+            offset, block_size = self.allocator.allocate(HEADER.size + capacity)
+            self.grow(self.allocator.top)
+            address: int = offset + HEADER.size
+            self.blocks.add(address)
+            HEADER.pack_into(self.heap, offset, block_size - HEADER.size, amount_of_memory, len(payload), tag)
+            self.heap[address : address + len(payload)] = payload
+            if tag == TAG_OBJECT:
+                self.boxed[address] = value
+            memory_address: hex = hex(address)
+            if self.on_alloc is not None:
+                self.on_alloc(memory_address, amount_of_memory, value)
             return memory_address
 
     def assign_memory(self, amount_of_memory: int) -> hex:
         """
         deprecated trash, do not use
         """
-        self.memory -= amount_of_memory
-        if self.memory < 0:
-            print(f"MemoryError: Tried to allocate {amount_of_memory} bytes with {self.memory + amount_of_memory} bytes available ({self.memory} byte diff)")
-            exit(1)
-        else:
-            memory_address: hex = hex(randint(0, 2**20))
-            if memory_address not in self.addresses:
-                while memory_address not in self.addresses:
-                    memory_address = hex(randint(0, 2**20))
-            self.addresses.remove(memory_address)
-            self.memory_array[memory_address] = [amount_of_memory, None]
-            return memory_address
+        if self.memory - amount_of_memory < 0:
+            raise ExecutionError(f"MemoryError: Tried to allocate {amount_of_memory} bytes with {self.memory} bytes available ({self.memory - amount_of_memory} byte diff)")
+        return self.allocate_memory_and_store(amount_of_memory, None)
 
     def free_memory(self, memory_address: hex) -> None:
-        if self.memory_array[memory_address] == None:
+        offset: int = int(memory_address, 16)
+        if not self.is_block(offset):
             return
-        self.memory += self.memory_array[memory_address][0]
-        self.copy = list(self.variable_pointers.items())
-        for address in self.copy:
-            if address[1] == memory_address: del self.variable_pointers[address[0]]
-        self.addresses.append(memory_address)
-        self.memory_array[memory_address] = None
+        capacity, amount, _, _ = HEADER.unpack_from(self.heap, offset - HEADER.size)
+        self.memory += amount
+        self.frees += 1
+        for variable_name in self.address_variables.pop(memory_address, []):
+            del self.variable_pointers[variable_name]
+        self.boxed.pop(offset, None)
+        self.blocks.discard(offset)
+        self.mark_free(offset - HEADER.size, HEADER.size + capacity)
+        self.allocator.free(offset - HEADER.size, HEADER.size + capacity)
+        if self.on_free is not None:
+            self.on_free(memory_address)
+
+    def snapshot(self, path: str) -> None:
+        """
+        Writes the heap as it is, then the variables and boxed values as fixed
+        layout records. Free lists and live blocks aren't stored, the block
+        headers in the heap are enough to find them again.
+        """
+        self.settle()
+        top: int = self.allocator.top
+        metadata: bytearray = bytearray(SNAPSHOT_COUNTS.pack(len(self.variable_pointers), len(self.boxed)))
+        for variable_name, address in self.variable_pointers.items():
+            name: bytes = variable_name.encode("utf-8")
+            metadata += SNAPSHOT_VARIABLE.pack(int(address, 16), len(name)) + name
+        for address, value in self.boxed.items():
+            tag, payload = self.encode(value)
+            if tag == TAG_OBJECT:
+                raise ExecutionError(f"Can't snapshot the {type(value).__name__} stored at {hex(address)}")
+            metadata += SNAPSHOT_BOXED.pack(address, tag, len(payload)) + payload
+        temporary_path: str = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, top, self.memory, top, len(metadata)))
+            file.seek(SNAPSHOT_HEAP_OFFSET)
+            with memoryview(self.heap) as heap:
+                file.write(heap[:top])
+            file.seek(SNAPSHOT_HEAP_OFFSET + page_align(top))
+            file.write(metadata)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    def restore(self, path: str) -> None:
+        """
+        Maps the heap and the metadata of a snapshot, the heap copy-on-write
+        so the snapshot itself is never written to. Only the variables are
+        read here (one record per name), the free lists, live blocks and
+        boxed values are rebuilt by settle when they're first needed, so
+        that walk over every block header is paid by the first allocation,
+        free or lookup after a restore instead of by restore itself.
+        """
+        with open(path, "rb") as file:
+            try:
+                magic, version, top, memory, heap_length, metadata_length = SNAPSHOT_HEADER.unpack(file.read(SNAPSHOT_HEADER.size))
+            except StructError:
+                raise FinnError(f"{path}: not a heap snapshot, it's too short") from None
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise FinnError(f"{path}: not a heap snapshot (or one from another version)")
+            metadata_offset: int = SNAPSHOT_HEAP_OFFSET + page_align(heap_length)
+            if os.fstat(file.fileno()).st_size < metadata_offset + metadata_length or metadata_length < SNAPSHOT_COUNTS.size:
+                raise FinnError(f"{path}: the heap snapshot is cut short")
+            self.close()
+            self.heap = mmap(file.fileno(), heap_length, access=ACCESS_COPY, offset=SNAPSHOT_HEAP_OFFSET) if heap_length > 0 else self.map_heap(0)
+            self.pending = mmap(file.fileno(), metadata_length, access=ACCESS_READ, offset=metadata_offset)
+
+        self.memory = memory
+        self.allocator = Allocator(HEAP_BASE, ALIGNMENT)
+        self.allocator.top = top
+        self.allocator.on_free = self.mark_free
+        self.variable_pointers = {}
+        self.address_variables = {}
+        variables, _ = SNAPSHOT_COUNTS.unpack_from(self.pending, 0)
+        position: int = SNAPSHOT_COUNTS.size
+        for _ in range(variables):
+            address, length = SNAPSHOT_VARIABLE.unpack_from(self.pending, position)
+            position += SNAPSHOT_VARIABLE.size
+            variable_name: str = self.pending[position : position + length].decode("utf-8")
+            self.variable_pointers[variable_name] = hex(address)
+            self.address_variables.setdefault(hex(address), []).append(variable_name)
+            position += length
+        self.pending_boxed = position
+
+    def settle(self) -> None:
+        """
+        Finishes a restore, walks the block headers for the free and live
+        blocks and reads the boxed values. Does nothing otherwise.
+        """
+        if self.pending is None:
+            return
+        metadata: mmap = self.pending
+        self.pending = None
+        free_starts: dict[int, int] = {}
+        self.blocks = set()
+        offset: int = HEAP_BASE
+        while offset < self.allocator.top:
+            capacity, _, _, tag = HEADER.unpack_from(self.heap, offset)
+            if tag == TAG_FREE:
+                free_starts[offset] = HEADER.size + capacity
+            else:
+                self.blocks.add(offset + HEADER.size)
+            offset += HEADER.size + capacity
+        self.allocator.load(self.allocator.top, free_starts)
+
+        _, boxed = SNAPSHOT_COUNTS.unpack_from(metadata, 0)
+        position: int = self.pending_boxed
+        self.boxed = {}
+        for _ in range(boxed):
+            address, tag, length = SNAPSHOT_BOXED.unpack_from(metadata, position)
+            position += SNAPSHOT_BOXED.size
+            self.boxed[address] = DECODERS[tag](metadata[position : position + length])
+            position += length
+        metadata.close()
 
     def print_total_used_memory(self) -> None:
+        self.settle()
         memory_used: int = MAX_MEMORY - self.memory
         if memory_used == 0:
             print("Total Memory Used: 0 bytes")
         else:
             print(f"Total Memory Used: {memory_used} bytes\n    at addresses:")
             for address in self.memory_array.items():
-                if self.memory_array[address[0]] != None:
-                    padding: int = 12 - (len(str(address[1][0])) + len(address[0]))
-                    if address[0] in self.variable_pointers.values():
-                        for variable in self.variable_pointers.items():
-                            if variable[1] == address[0]:
-                                print(f"        {address[0]} -> {address[1][0]} bytes {' ' * padding}| ({variable[0]})")
-                    else:
-                        print(f"        {address[0]} -> {address[1][0]} bytes {' ' * padding}|")
+                padding: int = 12 - (len(str(address[1][0])) + len(address[0]))
+                if address[0] in self.address_variables:
+                    for variable_name in self.address_variables[address[0]]:
+                        print(f"        {address[0]} -> {address[1][0]} bytes {' ' * padding}| ({variable_name})")
+                else:
+                    print(f"        {address[0]} -> {address[1][0]} bytes {' ' * padding}|")
         print("\n")
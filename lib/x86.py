@@ -0,0 +1,305 @@
+from struct import pack
+from typing import Dict, List, Tuple
+
+RAX: int = 0
+RCX: int = 1
+RDX: int = 2
+RBX: int = 3
+RSP: int = 4
+RBP: int = 5
+RSI: int = 6
+RDI: int = 7
+R8: int = 8
+R9: int = 9
+R10: int = 10
+R11: int = 11
+R12: int = 12
+R13: int = 13
+R14: int = 14
+R15: int = 15
+
+# condition codes, the low nibble of jcc/setcc
+OVERFLOW: int = 0x0
+BELOW: int = 0x2
+BELOW_EQUAL: int = 0x6
+ABOVE: int = 0x7
+EQUAL: int = 0x4
+NOT_EQUAL: int = 0x5
+LESS: int = 0xC
+NOT_SIGN: int = 0x9
+GREATER_EQUAL: int = 0xD
+
+# ALU operations, (opcode of "op r/m64, r64", /digit of "op r/m64, imm")
+ADD: Tuple[int, int] = (0x01, 0)
+OR: Tuple[int, int] = (0x09, 1)
+AND: Tuple[int, int] = (0x21, 4)
+SUB: Tuple[int, int] = (0x29, 5)
+XOR: Tuple[int, int] = (0x31, 6)
+CMP: Tuple[int, int] = (0x39, 7)
+
+NAMES: Tuple[str, ...] = ("rax", "rcx", "rdx", "rbx", "rsp", "rbp", "rsi", "rdi", "r8", "r9", "r10", "r11", "r12", "r13", "r14", "r15")
+DWORD_NAMES: Tuple[str, ...] = ("eax", "ecx", "edx", "ebx", "esp", "ebp", "esi", "edi", "r8d", "r9d", "r10d", "r11d", "r12d", "r13d", "r14d", "r15d")
+BYTE_NAMES: Tuple[str, ...] = ("al", "cl", "dl", "bl", "spl", "bpl", "sil", "dil", "r8b", "r9b", "r10b", "r11b", "r12b", "r13b", "r14b", "r15b")
+
+CONDITIONS: Dict[int, str] = { OVERFLOW : "o", BELOW : "b", BELOW_EQUAL : "be", ABOVE : "a", EQUAL : "e", NOT_EQUAL : "ne", LESS : "l", NOT_SIGN : "ns", GREATER_EQUAL : "ge" }
+OPERATIONS: Dict[Tuple[int, int], str] = { ADD : "add", OR : "or", AND : "and", SUB : "sub", XOR : "xor", CMP : "cmp" }
+
+def mem(base: int, disp: int = 0) -> Tuple[str, int, int]:
+    return ("mem", base, disp)
+
+def rip(label: str) -> Tuple[str, str]:
+    return ("rip", label)
+
+def operand_text(operand: int | tuple, names: Tuple[str, ...] = NAMES, size: str = "qword") -> str:
+    if isinstance(operand, int):
+        return names[operand]
+    if operand[0] == "rip":
+        return f"{size} [rel {operand[1]}]".lstrip()
+    _, base, disp = operand
+    return f"{size} [{NAMES[base]}{f' + {disp}' if disp > 0 else f' - {-disp}' if disp < 0 else ''}]".lstrip()
+
+class Assembler:
+    """
+    Just enough of an x86-64 encoder for NativeCompiler. Operands are registers
+    (ints), mem(base, disp) or rip(label). Jumps, calls and rip-relative operands
+    are left as fixups until link() knows where the code and data end up.
+    Data labels live in the data segment, reserve()d ones in the bss after it.
+
+    Every instruction is also written to listing as NASM source, text() puts
+    the whole program together.
+    """
+
+    def __init__(self) -> None:
+        self.code: bytearray = bytearray()
+        self.data: bytearray = bytearray()
+        self.bss_size: int = 0
+
+        self.labels: Dict[str, int] = {}      # code label -> offset in code
+        self.data_labels: Dict[str, int] = {} # data label -> offset in data
+        self.bss_labels: Dict[str, int] = {}  # bss label -> offset in bss
+        self.bss_sizes: Dict[str, int] = {}
+        self.fixups: List[Tuple[int, str, int]] = [] # (offset of rel32, label, bytes of instruction after it)
+        self.strings: Dict[bytes, str] = {}
+
+        self.listing: List[str] = []
+
+    def emit(self, line: str) -> None:
+        self.listing.append(f"  {line}")
+
+    def comment(self, line: str) -> None:
+        self.listing.append(f"  ; {line}")
+
+    def label(self, name: str) -> None:
+        self.labels[name] = len(self.code)
+        self.listing.append(f"{name}:")
+
+    def string(self, contents: bytes) -> str:
+        """
+        [length : 8][bytes], 8 aligned so the two low bits of its address are free for a tag.
+        """
+        if contents not in self.strings:
+            self.data.extend(bytes(-len(self.data) % 8))
+            name: str = f"str{len(self.strings)}"
+            self.data_labels[name] = len(self.data)
+            self.data.extend(pack("<Q", len(contents)) + contents)
+            self.strings[contents] = name
+        return self.strings[contents]
+
+    def reserve(self, name: str, size: int, alignment: int = 16) -> None:
+        self.bss_size += -self.bss_size % alignment
+        self.bss_labels[name] = self.bss_size
+        self.bss_sizes[name] = size
+        self.bss_size += size
+
+    def emit_rm(self, opcode: bytes, reg: int, operand: int | tuple, wide: bool = True, imm: bytes = b"") -> None:
+        rex: int = 0x40 | (0x08 if wide else 0) | ((reg >> 3) << 2)
+        fixup: str | None = None
+        if isinstance(operand, int):
+            rex |= operand >> 3
+            encoded: bytes = bytes([0xC0 | ((reg & 7) << 3) | (operand & 7)])
+        elif operand[0] == "rip":
+            encoded = bytes([0x05 | ((reg & 7) << 3)]) + bytes(4)
+            fixup = operand[1]
+        else:
+            _, base, disp = operand
+            rex |= base >> 3
+            mod: int = 0 if disp == 0 and (base & 7) != RBP else (1 if -128 <= disp < 128 else 2)
+            encoded = bytes([(mod << 6) | ((reg & 7) << 3) | (base & 7)])
+            if (base & 7) == RSP:
+                encoded += b"\x24"
+            if mod == 1:
+                encoded += pack("<b", disp)
+            elif mod == 2:
+                encoded += pack("<i", disp)
+        if rex != 0x40:
+            self.code.append(rex)
+        self.code.extend(opcode)
+        self.code.extend(encoded)
+        if fixup is not None:
+            self.fixups.append((len(self.code) - 4, fixup, len(imm)))
+        self.code.extend(imm)
+
+    def mov(self, destination: int | tuple, source: int | tuple) -> None:
+        self.emit(f"mov {operand_text(destination)}, {operand_text(source)}")
+        if isinstance(source, int):
+            self.emit_rm(b"\x89", source, destination)
+        else:
+            self.emit_rm(b"\x8b", destination, source)
+
+    def mov_imm(self, destination: int | tuple, value: int) -> None:
+        if isinstance(destination, int) and 0 <= value < 2**32:
+            self.emit(f"mov {DWORD_NAMES[destination]}, {value}")
+        else:
+            self.emit(f"mov {operand_text(destination)}, {value}")
+        if not isinstance(destination, int):
+            self.emit_rm(b"\xc7", 0, destination, imm=pack("<i", value))
+        elif 0 <= value < 2**32:
+            if destination >= 8:
+                self.code.append(0x41)
+            self.code.append(0xB8 + (destination & 7))
+            self.code.extend(pack("<I", value))
+        elif -2**31 <= value < 2**31:
+            self.emit_rm(b"\xc7", 0, destination, imm=pack("<i", value))
+        else:
+            self.code.append(0x48 | (destination >> 3))
+            self.code.append(0xB8 + (destination & 7))
+            self.code.extend(pack("<q", value))
+
+    def mov_byte(self, destination: tuple, source: int) -> None:
+        self.emit(f"mov {operand_text(destination, size='byte')}, {BYTE_NAMES[source]}")
+        self.emit_rm(b"\x88", source, destination, wide=False)
+
+    def lea(self, destination: int, source: tuple) -> None:
+        self.emit(f"lea {NAMES[destination]}, {operand_text(source, size='')}")
+        self.emit_rm(b"\x8d", destination, source)
+
+    def alu(self, operation: Tuple[int, int], destination: int | tuple, source: int) -> None:
+        self.emit(f"{OPERATIONS[operation]} {operand_text(destination)}, {NAMES[source]}")
+        self.emit_rm(bytes([operation[0]]), source, destination)
+
+    def alu_load(self, operation: Tuple[int, int], destination: int, source: tuple) -> None:
+        self.emit(f"{OPERATIONS[operation]} {NAMES[destination]}, {operand_text(source)}")
+        self.emit_rm(bytes([operation[0] + 2]), destination, source)
+
+    def alu_imm(self, operation: Tuple[int, int], destination: int | tuple, value: int) -> None:
+        self.emit(f"{OPERATIONS[operation]} {operand_text(destination)}, {value}")
+        if -128 <= value < 128:
+            self.emit_rm(b"\x83", operation[1], destination, imm=pack("<b", value))
+        else:
+            self.emit_rm(b"\x81", operation[1], destination, imm=pack("<i", value))
+
+    def test(self, destination: int, source: int) -> None:
+        self.emit(f"test {NAMES[destination]}, {NAMES[source]}")
+        self.emit_rm(b"\x85", source, destination)
+
+    def test_low_byte(self, register: int, value: int) -> None:
+        self.emit(f"test {BYTE_NAMES[register]}, {value}")
+        self.emit_rm(b"\xf6", 0, register, wide=False, imm=bytes([value]))
+
+    def shl(self, register: int, amount: int) -> None:
+        self.emit(f"shl {NAMES[register]}, {amount}")
+        self.emit_rm(b"\xc1", 4, register, imm=bytes([amount]))
+
+    def sar(self, register: int, amount: int) -> None:
+        self.emit(f"sar {NAMES[register]}, {amount}")
+        self.emit_rm(b"\xc1", 7, register, imm=bytes([amount]))
+
+    def neg(self, register: int) -> None:
+        self.emit(f"neg {NAMES[register]}")
+        self.emit_rm(b"\xf7", 3, register)
+
+    def div(self, register: int) -> None:
+        self.emit(f"div {NAMES[register]}")
+        self.emit_rm(b"\xf7", 6, register)
+
+    def dec(self, register: int) -> None:
+        self.emit(f"dec {NAMES[register]}")
+        self.emit_rm(b"\xff", 1, register)
+
+    def setcc(self, condition: int, register: int) -> None:
+        self.emit(f"set{CONDITIONS[condition]} {BYTE_NAMES[register]}")
+        self.emit_rm(bytes([0x0F, 0x90 | condition]), 0, register, wide=False)
+
+    def movzx_byte(self, destination: int, source: int) -> None:
+        self.emit(f"movzx {DWORD_NAMES[destination]}, {BYTE_NAMES[source]}")
+        self.emit_rm(b"\x0f\xb6", destination, source, wide=False)
+
+    def push(self, register: int) -> None:
+        self.emit(f"push {NAMES[register]}")
+        if register >= 8:
+            self.code.append(0x41)
+        self.code.append(0x50 + (register & 7))
+
+    def pop(self, register: int) -> None:
+        self.emit(f"pop {NAMES[register]}")
+        if register >= 8:
+            self.code.append(0x41)
+        self.code.append(0x58 + (register & 7))
+
+    def branch(self, opcode: bytes, target: str) -> None:
+        self.code.extend(opcode)
+        self.fixups.append((len(self.code), target, 0))
+        self.code.extend(bytes(4))
+
+    def jmp(self, target: str) -> None:
+        self.emit(f"jmp {target}")
+        self.branch(b"\xe9", target)
+
+    def jcc(self, condition: int, target: str) -> None:
+        self.emit(f"j{CONDITIONS[condition]} {target}")
+        self.branch(bytes([0x0F, 0x80 | condition]), target)
+
+    def call(self, target: str) -> None:
+        self.emit(f"call {target}")
+        self.branch(b"\xe8", target)
+
+    def ret(self) -> None:
+        self.emit("ret")
+        self.code.append(0xC3)
+
+    def syscall(self) -> None:
+        self.emit("syscall")
+        self.code.extend(b"\x0f\x05")
+
+    def rep_movsb(self) -> None:
+        self.emit("rep movsb")
+        self.code.extend(b"\xf3\xa4")
+
+    def repe_cmpsb(self) -> None:
+        self.emit("repe cmpsb")
+        self.code.extend(b"\xf3\xa6")
+
+    def link(self, code_address: int, data_address: int) -> bytes:
+        """
+        The code with every fixup resolved, for code loaded at code_address and
+        data at data_address (the bss starts 16 aligned right after the data).
+        """
+        bss_address: int = data_address + len(self.data) + (-len(self.data) % 16)
+        code: bytearray = bytearray(self.code)
+        for offset, target, trailing in self.fixups:
+            if target in self.labels:
+                address: int = code_address + self.labels[target]
+            elif target in self.data_labels:
+                address = data_address + self.data_labels[target]
+            else:
+                address = bss_address + self.bss_labels[target]
+            code[offset : offset + 4] = pack("<i", address - (code_address + offset + 4 + trailing))
+        return bytes(code)
+
+    def text(self, entry: str) -> str:
+        """
+        The listing as a NASM program (nasm -f elf64, then ld), same code as link() produces.
+        """
+        lines: List[str] = [f"global {entry}", "", "section .text"]
+        lines.extend(self.listing)
+        lines.extend(["", "section .data"])
+        for contents, name in self.strings.items():
+            lines.append("  align 8, db 0")
+            lines.append(f"{name}: dq {len(contents)}")
+            if contents:
+                lines.append(f"  db {', '.join(str(byte) for byte in contents)}")
+        lines.extend(["", "section .bss"])
+        for name, size in self.bss_sizes.items():
+            lines.append("  alignb 16")
+            lines.append(f"{name}: resb {size}")
+        return "\n".join(lines) + "\n"
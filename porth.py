@@ -1,14 +1,34 @@
-from lib.lexer import Lexer
+from lib.lexer import Lexer, RegexLexer, StreamLexer
 from lib.interpreter import Interpreter
 from lib.tokentype import Token, TokenType
 from lib.compiler import Compiler
+from lib.parser import Parser
+from lib.expr import Expr
+from lib.bytecode import Bytecode, BytecodeCompiler
+from lib.engine import Engine
+from lib.cache import ProgramCache
+from lib.loader import ModuleLoader
+from lib.repl import Session
+from lib.expander import MacroExpander
+from lib.optimizer import Optimizer
+from lib.inliner import Inliner
+from lib.jumptable import resolve_jumps
+from lib.ir import Lowering
+from lib.profiler import Profiler, SAMPLE_INTERVAL
+from lib.metrics import Metrics, MeasuringInterpreter
+from lib.errors import FinnError
+from lib.batch import Batch, DEFAULT_TIMEOUT, find_scripts
 
+import os
 import sys
-from time import time
+from time import perf_counter_ns
+from typing import TextIO
 
-def porth() -> None:
+def main() -> None:
     filename: str = ""
     show_tokens: bool = False
+    show_ast: bool = False
+    show_ir: bool = False
     show_registers: bool = False
     show_variables: bool = False
     deconstruct: bool = False
@@ -17,9 +37,22 @@ def porth() -> None:
     repl: bool = False
     compile: bool = False
     interpret: bool = False
-    for arg in sys.argv:
+    engine: str = "token"
+    lexer: type[Lexer] = RegexLexer
+    stream: bool = False
+    use_cache: bool = True
+    cache_directory: str = ""
+    cache_stats: bool = False
+    show_dependencies: bool = False
+    expand_macros: bool = True
+    optimization_level: int = 1
+    output_path: str = ""
+    profiler: Profiler | None = None
+    profile_path: str = ""
+    metrics_path: str = ""
+    for index, arg in enumerate(sys.argv):
 
-        if arg[:-4] == "-deconstruct:":
+        if arg[:13] == "-deconstruct:":
             arg = arg.split(":")
             deconstruct = True
             proc_to_deconstruct = arg[1]
@@ -27,12 +60,40 @@ def porth() -> None:
         if arg == "-c":
             compile = True
 
+        if arg == "-o" and index + 1 < len(sys.argv):
+            output_path = sys.argv[index + 1]
+
         if arg == "-i":
             interpret = True
 
         if arg[-6:] == ".porth":
             filename = arg
 
+        if arg == "-":
+            filename = arg
+            stream = True
+
+        if arg == "-stream":
+            stream = True
+
+        if arg == "-no-cache":
+            use_cache = False
+
+        if arg[:11] == "-cache-dir=":
+            cache_directory = arg[11:]
+
+        if arg == "-cache-stats":
+            cache_stats = True
+
+        if arg == "-no-expand":
+            expand_macros = False
+
+        if arg in ("-O0", "-O1", "-O2"):
+            optimization_level = int(arg[2])
+
+        if arg == "-deps":
+            show_dependencies = True
+
         if arg == "-repl":
             repl = True
 
@@ -45,38 +106,218 @@ def porth() -> None:
         if arg == "-token":
             show_tokens = True
 
+        if arg == "-ast":
+            show_ast = True
+
+        if arg == "-ir":
+            show_ir = True
+
         if arg == "-time":
             time_it = True
 
+        if arg[:9] == "-metrics=":
+            metrics_path = arg[9:]
+
+        if arg == "-profile":
+            profiler = Profiler()
+
+        if arg[:15] == "-profile-sample":
+            profiler = Profiler(float(arg[16:]) / 1000 if arg[15:16] == "=" else SAMPLE_INTERVAL)
+
+        if arg[:13] == "-profile-out=":
+            profile_path = arg[13:]
+
+        if arg == "-lexer=classic":
+            lexer = Lexer
+
+        if arg[:8] == "-engine=":
+            engine = arg[8:]
+            if engine not in ("token", "bytecode"):
+                print(f"unknown engine \"{engine}\" (expected token or bytecode)")
+                exit(1)
+
     if repl:
+        session: Session = Session(lexer)
         while True:
-            user_input: str = input(" >> ")
+            try:
+                user_input: str = input(" .. " if session.depth else " >> ")
+            except EOFError:
+                exit(0)
             if user_input == ":q": exit(0)
-            tokens, _ = Lexer(user_input, "porth-repl").scan_tokens()
             if show_tokens:
-                [print(token) for token in tokens]
+                [print(token) for token in lexer(user_input, "porth-repl").scan_tokens()[0]]
                 continue
-            Interpreter(tokens).interpret(show_registers, show_variables, deconstruct, proc_to_deconstruct)
+            if session.feed(user_input):
+                session.interpreter.report(show_variables, deconstruct, proc_to_deconstruct)
 
     if filename == "":
         print("porth [usage]")
         exit(1)
 
-    with open(filename, "r") as file:
-        start: int = time()
-        tokens, amount_lexed = Lexer(file.read(), sys.argv[1]).scan_tokens()
-        if time_it:
-            lexing_time = time() - start
+    metrics: Metrics = Metrics() # timing is a handful of perf_counter_ns calls, only the counters cost anything
+    interpreter_type: type[Interpreter] = MeasuringInterpreter if time_it or metrics_path else Interpreter
+    runner: Interpreter | Engine | None = None
+    try:
+        if stream:
+            metrics.begin("lex") # reading is interleaved with lexing
+            source: TextIO = sys.stdin if filename == "-" else open(filename, "r")
+            try:
+                streamer: StreamLexer = StreamLexer(source, "<stdin>" if filename == "-" else filename)
+                if show_tokens:
+                    [token.pprint() for token in streamer.stream()]
+                    exit(0)
+                if interpret and engine == "token" and not compile and not show_ast:
+                    metrics.begin("vm_init")
+                    runner = interpreter_type([])
+                    metrics.begin("execute")
+                    metrics.notes.append("streamed, execute includes reading and lexing")
+                    runner.interpret_stream(streamer.stream(), show_registers, show_variables, deconstruct, proc_to_deconstruct)
+                    metrics.counters["tokens_lexed"] = streamer.tokens_created - 1
+                    return
+                tokens, amount_lexed = streamer.scan_tokens()
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+        else:
+            loading: int = perf_counter_ns()
+            cache: ProgramCache | None = ProgramCache(cache_directory) if use_cache else None
+            loader: ModuleLoader = ModuleLoader(lexer, cache)
+            tokens = loader.load(filename)
+            amount_lexed: int = loader.tokens_lexed + 1
+            metrics.add("read", loader.reading_ns)
+            metrics.add("lex", perf_counter_ns() - loading - loader.reading_ns) # cache lookups and include linking count as lexing
+            if cache_stats and cache is not None:
+                cache.print_stats()
+            if show_dependencies:
+                loader.print_graph()
+        metrics.end()
+        metrics.counters["tokens_lexed"] = amount_lexed - 1
         if show_tokens:
             [token.pprint() for token in tokens]
             exit(0)
-    start = time()
-    if interpret:
-        Interpreter(tokens).interpret(show_registers, show_variables, deconstruct, proc_to_deconstruct)
-    if compile:
-        print(Compiler(tokens).compile())
-    if time_it:
-        print(f"Lexer completed lexing in {str(lexing_time)[:4]} seconds and lexed {amount_lexed - 1} tokens\nInterpreting took {str(time() - start)[:5]} seconds")
+        metrics.begin("analysis")
+        program: list[Expr] = Parser(tokens).parse() # structural errors stop the run here, before anything executes
+        if show_ast:
+            [expr.pprint() for expr in program]
+            exit(0)
+        if expand_macros:
+            tokens = MacroExpander(tokens, program).expand()
+        inliner: Inliner = Inliner(tokens)
+        if optimization_level >= 1:
+            tokens = inliner.inline()
+        optimizer: Optimizer = Optimizer(tokens, optimization_level)
+        tokens = optimizer.optimize()
+        metrics.end()
+        metrics.counters["tokens"] = len(tokens) - 1 # without EOF, like tokens_lexed
+        if show_ir:
+            lowering: Lowering = Lowering(tokens)
+            lowering.lower()
+            lowering.pprint()
+            exit(0)
+        if interpret and profiler is not None:
+            if engine != "token":
+                print("-profile needs the token engine")
+                exit(1)
+            metrics.begin("link")
+            jumps: dict[Token, int] = resolve_jumps(tokens)
+            metrics.begin("vm_init")
+            runner = profiler.interpreter_for(tokens, jumps)
+            metrics.begin("execute")
+            metrics.notes.append("profiled, execute includes the profiler")
+            try:
+                profiler.run(runner, show_registers, show_variables, deconstruct, proc_to_deconstruct)
+            finally:
+                metrics.end()
+                profiler.report()
+                profiler.write_collapsed(profile_path or f"{filename[:-6] if filename.endswith('.porth') else 'porth'}.folded")
+        elif interpret:
+            metrics.begin("link")
+            if engine == "bytecode":
+                code: Bytecode = BytecodeCompiler(tokens).compile()
+                metrics.begin("vm_init")
+                runner = Engine(code)
+            else:
+                jumps = resolve_jumps(tokens)
+                metrics.begin("vm_init")
+                runner = interpreter_type(tokens, jumps)
+            metrics.begin("execute")
+            runner.interpret(show_registers, show_variables, deconstruct, proc_to_deconstruct)
+            metrics.end()
+        if compile:
+            metrics.begin("compile")
+            if output_path:
+                Compiler(tokens).write(output_path)
+            else:
+                print(Compiler(tokens).compile())
+            metrics.end()
+        if time_it:
+            print(f"Inlined {inliner.inlined} call(s)")
+            print(optimizer.report())
+    finally: # exit() in the program still gets its numbers
+        metrics.end()
+        if runner is not None:
+            metrics.collect(runner)
+        if time_it:
+            metrics.report()
+        if metrics_path:
+            metrics.write(metrics_path, { "script" : filename, "engine" : engine, "profiled" : profiler is not None, "optimization_level" : optimization_level })
+
+def batch(args: list[str]) -> None:
+    """
+    porth.py batch <dir|glob>... [-j N] [-timeout=seconds] [-O0|-O1|-O2] [-json=path] [-show-output]
+    Runs every script on a pool of N processes (one per core by default), -timeout=0 lets scripts run forever.
+    """
+    targets: list[str] = []
+    jobs: int = os.cpu_count() or 1
+    timeout: float | None = DEFAULT_TIMEOUT
+    optimization_level: int = 1
+    json_path: str = ""
+    show_output: bool = False
+    skip: bool = False
+    for index, arg in enumerate(args):
+
+        if skip:
+            skip = False
+
+        elif arg == "-j" and index + 1 < len(args):
+            jobs = max(1, int(args[index + 1]))
+            skip = True
+
+        elif arg[:9] == "-timeout=":
+            timeout = float(arg[9:]) or None
+
+        elif arg in ("-O0", "-O1", "-O2"):
+            optimization_level = int(arg[2])
+
+        elif arg[:6] == "-json=":
+            json_path = arg[6:]
+
+        elif arg == "-show-output":
+            show_output = True
+
+        elif arg[:1] != "-":
+            targets.append(arg)
+
+    if not targets:
+        print("porth batch <dir|glob>... [-j N] [-timeout=seconds] [-O0|-O1|-O2] [-json=path] [-show-output]")
+        exit(1)
+    scripts: list[str] = find_scripts(targets)
+    runner: Batch = Batch(scripts, min(jobs, max(1, len(scripts))), optimization_level, timeout)
+    runner.run()
+    runner.report(show_output)
+    if json_path:
+        runner.write(json_path)
+    exit(1 if runner.failed() else 0)
+
+def porth() -> None:
+    try:
+        if sys.argv[1:2] == ["batch"]:
+            batch(sys.argv[2:])
+        else:
+            main()
+    except FinnError as error: # errors are exceptions so lib.api can catch them, here they end the process like they used to
+        print(error)
+        exit(1)
 
 if __name__ == "__main__":
     porth()
\ No newline at end of file
@@ -0,0 +1,31 @@
+from io import StringIO
+
+import pytest
+
+from lib.api import Limits, compile
+from lib.errors import LimitError
+
+def test_exit_keeps_its_message() -> None:
+    result = compile("1 out \"bye\" exit").run()
+    assert (result.exit_code, result.exit_message, result.output) == (1, "bye", "1\n")
+    result = compile("3 exit").run()
+    assert (result.exit_code, result.exit_message) == (3, None)
+    result = compile("1 out").run()
+    assert (result.exit_code, result.exit_message) == (0, None)
+
+def test_run_writes_to_stdout() -> None:
+    stdout = StringIO()
+    result = compile("\"hi\" out").run(stdout)
+    assert stdout.getvalue() == "hi\n"
+    assert result.output is None
+
+def test_timeout_stops_code_without_calls() -> None:
+    program = compile("1 drop " * 20000, optimization_level=0)
+    with pytest.raises(LimitError, match="Ran for more than"):
+        program.run(limits=Limits(timeout=0.0))
+    assert program.run(limits=Limits(timeout=60)).exit_code == 0
+
+def test_call_depth() -> None:
+    program = compile("down :: proc down() 1 out end down()")
+    with pytest.raises(LimitError, match="Calls nested more than 50 deep"):
+        program.run(limits=Limits(max_call_depth=50))
@@ -0,0 +1,25 @@
+import os
+
+import lib.batch
+from lib.batch import Batch, find_scripts, run_script
+
+def test_batch_runs_every_script(tmp_path) -> None:
+    (tmp_path / "hello.porth").write_text("\"hello\" out")
+    (tmp_path / "bye.porth").write_text("\"bye\" exit")
+    (tmp_path / "broken.porth").write_text("end")
+    batch = Batch(find_scripts([str(tmp_path)]), 2)
+    outcomes = { os.path.basename(outcome.path) : outcome for outcome in batch.run() }
+    assert (outcomes["hello.porth"].status, outcomes["hello.porth"].output) == ("ok", "hello\n")
+    assert (outcomes["bye.porth"].exit_code, outcomes["bye.porth"].error) == (1, "bye")
+    assert outcomes["broken.porth"].status == "failed"
+    assert batch.failed()
+
+def test_stuck_script_is_stopped(tmp_path, monkeypatch) -> None:
+    def stuck(path: str, optimization_level: int) -> None:
+        while True:
+            pass
+    monkeypatch.setattr(lib.batch, "load", stuck)
+    monkeypatch.setattr(lib.batch, "HARD_TIMEOUT_GRACE", 0.0)
+    outcome = run_script(str(tmp_path / "stuck.porth"), 1, 0.05)
+    assert outcome.status == "timeout"
+    assert "stopped" in outcome.error
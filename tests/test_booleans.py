@@ -0,0 +1,25 @@
+from contextlib import redirect_stdout
+from io import StringIO
+
+from lib.api import compile
+from lib.bytecode import BytecodeCompiler
+from lib.engine import Engine
+
+CASES = {
+    "true out" : "True\n",
+    "false out" : "False\n",
+    "true 1 == out" : "True\n",
+    "false 0 == out" : "True\n",
+    "true if \"yes\" out else \"no\" out end" : "yes\n",
+    "false if \"yes\" out else \"no\" out end" : "no\n",
+}
+
+def test_true_and_false_push_booleans() -> None:
+    for level in (0, 1, 2):
+        for source, expected in CASES.items():
+            program = compile(source, optimization_level=level)
+            assert program.run().output == expected, (source, level)
+            output = StringIO()
+            with redirect_stdout(output):
+                Engine(BytecodeCompiler(list(program.tokens)).compile()).interpret(False, False, False, "")
+            assert output.getvalue() == expected, (source, level, "bytecode")
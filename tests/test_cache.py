@@ -0,0 +1,50 @@
+import os
+
+from lib.cache import ProgramCache
+from lib.lexer import RegexLexer
+
+SOURCE = "inc :: macro 1 + end\nf :: proc dup 0 < if inc else drop end end\n\"a b\" out 3 f() 2.5 out\n"
+
+def fields(tokens: list) -> list:
+    return [(token._type, token.value, token.value_type, token.position, token.filename) for token in tokens]
+
+def cached_files(directory) -> list:
+    return [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".porthc")]
+
+def test_second_load_hits_with_the_same_tokens(tmp_path) -> None:
+    cache = ProgramCache(str(tmp_path))
+    fresh, created = RegexLexer(SOURCE, "test.porth").scan_tokens()
+    first = cache.lex(SOURCE, "test.porth", RegexLexer)
+    second = ProgramCache(str(tmp_path)).lex(SOURCE, "test.porth", RegexLexer)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert fields(first[0]) == fields(second[0]) == fields(fresh)
+    assert first[1] == second[1] == created
+
+def test_changed_source_or_toolchain_misses(tmp_path) -> None:
+    cache = ProgramCache(str(tmp_path))
+    cache.lex(SOURCE, "test.porth", RegexLexer)
+    changed = cache.lex(SOURCE + "4 out\n", "test.porth", RegexLexer)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert fields(changed[0]) == fields(RegexLexer(SOURCE + "4 out\n", "test.porth").scan_tokens()[0])
+
+    upgraded = ProgramCache(str(tmp_path))
+    upgraded.toolchain = bytes(32) # as if the lexer or python had changed
+    upgraded.lex(SOURCE, "test.porth", RegexLexer)
+    assert (upgraded.hits, upgraded.misses) == (0, 1)
+
+def test_truncated_or_corrupt_file_is_lexed_again(tmp_path) -> None:
+    fresh = fields(RegexLexer(SOURCE, "test.porth").scan_tokens()[0])
+    ProgramCache(str(tmp_path)).lex(SOURCE, "test.porth", RegexLexer)
+    [path] = cached_files(tmp_path)
+    with open(path, "rb") as file:
+        stored = file.read()
+
+    for damaged in (stored[:20], stored[:-10], stored[:-1] + bytes([stored[-1] ^ 0xFF]), b""):
+        with open(path, "wb") as file:
+            file.write(damaged)
+        cache = ProgramCache(str(tmp_path))
+        tokens, _ = cache.lex(SOURCE, "test.porth", RegexLexer)
+        assert (cache.hits, cache.misses) == (0, 1)
+        assert fields(tokens) == fresh
+        with open(path, "rb") as file:
+            assert file.read() == stored # rewritten in full
@@ -0,0 +1,27 @@
+import sys
+
+from lib.api import Limits, Program, StrictLexer, compile
+
+def test_tail_recursion_runs_in_constant_space() -> None:
+    depth = sys.getrecursionlimit() * 3
+    program = compile(f"loop :: proc dup {depth} < if 1 + loop() else end end drop 0 loop() out", optimization_level=0)
+    assert program.run(limits=Limits(max_call_depth=1)).output == f"{depth}\n" # one frame for the whole run
+
+def test_call_returns_into_if_and_else() -> None:
+    program = compile(
+        "f :: proc 10 + end drop "
+        "g :: proc if 1 f() else 3 f() end 7 out end drop "
+        "h :: proc if 1 f() 2 out else 3 f() 4 out end end drop "
+        "true g() out false g() out true h() out false h() out",
+        optimization_level=0,
+    )
+    assert program.run(limits=Limits(max_call_depth=2)).output == "7\n11\n7\n13\n2\n11\n4\n13\n"
+
+def test_rebinding_a_name_invalidates_cached_sites() -> None:
+    for source, output in (
+        ("f :: proc 1 out end drop g :: proc f() end drop g() f :: proc 2 out end drop g()", "1\n2\n"),
+        ("g :: proc k out end drop g() k :: macro 3 end drop g()", "k\n3\n"),
+        ("g :: proc x! out end drop x 1 = g() x 2 = g()", "1\n2\n"),
+    ):
+        tokens = StrictLexer(source, "test.porth").scan_tokens()[0] # unexpanded and uninlined, g's body is the one site
+        assert Program("test", tokens).run().output == output
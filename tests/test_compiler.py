@@ -0,0 +1,68 @@
+import os
+import platform
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux" or platform.machine() != "x86_64", reason="compiled programs are x86-64 Linux executables")
+
+UNDERFLOWS = [
+    "\"x\" out drop drop",
+    "1 +",
+    "1 2 out out <",
+    "3 swap",
+    "dup",
+    "if 1 out end",
+    "1 2 out out drop",
+    "pop :: proc drop drop end pop()",
+]
+
+def run_both(tmp_path, source: str) -> tuple[subprocess.CompletedProcess, subprocess.CompletedProcess]:
+    script = tmp_path / "program.porth"
+    script.write_text(source)
+    binary = tmp_path / "program"
+    porth = [sys.executable, os.path.join(ROOT, "porth.py"), str(script)]
+    subprocess.run(porth + ["-c", "-o", str(binary)], check=True, capture_output=True)
+    interpreted = subprocess.run(porth + ["-i"], capture_output=True, text=True)
+    compiled = subprocess.run([str(binary)], capture_output=True, text=True)
+    return interpreted, compiled
+
+def test_underflow_stops_like_the_interpreter(tmp_path) -> None:
+    for source in UNDERFLOWS:
+        interpreted, compiled = run_both(tmp_path, source)
+        assert interpreted.returncode == compiled.returncode == 1, source
+        assert compiled.stdout == interpreted.stdout, source
+        assert "Stack underflow" in compiled.stderr, source
+
+def test_no_underflow_runs_normally(tmp_path) -> None:
+    interpreted, compiled = run_both(tmp_path, "1 2 + out 3 dup < out 4 5 swap out out \"x\" drop 6 7 + out")
+    assert compiled.returncode == interpreted.returncode == 0
+    assert compiled.stdout == interpreted.stdout == "3\nFalse\n4\n5\n13\n"
+    assert compiled.stderr == ""
+
+def test_overflow_stops_with_an_error(tmp_path) -> None:
+    script = tmp_path / "program.porth"
+    script.write_text("grow :: proc 1 1 grow() end grow()") # the interpreter's stack has no limit, so there's nothing to match
+    binary = tmp_path / "program"
+    subprocess.run([sys.executable, os.path.join(ROOT, "porth.py"), str(script), "-c", "-o", str(binary)], check=True, capture_output=True)
+    compiled = subprocess.run([str(binary)], capture_output=True, text=True)
+    assert compiled.returncode == 1
+    assert "Stack overflow" in compiled.stderr
+
+def test_add_overflow_stops_instead_of_wrapping(tmp_path) -> None:
+    script = tmp_path / "program.porth"
+    binary = tmp_path / "program"
+    for source in ("1 out 2305843009213693951 1 + out", "2305843009213693951 dup + out", "2305843009213693951 true + out"):
+        script.write_text(source)
+        subprocess.run([sys.executable, os.path.join(ROOT, "porth.py"), str(script), "-O0", "-c", "-o", str(binary)], check=True, capture_output=True)
+        compiled = subprocess.run([str(binary)], capture_output=True, text=True)
+        assert compiled.returncode == 1, source
+        assert compiled.stdout == ("1\n" if source.startswith("1 out") else ""), source
+        assert "OverflowError" in compiled.stderr, source
+    script.write_text("2305843009213693950 1 + out 1152921504606846975 dup + 1 + out")
+    interpreted, compiled = run_both(tmp_path, script.read_text())
+    assert compiled.returncode == interpreted.returncode == 0
+    assert compiled.stdout == interpreted.stdout == "2305843009213693951\n2305843009213693951\n"
@@ -0,0 +1,45 @@
+import pytest
+
+from lib.api import Program, StrictLexer
+from lib.errors import CompileError
+from lib.expander import MAX_EXPANSION_DEPTH, MacroExpander
+
+def lex(source: str) -> list:
+    return StrictLexer(source, "test.porth").scan_tokens()[0]
+
+def expand(source: str) -> MacroExpander:
+    expander = MacroExpander(lex(source))
+    expander.output = expander.expand()
+    return expander
+
+def test_recursive_macro_is_rejected() -> None:
+    for source in ("r :: macro 1 r end r", "r :: macro 1 if r end end 0 r"):
+        with pytest.raises(CompileError, match="uses itself"):
+            expand(source)
+
+def test_expansion_depth_limit() -> None:
+    def chain(length: int) -> str:
+        return "m0 :: macro 1 end " + " ".join(f"m{level} :: macro m{level - 1} end" for level in range(1, length)) + f" m{length - 1} out"
+    assert expand(chain(MAX_EXPANSION_DEPTH)).depths[f"m{MAX_EXPANSION_DEPTH - 1}"] == MAX_EXPANSION_DEPTH
+    with pytest.raises(CompileError, match=f"nests {MAX_EXPANSION_DEPTH + 1} macros deep, the limit is {MAX_EXPANSION_DEPTH}"):
+        expand(chain(MAX_EXPANSION_DEPTH + 1))
+
+def test_macros_bound_twice_or_nested_stay_unexpanded() -> None:
+    for source, names in (
+        ("m :: macro 1 end m out m :: macro 2 end m out", {"m"}),
+        ("m :: macro 1 end m out 2 m :: ... m out", {"m"}),
+        ("f :: proc g :: macro 5 end g out end drop f() g out", {"f", "g"}),
+    ):
+        expander = expand(source)
+        assert expander.expansions == 0 and names <= expander.dynamic
+        assert [token.value for token in expander.output] == [token.value for token in lex(source)]
+
+def test_expanded_program_runs_like_the_unexpanded_one() -> None:
+    for source in (
+        "inc :: macro 1 + end twice :: macro inc inc end 3 twice out 1 if 4 twice out else 0 end",
+        "sq :: macro dup * end f :: proc sq out end 7 f() 2 sq sq out",
+        "m :: macro 1 end m out m :: macro 2 end m out",
+        "Point :: struct x y end p :: <Point> shout :: macro \"hi\" out end shout shout",
+    ):
+        expander = expand(source)
+        assert Program("expanded", expander.output).run().output == Program("unexpanded", lex(source)).run().output
@@ -0,0 +1,69 @@
+from lib.hooks import EVENTS, Hook, overrides
+from lib.interpreter import Interpreter
+from lib.lexer import RegexLexer
+from lib.tokentype import TokenType
+
+SOURCE = "f :: proc 1 if 2 drop end end drop g :: proc f() end drop g() 0 if 3 end"
+
+class Recorder(Hook):
+
+    def __init__(self) -> None:
+        self.events: list = []
+
+    def on_token(self, interpreter, token) -> None:
+        self.events.append(("on_token", token))
+
+    def on_call(self, interpreter, name) -> None:
+        self.events.append(("on_call", name, list(interpreter.call_stack)))
+
+    def on_return(self, interpreter, name) -> None:
+        self.events.append(("on_return", name))
+
+    def on_branch(self, interpreter, token, taken) -> None:
+        self.events.append(("on_branch", token, taken))
+
+    def on_alloc(self, interpreter, address, size, value) -> None:
+        self.events.append(("on_alloc", address, size, value))
+
+    def on_free(self, interpreter, address) -> None:
+        self.events.append(("on_free", address))
+
+def interpreter() -> Interpreter:
+    return Interpreter(RegexLexer(SOURCE, "test.porth").scan_tokens()[0])
+
+def test_every_event_fires_with_its_arguments() -> None:
+    runner = interpreter()
+    recorder = Recorder()
+    runner.add_hook(recorder)
+    runner.execute()
+    address = runner.vm.allocate_memory_and_store(8, 5)
+    runner.vm.free_memory(address)
+    events = recorder.events
+
+    assert { event[0] for event in events } == set(EVENTS)
+    ran = [event[1] for event in events if event[0] == "on_token"]
+    assert ran[0] is runner.tokens[0] and ran[-1] is runner.tokens[-1]
+    assert [event[1:] for event in events if event[0] in ("on_call", "on_return")] == [
+        ("g", ["g"]), ("g",), ("f", ["f"]), ("f",), # f() is g's tail call, g returns right before f's on_call
+    ]
+    ifs = [token for token in runner.tokens if token._type == TokenType.IF]
+    assert [(event[1], event[2]) for event in events if event[0] == "on_branch"] == [(ifs[0], True), (ifs[1], False)]
+    assert events[-2:] == [("on_alloc", address, 8, 5), ("on_free", address)]
+    assert runner.stack == []
+
+def test_no_hooks_keeps_the_plain_methods() -> None:
+    assert not any(overrides(Hook(), event) for event in EVENTS)
+    assert all(overrides(Recorder(), event) for event in EVENTS)
+
+    runner = interpreter()
+    assert { "interpret_token", "call", "leave" }.isdisjoint(vars(runner))
+    recorder, silent = Recorder(), Hook()
+    runner.add_hook(silent)
+    assert runner.traced == { event : [] for event in EVENTS } and runner.vm.on_alloc is None and runner.vm.on_free is None
+    runner.add_hook(recorder)
+    runner.remove_hook(recorder)
+    runner.remove_hook(silent)
+    runner.execute()
+    assert recorder.events == []
+    for method in ("interpret_token", "call", "leave"):
+        assert getattr(runner, method).__func__ is getattr(Interpreter, method)
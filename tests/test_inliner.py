@@ -0,0 +1,35 @@
+from lib.api import StrictLexer, compile
+from lib.inliner import INLINE_BUDGET, Inliner
+
+def inline(source: str) -> Inliner:
+    inliner = Inliner(StrictLexer(source, "test.porth").scan_tokens()[0])
+    inliner.output = inliner.inline()
+    return inliner
+
+def test_budget_cutoff() -> None:
+    fits = "1 drop " * (INLINE_BUDGET // 2)
+    assert inline(f"f :: proc {fits}end drop f() f()").inlined == 2
+    over = inline(f"f :: proc {fits}1 end drop f() f()")
+    assert over.inlined == 0 and over.bodies == {}
+    tighter = Inliner(inline(f"f :: proc {fits}end drop f()").tokens, INLINE_BUDGET - 1)
+    tighter.inline()
+    assert tighter.inlined == 0
+
+def test_self_recursive_proc_is_not_inlined() -> None:
+    inliner = inline("f :: proc dup 3 < if 1 + f() end end drop 0 f() out")
+    assert inliner.inlined == 0 and "f" in inliner.candidates and "f" not in inliner.bodies
+
+def test_proc_bound_twice_is_not_inlined() -> None:
+    for source in ("f :: proc 1 out end drop f() f :: proc 2 out end drop f()", "f :: proc 1 out end drop f() 2 f :: ... f out"):
+        inliner = inline(source)
+        assert inliner.inlined == 0 and "f" not in inliner.candidates
+
+def test_same_output_at_o0_and_o1() -> None:
+    for source in (
+        "inc :: proc 1 + end twice :: proc inc() inc() end 3 twice() out 1 if 4 twice() out else 0 end",
+        "sign :: proc dup 0 < if drop 0 else drop 1 end end 5 sign() out",
+        "f :: proc 1 out end drop f() f :: proc 2 out end drop f()",
+        "count :: proc dup 3 < if dup out 1 + count() end end drop 0 count() out",
+        "sq :: proc dup + end m :: macro sq() sq() end 3 m out",
+    ):
+        assert compile(source, optimization_level=0).run().output == compile(source, optimization_level=1).run().output
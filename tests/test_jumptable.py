@@ -0,0 +1,26 @@
+import pytest
+
+from lib.jumptable import resolve_jumps
+from lib.lexer import RegexLexer
+
+CASES = [ # source, {index of an opener or else: distance to where execution carries on}
+    ("1 if 2 end", { 1: 2 }),
+    ("1 if 2 else 3 end", { 1: 2, 3: 2 }),
+    ("1 if 1 if 2 else 3 end else 4 end", { 1: 7, 3: 2, 5: 2, 8: 2 }),
+    ("1 if 2 else 1 if 3 end end", { 1: 2, 3: 5, 5: 2 }),
+    ("f :: proc 1 if 2 end end", { 2: 5, 4: 2 }),
+    ("m :: macro dup + end", { 2: 3 }),
+    ("P :: struct x y end", { 2: 3 }),
+    ("f :: proc g :: proc 1 end end", { 2: 6, 5: 2 }),
+    ("end 1 if 2 end end", { 2: 2 }), # stray ends close nothing
+    ("else 1", {}),
+    ("1 if 2", { 1: 2 }), # unclosed, runs to the end of the program
+    ("1 if 2 else 3", { 1: 2, 3: 2 }),
+    ("f :: proc 1 if 2 end", { 2: 5, 4: 2 }),
+    ("f :: proc 1 if 2 else", { 2: 5, 4: 2, 6: 1 }),
+]
+
+@pytest.mark.parametrize("source, expected", CASES)
+def test_resolve_jumps(source: str, expected: dict) -> None:
+    tokens = RegexLexer(source, "test.porth").scan_tokens()[0][:-1] # without the EOF
+    assert resolve_jumps(tokens) == { tokens[index]: distance for index, distance in expected.items() }
@@ -0,0 +1,44 @@
+from io import StringIO
+
+from lib.lexer import CHUNK_SIZE, Lexer, RegexLexer, StreamLexer
+
+SOURCE = "inc :: macro 1 + end // comment\n\"a long string, with spaces\" out 12345 inc out\nf :: proc \"x y\" out end drop f()\n2.5 out\n"
+
+def fields(tokens: list) -> list:
+    return [(token._type, token.value, token.value_type, token.position) for token in tokens]
+
+def streamed(source: str, chunk_size: int = CHUNK_SIZE) -> list:
+    return fields(StreamLexer(StringIO(source), "test.porth", chunk_size).scan_tokens()[0])
+
+def test_same_tokens_as_the_classic_lexer() -> None:
+    for source in (
+        SOURCE,
+        "1 -2 out  -3.5\t-4= -5- -6> x-1 a--b",
+        "a[0] cast[ptr] call-like ... .. . :: |> | -= -- -> - += ++ + *= ** * != ! == = <= <| <> < >= > /= / & () ( ) { } , #",
+        "  \"multi\n  line\" out   \"two\" \t\r x // c\n y   ",
+        "2.5 3. 4.x _a b_1 Z \u0661\u0662 out",
+        "x  $ y \u00e9",
+    ):
+        expected = Lexer(source, "test.porth").scan_tokens()
+        tokens, created = RegexLexer(source, "test.porth").scan_tokens()
+        assert fields(tokens) == fields(expected[0]) and created == expected[1], source
+
+def test_stream_matches_whole_source_for_any_chunk_size() -> None:
+    expected = fields(RegexLexer(SOURCE, "test.porth").scan_tokens()[0])
+    for chunk_size in range(1, len(SOURCE) + 2):
+        assert streamed(SOURCE, chunk_size) == expected, chunk_size
+
+def test_string_and_line_across_chunk_size_boundary() -> None:
+    lines = "1 drop\n" * (CHUNK_SIZE // 7 - 10)
+    for inside in (1, 5, 20): # how far into the string the first chunk ends
+        source = lines + " " * (CHUNK_SIZE - len(lines) - 3 - inside) + "10 \"split right over\nthe boundary\" out 7 out\n" + "4 out"
+        assert source[CHUNK_SIZE - inside] == '"'
+        tokens = streamed(source)
+        assert tokens == fields(RegexLexer(source, "test.porth").scan_tokens()[0])
+        assert [value for _, value, _, _ in tokens][-8:-1] == [10, "split right over\nthe boundary", None, 7, None, 4, None]
+
+def test_stream_is_lazy() -> None:
+    file = StringIO(SOURCE * 4)
+    stream = StreamLexer(file, "test.porth", len(SOURCE)).stream()
+    next(stream)
+    assert file.tell() < len(SOURCE * 4)
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from lib.errors import CompileError
+from lib.loader import ModuleLoader
+from lib.tokentype import TokenType
+
+def write(path, source: str) -> str:
+    path.write_text(source)
+    return str(path)
+
+def values(tokens: list) -> list:
+    return [token.value for token in tokens if token._type == TokenType.PUSH]
+
+def test_include_cycle_is_a_compile_error(tmp_path) -> None:
+    write(tmp_path / "a.porth", "include \"b.porth\"\n1 out\n")
+    write(tmp_path / "b.porth", "include \"a.porth\"\n2 out\n")
+    with pytest.raises(CompileError, match="Include cycle"):
+        ModuleLoader().load(str(tmp_path / "a.porth"))
+
+def test_diamond_include_is_linked_once(tmp_path) -> None:
+    write(tmp_path / "base.porth", "100\n")
+    write(tmp_path / "left.porth", "include \"base.porth\"\n1\n")
+    write(tmp_path / "right.porth", "include \"base.porth\"\n2\n")
+    root = write(tmp_path / "root.porth", "include \"left.porth\"\ninclude \"right.porth\"\n3\n")
+    program = ModuleLoader().load(root)
+    assert values(program) == [100, 1, 2, 3]
+    assert program[-1]._type == TokenType.EOF and sum(token._type == TokenType.EOF for token in program) == 1
+
+def test_changed_module_reloads_its_dependents_only(tmp_path) -> None:
+    base = write(tmp_path / "base.porth", "100\n")
+    write(tmp_path / "user.porth", "include \"base.porth\"\n1\n")
+    other = write(tmp_path / "other.porth", "2\n")
+    root = write(tmp_path / "root.porth", "include \"user.porth\"\n3\n")
+    loader = ModuleLoader()
+    first = loader.load(root)
+    unrelated = loader.load(other)
+    assert loader.load(root) is first # unchanged, linked once
+
+    write(tmp_path / "base.porth", "200\n")
+    stat = os.stat(base)
+    os.utime(base, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9)) # coarse mtime clocks
+    lexed = loader.tokens_lexed
+    second = loader.load(root)
+    assert second is not first and values(second) == [200, 1, 3]
+    assert loader.tokens_lexed == lexed + 1 # only base.porth was lexed again
+    assert loader.load(other) is unrelated
+
+def test_invalidate_drops_programs_including_the_module(tmp_path) -> None:
+    write(tmp_path / "base.porth", "100\n")
+    root = write(tmp_path / "root.porth", "include \"base.porth\"\n3\n")
+    loader = ModuleLoader()
+    first = loader.load(root)
+    loader.invalidate(os.path.realpath(tmp_path / "base.porth"))
+    assert os.path.realpath(root) not in loader.programs
+    assert values(loader.load(root)) == values(first)
@@ -0,0 +1,26 @@
+from lib.api import compile
+from lib.errors import CompileError
+from lib.expr import Call, If, Macro, Proc, Push, Word
+from lib.lexer import RegexLexer
+from lib.parser import Parser
+from lib.tokentype import TokenType
+
+def parse(source: str) -> list:
+    return Parser(RegexLexer(source, "test.porth").scan_tokens()[0]).parse()
+
+def test_nodes_and_spans() -> None:
+    program = parse("inc :: macro 1 + end\nf :: proc dup 0 < if inc else drop end end\n3 f()\n")
+    assert [type(expr) for expr in program] == [Macro, Proc, Push, Call]
+    condition = program[1].body[-1]
+    assert isinstance(condition, If) and condition.else_body is not None
+    assert isinstance(condition.else_body[0], Word) and condition.else_body[0]._type == TokenType.DROP
+    assert program[1].span.start == (2, 1) and program[1].span.end[0] == 2 and program[1].last._type == TokenType.END
+
+def test_structural_errors_stop_before_running() -> None:
+    for source in ("f :: proc \"ran\" out", "1 end", "1 else", "1 if 2 end end"):
+        try:
+            compile(source)
+        except CompileError as error:
+            assert str(error).startswith("<source>:1:")
+        else:
+            raise AssertionError(f"{source!r} compiled")
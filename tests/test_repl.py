@@ -0,0 +1,27 @@
+from io import StringIO
+
+from lib.repl import Session
+
+def session() -> Session:
+    session = Session()
+    session.interpreter.stdout = StringIO()
+    return session
+
+def test_open_blocks_wait_for_their_end() -> None:
+    repl = session()
+    assert not repl.feed("f :: proc")
+    assert not repl.feed("    1 if")
+    assert repl.depth == 2
+    assert not repl.feed("        \"yes\" out")
+    assert not repl.feed("    end")
+    assert repl.feed("end drop") and repl.depth == 0 and repl.pending == []
+    assert repl.interpreter.stdout.getvalue() == ""
+    assert repl.feed("f()")
+    assert repl.interpreter.stdout.getvalue() == "yes\n"
+
+def test_bindings_and_stack_carry_over() -> None:
+    repl = session()
+    for line in ("inc :: macro 1 + end drop", "twice :: proc inc inc end drop", "x 40 =", "x! twice()", "out", "x! out"):
+        assert repl.feed(line)
+    assert repl.interpreter.stdout.getvalue() == "42\n40\n"
+    assert repl.interpreter.stack == []
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from lib.errors import ExecutionError, FinnError
+from lib.vm import VM
+
+def test_free_ignores_interior_address() -> None:
+    vm = VM()
+    a = vm.allocate_memory_and_store(64, "x" * 40)
+    interior = hex(int(a, 16) + 32) # aligned, inside a's payload
+    vm.free_memory(interior)
+    assert interior not in vm.memory_array
+    b = vm.allocate_memory_and_store(16, "z" * 16)
+    assert b != interior
+    assert vm.memory_array[a] == [64, "x" * 40]
+    assert vm.memory_array[b] == [16, "z" * 16]
+    assert vm.frees == 0
+
+def test_free_ignores_unknown_and_double_free() -> None:
+    vm = VM()
+    a = vm.allocate_memory_and_store(8, 1)
+    vm.free_memory("0x12345")
+    vm.free_memory(a)
+    vm.free_memory(a)
+    assert vm.frees == 1
+    assert vm.memory == 1048576
+
+def test_snapshot_keeps_live_blocks(tmp_path) -> None:
+    vm = VM()
+    a = vm.allocate_memory_and_store(32, "kept")
+    b = vm.allocate_memory_and_store(32, "freed")
+    vm.free_memory(b)
+    path = os.path.join(tmp_path, "heap.snapshot")
+    vm.snapshot(path)
+    restored = VM()
+    restored.restore(path)
+    assert restored.memory_array[a] == [32, "kept"]
+    assert b not in restored.memory_array
+    restored.free_memory(hex(int(a, 16) + 16))
+    assert a in restored.memory_array
+    restored.close()
+
+def test_allocation_past_the_heap_says_why() -> None:
+    vm = VM()
+    vm.allocate_memory_and_store(1048000, None)
+    try:
+        vm.allocate_memory_and_store(1000, None)
+    except ExecutionError as error:
+        assert "1000 bytes" in str(error) and "576 bytes" in str(error)
+    else:
+        raise AssertionError("allocation past the heap didn't raise")
+    assert vm.memory == 576
+
+def test_restore_after_many_cycles(tmp_path) -> None:
+    vm = VM()
+    live = {}
+    for index in range(2000):
+        live[vm.allocate_memory_and_store(8 + (index % 5) * 8, f"value {index}")] = f"value {index}"
+        if index % 3 == 0: # frees next to each other coalesce
+            address = list(live)[(index * 7) % len(live)]
+            vm.free_memory(address)
+            del live[address]
+    vm.assign_variable_to_address("first", next(iter(live)))
+    path = os.path.join(tmp_path, "heap.snapshot")
+    vm.snapshot(path)
+    restored = VM()
+    restored.restore(path)
+    assert restored.memory == vm.memory
+    assert { address : value for address, (_, value) in restored.memory_array.items() } == live
+    assert restored.variable_pointers == { "first" : next(iter(live)) }
+    for address in list(live)[::2]: # the free lists are back, freeing and reallocating still adds up
+        restored.free_memory(address)
+        vm.free_memory(address)
+    assert restored.memory == vm.memory
+    restored.allocate_memory_and_store(24, "again")
+    assert restored.allocator.top <= vm.allocator.top
+    restored.close()
+
+def test_restore_rejects_other_files(tmp_path) -> None:
+    vm = VM()
+    vm.allocate_memory_and_store(8, 1)
+    path = os.path.join(tmp_path, "heap.snapshot")
+    vm.snapshot(path)
+    with open(path, "rb") as file:
+        snapshot = file.read()
+    for name, contents in (("magic", b"NOTAHEAP" + snapshot[8:]), ("version", snapshot[:8] + (99).to_bytes(4, "little") + snapshot[12:]), ("short", snapshot[:20]), ("cut", snapshot[:-4])):
+        broken = os.path.join(tmp_path, name)
+        with open(broken, "wb") as file:
+            file.write(contents)
+        with pytest.raises(FinnError):
+            VM().restore(broken)
+
+def test_restored_heap_is_writable_and_the_snapshot_stays(tmp_path) -> None:
+    vm = VM()
+    a = vm.allocate_memory_and_store(16, "before")
+    path = os.path.join(tmp_path, "heap.snapshot")
+    vm.snapshot(path)
+    with open(path, "rb") as file:
+        snapshot = file.read()
+    restored = VM()
+    restored.restore(path)
+    restored.free_memory(a)
+    b = restored.allocate_memory_and_store(16, "after")
+    for index in range(100): # past the mapped snapshot, the heap has to grow
+        restored.allocate_memory_and_store(1024, index)
+    assert restored.memory_array[b] == [16, "after"]
+    restored.close()
+    with open(path, "rb") as file:
+        assert file.read() == snapshot
+    again = VM()
+    again.restore(path)
+    assert again.memory_array[a] == [16, "before"]
+    again.close()